@@ -0,0 +1,140 @@
+'''Desc: A process-wide registry for the images used by the sprites in the
+   remake of Atari Centipede. Each image is loaded, scaled and converted once
+   per (path, size) and the same surface is handed to every sprite after that.
+   Images can be decoded ahead of time on a background thread; they are then
+   converted on the main thread the first time they are used.
+'''
+import threading
+import pygame
+
+class AssetRegistry(object):
+    '''This class keeps one decoded, scaled surface per (path, size) key. It
+    counts hits and misses so that spawn-time decoding can be checked in
+    frame-time traces.'''
+    def __init__(self):
+        '''This initializer has no parameters. It creates an empty cache and
+        resets the hit/miss counters.'''
+        # key -> [surface, converted]
+        self.surfaces = {}
+        self.hits = 0
+        self.misses = 0
+        # Held while an image is decoded, so no image is decoded twice
+        self.lock = threading.Lock()
+
+    def convert(self, key):
+        '''This method converts the cached surface for the given key to the
+        display's pixel format, if a display has been set and it has not been
+        converted yet. Surfaces loaded before pygame.display.set_mode() (or in
+        a headless simulation) are converted the first time they are used
+        afterwards.'''
+        entry = self.surfaces[key]
+        if not entry[1] and pygame.display.get_surface() is not None:
+            if key[0] == "fill":
+                entry[0] = entry[0].convert()
+            else:
+                entry[0] = entry[0].convert_alpha()
+            entry[1] = True
+        return entry[0]
+
+    def getImage(self, path, size):
+        '''This method takes an image path (string) and a size (tuple) and
+        returns the image scaled to that size. The file is only decoded the
+        first time the key is requested.'''
+        key = (path, tuple(size))
+        if key in self.surfaces or not self.load(path, size):
+            self.hits += 1
+        else:
+            self.misses += 1
+        return self.convert(key)
+
+    def load(self, path, size):
+        '''This method takes an image path (string) and a size (tuple) and
+        decodes and scales the image into the cache without converting it, so
+        it can be called from a background thread. It returns False if the
+        image was already cached.'''
+        key = (path, tuple(size))
+        with self.lock:
+            if key in self.surfaces:
+                return False
+            image = pygame.image.load(path)
+            image = pygame.transform.scale(image, key[1])
+            self.surfaces[key] = [image, False]
+            return True
+
+    def getFilled(self, size, colour):
+        '''This method takes a size (tuple) and a colour (tuple) and returns a
+        surface of that size filled with the colour, e.g. the laser.'''
+        key = ("fill", tuple(size), tuple(colour))
+        if key in self.surfaces:
+            self.hits += 1
+        else:
+            self.misses += 1
+            surface = pygame.Surface(key[1])
+            surface.fill(key[2])
+            self.surfaces[key] = [surface, False]
+        return self.convert(key)
+
+    def preload(self, images):
+        '''This method takes an iterable of (path, size) tuples and loads each
+        of them into the registry ahead of time.'''
+        for path, size in images:
+            self.getImage(path, size)
+
+    def loadAll(self, images):
+        '''This method takes an iterable of (path, size) tuples and decodes each
+        of them into the registry without converting them, e.g. on a background
+        thread.'''
+        for path, size in images:
+            self.load(path, size)
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of hits, misses
+        and cached surfaces.'''
+        return {"hits": self.hits, "misses": self.misses, "surfaces": len(self.surfaces)}
+
+    def resetStats(self):
+        '''This mutator resets the hit and miss counters to 0.'''
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        '''This method empties the cache, e.g. after the display is recreated.'''
+        self.surfaces.clear()
+
+# The registry shared by every sprite in the process
+registry = AssetRegistry()
+
+def getSpriteImages(cellSize):
+    '''This function returns the (path, size) of every image the sprites
+    draw on a board with the given cell size in pixels (int).'''
+    size = (cellSize, cellSize)
+    scorpionSize = (cellSize*5//4, cellSize)
+    return [("images/head.png", size),
+            ("images/cremini.png", size),
+            ("images/fly-agaric.png", size),
+            ("images/UD-centipede.png", size),
+            ("images/LR-centipede.png", size),
+            ("images/spider.png", size),
+            ("images/flea.png", size),
+            ("images/scorpion_left.png", scorpionSize),
+            ("images/scorpion_right.png", scorpionSize)]
+
+def getMenuImages(cellSize):
+    '''This function returns the (path, size) of the images the menu screen
+    draws straight away on a board with the given cell size in pixels (int);
+    the rest can load in the background.'''
+    size = (cellSize, cellSize)
+    return [("images/cremini.png", size),
+            ("images/fly-agaric.png", size),
+            ("images/UD-centipede.png", size),
+            ("images/LR-centipede.png", size)]
+
+def getImage(path, size):
+    '''This function returns the image at the given path and size from the
+    shared registry.'''
+    return registry.getImage(path, size)
+
+def getFilled(size, colour):
+    '''This function returns a filled surface of the given size and colour from
+    the shared registry.'''
+    return registry.getFilled(size, colour)
@@ -0,0 +1,144 @@
+'''Desc: The audio manager of the remake of Atari Centipede. Every sound effect
+   is decoded once, the background music keeps streaming when the menu and the
+   game switch, and effects are played on a fixed pool of reserved channels.
+   When every channel is busy, a new effect takes over (steals) the channel of
+   the oldest effect with the lowest priority, as long as that priority is not
+   higher than its own; otherwise the new effect is dropped.
+
+   If the mixer could not be initialized (e.g. there is no sound card), the
+   manager stays silent.
+'''
+import time, threading
+import pygame
+
+# The background music
+MUSIC = "sounds/Adrian von Ziegler - Evocation (Chiptune).mp3"
+MUSIC_VOLUME = 0.5
+
+# name -> (path, volume, priority); a higher priority is kept over a lower one
+SOUNDS = {
+    "buzzer": ("sounds/buzzer.wav", 1.0, 3),  # when the player loses a life
+    "splat": ("sounds/splat.wav", 1.0, 2),    # when a centipede is hit
+    "hit": ("sounds/hit.wav", 0.9, 1),        # when any other enemy is hit
+    "shoot": ("sounds/shoot.wav", 0.4, 0),    # when a laser is shot
+}
+
+class AudioManager(object):
+    '''This class owns the decoded sound effects, the reserved channels and
+    the music stream.'''
+    def __init__(self, channels=8):
+        '''This initializer takes the number of channels (int) to reserve for
+        sound effects. Nothing is loaded until start() is called.'''
+        self.numChannels = channels
+        self.channels = []
+        self.sounds = {}
+        self.musicPath = None
+        # Held while the music is started or stopped, since the preloader's
+        # thread and the menu can both start it
+        self.musicLock = threading.Lock()
+
+        # Priority and start time of the effect on each channel
+        self.priorities = []
+        self.startTimes = []
+
+        # Statistics
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def init(self):
+        '''This method initializes the mixer. If that fails (e.g. there is no
+        sound card), the manager stays silent.'''
+        try:
+            pygame.mixer.init()
+        except pygame.error:
+            pass
+
+    def isEnabled(self):
+        '''This method returns True if the mixer is initialized.'''
+        return pygame.mixer.get_init() is not None
+
+    def start(self, sounds=SOUNDS):
+        '''This method reserves the channels and decodes every sound effect in
+        a dictionary of name -> (path, volume, priority). Effects that are
+        already loaded are not decoded again.'''
+        if not self.isEnabled():
+            return
+        if not self.channels:
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), self.numChannels))
+            # Sound.play() will not pick the reserved channels, so only this manager uses them
+            pygame.mixer.set_reserved(self.numChannels)
+            self.channels = [pygame.mixer.Channel(i) for i in range(self.numChannels)]
+            self.priorities = [0]*self.numChannels
+            self.startTimes = [0.0]*self.numChannels
+        for name, (path, volume, priority) in sounds.items():
+            if name not in self.sounds:
+                sound = pygame.mixer.Sound(path)
+                sound.set_volume(volume)
+                self.sounds[name] = (sound, priority)
+
+    def playMusic(self, path=MUSIC, volume=MUSIC_VOLUME):
+        '''This method starts looping the music at the given path (string). If
+        it is already playing, it carries on from where it is.'''
+        if not self.isEnabled():
+            return
+        with self.musicLock:
+            if self.musicPath == path and pygame.mixer.music.get_busy():
+                return
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.set_volume(volume)
+            pygame.mixer.music.play(-1)
+            self.musicPath = path
+
+    def fadeoutMusic(self, ms):
+        '''This method fades the music out over the given time (ms).'''
+        with self.musicLock:
+            if self.isEnabled():
+                pygame.mixer.music.fadeout(ms)
+            self.musicPath = None
+
+    def play(self, name):
+        '''This method plays the sound effect with the given name (string) on a
+        free channel, stealing one if they are all busy. It returns True if the
+        effect was played.'''
+        if name not in self.sounds:
+            # The mixer is off, or the effects are still loading
+            return False
+        sound, priority = self.sounds[name]
+
+        # Prefer an idle channel, then the oldest effect of the lowest priority
+        chosen = None
+        for i, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                chosen = i
+                break
+            if chosen is None or (self.priorities[i], self.startTimes[i]) < \
+                    (self.priorities[chosen], self.startTimes[chosen]):
+                chosen = i
+        else:
+            if self.priorities[chosen] > priority:
+                self.dropped += 1
+                return False
+            self.stolen += 1
+
+        self.channels[chosen].play(sound)
+        self.priorities[chosen] = priority
+        self.startTimes[chosen] = time.perf_counter()
+        self.played += 1
+        return True
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of effects
+        played, stolen and dropped, and the number of busy channels.'''
+        busy = sum(1 for channel in self.channels if channel.get_busy())
+        return {"played": self.played, "stolen": self.stolen, "dropped": self.dropped,
+                "busy": busy}
+
+    def resetStats(self):
+        '''This mutator resets the counters to 0.'''
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+# The audio manager shared by the menu and the game
+manager = AudioManager()
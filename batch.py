@@ -0,0 +1,209 @@
+'''Desc: A batch runner for the remake of Atari Centipede. It plays many seeded,
+   headless games across a multiprocessing pool with a scripted or random
+   input policy, streams each game's result back as it finishes, and writes
+   the per-game columns to a .npz file (or a CSV file if NumPy is missing).
+   The same seed list, policy and settings always give the same results.
+
+   Usage:
+       python batch.py --games 1000 --out batches/results.npz
+       python batch.py --seeds 0:5000 --policy sweep --set spiderDelay=120
+       python batch.py --games 200 --set points.scorpion=500
+'''
+import os, argparse, random, time, multiprocessing
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import simulation
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Settings of GameSimulation that --set can change
+TUNABLES = ("centipedeDelay", "spiderDelay", "fleaDelay", "scorpionDelay", "firingRate",
+            "invulnerableTicks")
+
+DIRECTIONS = (simulation.STILL, simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT)
+
+class RandomPolicy(object):
+    '''This class is an input policy that holds a random direction for a random
+    number of ticks and fires with a fixed probability. It has its own
+    generator, seeded from the game's seed.'''
+    def __init__(self, seed, fireChance=0.8):
+        '''This initializer takes a seed (int) and the chance (float) that the
+        fire button is held on a tick.'''
+        self.rng = random.Random(seed)
+        self.fireChance = fireChance
+        self.direction = simulation.STILL
+        self.holdTicks = 0
+
+    def __call__(self, game):
+        '''This method takes the GameSimulation and returns the inputs for the
+        next tick.'''
+        if self.holdTicks <= 0:
+            self.direction = self.rng.choice(DIRECTIONS)
+            self.holdTicks = self.rng.randrange(5, 30)
+        self.holdTicks -= 1
+        return (self.direction, self.rng.random() < self.fireChance)
+
+class SweepPolicy(object):
+    '''This class is a scripted input policy that keeps firing while sweeping
+    the player from wall to wall.'''
+    def __init__(self, seed):
+        '''This initializer takes a seed (int), which is unused since the policy
+        is scripted.'''
+        self.direction = simulation.LEFT
+
+    def __call__(self, game):
+        '''This method takes the GameSimulation and returns the inputs for the
+        next tick.'''
+        xPos = game.player.rect.centerx
+        if xPos <= 10:
+            self.direction = simulation.RIGHT
+        elif xPos >= game.bounds.width - 10:
+            self.direction = simulation.LEFT
+        return (self.direction, True)
+
+POLICIES = {"random": RandomPolicy, "sweep": SweepPolicy}
+
+def applySettings(game, settings):
+    '''This function takes a GameSimulation and a list of (name, value) pairs
+    and changes the game's delays or points, e.g. ("spiderDelay", 120) or
+    ("points.scorpion", 500).'''
+    for name, value in settings:
+        if name.startswith("points."):
+            game.points[name[len("points."):]] = value
+        else:
+            setattr(game, name, value)
+
+def playOne(task):
+    '''This function plays one game and returns its result. It takes a tuple of
+    the seed (int), policy name (string), settings (list), maximum number of
+    ticks (int) and how often the mushrooms are counted (ticks). It runs in a
+    worker process.'''
+    seed, policyName, settings, maxTicks, sampleEvery = task
+    game = simulation.GameSimulation(seed=seed)
+    applySettings(game, settings)
+    policy = POLICIES[policyName](seed)
+
+    mushroomCounts = [len(game.mushrooms)]
+    while not game.gameOver and game.tick < maxTicks:
+        game.step(policy(game))
+        if game.tick % sampleEvery == 0:
+            mushroomCounts.append(len(game.mushrooms))
+
+    return {"seed": seed, "score": game.score, "ticks": game.tick,
+            "livesLostCentipede": game.livesLost["centipede"],
+            "livesLostSpider": game.livesLost["spider"],
+            "livesLostFlea": game.livesLost["flea"],
+            "finished": int(game.gameOver),
+            "mushrooms": mushroomCounts}
+
+def initWorker(directory):
+    '''This function runs once in each worker process. It moves to the game's
+    directory so the images are found.'''
+    os.chdir(directory)
+
+def parseSeeds(text):
+    '''This function parses a seed list: "start:stop" or comma-separated
+    seeds.'''
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop)))
+    return [int(seed) for seed in text.split(",")]
+
+def parseSetting(text):
+    '''This function parses a "name=value" setting for --set.'''
+    name, value = text.split("=")
+    if name not in TUNABLES and not (name.startswith("points.") and
+                                     name[len("points."):] in simulation.POINTS):
+        raise argparse.ArgumentTypeError("unknown setting: " + name)
+    return (name, int(value))
+
+def writeColumns(path, results):
+    '''This function writes the per-game results to a columnar file: a .npz of
+    one array per column (the mushroom counts as a 2D array padded with -1),
+    or a CSV file if the path does not end in .npz or NumPy is not installed,
+    in which case a .npz extension is changed to .csv. The file's directory is
+    created if needed. It returns the path written.'''
+    if numpy is None and path.endswith(".npz"):
+        path = path[:-len(".npz")] + ".csv"
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    columns = ("seed", "score", "ticks", "livesLostCentipede", "livesLostSpider",
+               "livesLostFlea", "finished")
+    if numpy is not None and path.endswith(".npz"):
+        arrays = dict((name, numpy.array([result[name] for result in results], dtype=numpy.int64))
+                      for name in columns)
+        width = max(len(result["mushrooms"]) for result in results)
+        samples = numpy.full((len(results), width), -1, dtype=numpy.int32)
+        for row, result in enumerate(results):
+            samples[row, :len(result["mushrooms"])] = result["mushrooms"]
+        arrays["mushrooms"] = samples
+        numpy.savez_compressed(path, **arrays)
+    else:
+        with open(path, "w") as outFile:
+            outFile.write(",".join(columns + ("mushrooms",)) + "\n")
+            for result in results:
+                row = [str(result[name]) for name in columns]
+                row.append(" ".join(str(count) for count in result["mushrooms"]))
+                outFile.write(",".join(row) + "\n")
+    return path
+
+def summarize(results):
+    '''This function prints the mean, p50 and p90 of the score and survival
+    time, and the lives lost to each enemy type.'''
+    for name in ("score", "ticks"):
+        values = sorted(result[name] for result in results)
+        print("%-6s mean %10.1f  p50 %8d  p90 %8d" % (name, sum(values)/len(values),
+              values[len(values)//2], values[int(len(values)*0.9)]))
+    for enemy in ("Centipede", "Spider", "Flea"):
+        print("lives lost to %-9s %d" % (enemy.lower(), sum(result["livesLost"+enemy] for result in results)))
+
+def main():
+    '''This function parses the command line and runs the batch.'''
+    parser = argparse.ArgumentParser(description="Play many seeded, headless Centipede games.")
+    parser.add_argument("--games", type=int, default=100, help="play seeds 0 to GAMES-1")
+    parser.add_argument("--seeds", type=parseSeeds, help='"start:stop" or "1,2,3" (overrides --games)')
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    parser.add_argument("--set", type=parseSetting, action="append", default=[],
+                        metavar="NAME=VALUE", help="change a delay (ticks) or points.<enemy>")
+    parser.add_argument("--max-ticks", type=int, default=simulation.TICK_RATE*60*20)
+    parser.add_argument("--sample-every", type=int, default=simulation.TICK_RATE*10,
+                        help="ticks between mushroom counts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default=os.path.join("batches", "results.npz"),
+                        help=".npz (or .csv) file to write")
+    parser.add_argument("--quiet", action="store_true", help="do not print each game")
+    args = parser.parse_args()
+
+    seeds = args.seeds if args.seeds is not None else list(range(args.games))
+    tasks = [(seed, args.policy, args.set, args.max_ticks, args.sample_every) for seed in seeds]
+    directory = os.path.dirname(os.path.abspath(__file__))
+
+    start = time.perf_counter()
+    results = []
+    with multiprocessing.Pool(args.workers, initWorker, (directory,)) as pool:
+        chunk = max(1, len(tasks)//(args.workers*8))
+        for result in pool.imap_unordered(playOne, tasks, chunk):
+            results.append(result)
+            if not args.quiet:
+                print("seed %6d  score %7d  ticks %7d" % (result["seed"], result["score"], result["ticks"]))
+    elapsed = time.perf_counter() - start
+
+    # Results arrive in any order; sort them so the file is reproducible
+    results.sort(key=lambda result: result["seed"])
+    path = writeColumns(args.out, results)
+
+    ticks = sum(result["ticks"] for result in results)
+    print("%d games, %d ticks in %.1f s (%.0f ticks/s) with %d workers" %
+          (len(results), ticks, elapsed, ticks/elapsed, args.workers))
+    print("results written to " + path)
+    summarize(results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+'''Desc: A reproducible benchmark suite for the game loop of the remake of Atari
+   Centipede. Each scenario drives a seeded GameSimulation headlessly (under the
+   SDL dummy driver) for a fixed number of ticks and times every phase of the
+   loop: events, spawn bookkeeping, laser collisions, mushroom collisions,
+   player collisions, update and draw. The scenarios with thousands of
+   mushrooms run on larger boards, since the 24x32 board only has room for
+   660. The percentiles are printed and can be saved to a JSON baseline file,
+   so a regression shows up as a diff.
+
+   The stress mode runs the same loop on boards of growing size, each with
+   mushrooms on 15% of its cells and a centipede chain for every 4 columns,
+   drawing offscreen, and reports the tick and draw times together with the
+   number of entities, to show how the loop scales with the board.
+
+   Usage:
+       python benchmark.py                       run every scenario
+       python benchmark.py --scenario chains-8   run one scenario
+       python benchmark.py --save baseline.json  save the results
+       python benchmark.py --compare baseline.json
+       python benchmark.py --stress              run the stress boards
+       python benchmark.py --stress --board 48x64x20
+'''
+import os, sys, json, argparse, time
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, simulation, renderer
+
+PHASES = ("events", "spawn", "lasers", "mushrooms", "player", "update", "draw")
+PERCENTILES = (50, 90, 99)
+
+# (cols, rows, cell size) of the stress boards
+STRESS_BOARDS = ((24, 32, 20), (48, 64, 20), (96, 128, 20), (192, 256, 20))
+STRESS_DENSITY = 0.15
+
+def percentile(values, pct):
+    '''This function takes a sorted list of numbers and a percentile (int) and
+    returns the value at that percentile (nearest rank).'''
+    if not values:
+        return 0.0
+    index = max(0, min(len(values)-1, int(round(pct/100*len(values)))-1))
+    return values[index]
+
+def spawnChain(game, xPos):
+    '''This function spawns an extra 12-segment centipede whose head starts at
+    the given x-coordinate (int).'''
+    game.spawnCentipede(12, xPos)
+
+def sweep(tick):
+    '''This input policy sweeps the player left and right without shooting.'''
+    if (tick//45) % 2:
+        return (simulation.LEFT, False)
+    return (simulation.RIGHT, False)
+
+def sweepAndFire(tick):
+    '''This input policy sweeps the player left and right with the fire button
+    held, so a laser is shot at the firing rate limit.'''
+    return (sweep(tick)[0], True)
+
+def makeMushrooms(count):
+    '''This function returns a setup function that fills the field with the
+    given number of mushrooms (int) using the game's seeded generator. Only
+    the interior cells are scattered on (660 on the 24x32 board, 2852 on the
+    48x64 board), so the count is capped there.'''
+    def setup(game):
+        game.mushrooms.scatter(count, game.rng)
+        # Scatter can pick the same cell twice; keep going until the count is met
+        cells = (game.mushrooms.cols-2)*(game.mushrooms.rows-2)
+        while len(game.mushrooms) < min(count, cells):
+            game.mushrooms.scatter(1, game.rng)
+    return setup
+
+def makeChains(count):
+    '''This function returns a setup function that adds centipede chains until
+    there are the given number (int), spread across the top of the board.'''
+    def setup(game):
+        size = game.cellSize
+        for i in range(1, count):
+            spawnChain(game, 2*size + (i*4*size) % (game.bounds.width - 4*size))
+    return setup
+
+def keepEnemiesAlive(game):
+    '''This per-tick hook makes a spider, flea and scorpion spawn as soon as
+    the previous one is gone, so every enemy type is active at once.'''
+    if not game.spiders:
+        game.scheduleSpawn("spider", 0)
+    if not game.fleas:
+        game.scheduleSpawn("flea", 0)
+    if not game.scorpions:
+        game.scheduleSpawn("scorpion", 0)
+
+def allEnemies(game):
+    '''This setup function adds four centipede chains and 200 mushrooms.'''
+    makeMushrooms(200)(game)
+    makeChains(4)(game)
+
+# (cols, rows, cell size) of the default board and of the larger ones
+BOARD = (24, 32, 20)
+LARGE_BOARD = (48, 64, 20)
+HUGE_BOARD = (96, 128, 20)
+
+# name -> (setup, policy, per-tick hook, board)
+SCENARIOS = {
+    "mushrooms-20": (makeMushrooms(20), sweep, None, BOARD),
+    "mushrooms-160": (makeMushrooms(160), sweep, None, BOARD),
+    "mushrooms-320": (makeMushrooms(320), sweep, None, BOARD),
+    "mushrooms-640": (makeMushrooms(640), sweep, None, BOARD),
+    "mushrooms-1280": (makeMushrooms(1280), sweep, None, LARGE_BOARD),
+    "mushrooms-2560": (makeMushrooms(2560), sweep, None, LARGE_BOARD),
+    "mushrooms-5120": (makeMushrooms(5120), sweep, None, HUGE_BOARD),
+    "chains-1": (None, sweep, None, BOARD),
+    "chains-4": (makeChains(4), sweep, None, BOARD),
+    "chains-8": (makeChains(8), sweep, None, BOARD),
+    "laser-spam": (makeMushrooms(200), sweepAndFire, None, BOARD),
+    "all-enemies": (allEnemies, sweepAndFire, keepEnemiesAlive, BOARD),
+}
+
+class PhaseRecorder(object):
+    '''This class collects the time spent in each phase of every tick.'''
+    def __init__(self):
+        '''This initializer has no parameters. It creates an empty list of
+        samples for every phase.'''
+        self.samples = dict((name, []) for name in PHASES)
+        self.current = dict((name, 0.0) for name in PHASES)
+
+    def __call__(self, name, seconds):
+        '''This method adds the time spent in a phase to the current tick.'''
+        self.current[name] += seconds
+
+    def endTick(self):
+        '''This method stores the current tick's timings and starts a new tick.'''
+        for name in PHASES:
+            self.samples[name].append(self.current[name])
+            self.current[name] = 0.0
+
+    def skipTick(self):
+        '''This method drops the current tick's timings and starts a new tick.'''
+        for name in PHASES:
+            self.current[name] = 0.0
+
+    def summarize(self):
+        '''This method returns a dictionary of phase -> statistics in
+        milliseconds (mean, p50, p90, p99, max). A "total" entry covers the
+        whole tick.'''
+        totals = [sum(tick) for tick in zip(*self.samples.values())]
+        summary = {}
+        for name, values in list(self.samples.items()) + [("total", totals)]:
+            ordered = sorted(values)
+            stats = {"mean": sum(ordered)/max(len(ordered), 1)*1000,
+                     "max": (ordered[-1] if ordered else 0.0)*1000}
+            for pct in PERCENTILES:
+                stats["p%d" % pct] = percentile(ordered, pct)*1000
+            summary[name] = dict((key, round(value, 4)) for key, value in stats.items())
+        return summary
+
+def runScenario(name, ticks, seed, vectorized=False):
+    '''This function runs a scenario for the given number of ticks (int) with
+    a seed (int) and returns its summary. The player has unlimited lives so
+    every run lasts the same number of ticks. The ticks spent frozen after a
+    life is lost are not timed.'''
+    setup, policy, hook, board = SCENARIOS[name]
+    cols, rows, cellSize = board
+
+    screen = pygame.display.set_mode((cols*cellSize, rows*cellSize))
+    background = pygame.image.load("images/crystal-cave.jpg").convert()
+    if background.get_size() != screen.get_size():
+        background = pygame.transform.smoothscale(background, screen.get_size())
+    screen.blit(background, (0, 0))
+
+    game = simulation.GameSimulation(seed=seed, lives=ticks+1, vectorized=vectorized,
+                                     cols=cols, rows=rows, cellSize=cellSize)
+    if setup is not None:
+        setup(game)
+    screenRenderer = renderer.DirtyRenderer(screen, background, game.allSprites,
+                                            mushrooms=game.mushrooms)
+
+    recorder = PhaseRecorder()
+    for tick in range(ticks):
+        start = time.perf_counter()
+        pygame.event.get()
+        recorder("events", time.perf_counter()-start)
+
+        if hook is not None:
+            hook(game)
+        wasFrozen = game.frozen
+        game.step(policy(tick), recorder)
+
+        start = time.perf_counter()
+        screenRenderer.draw()
+        recorder("draw", time.perf_counter()-start)
+        # Ticks spent frozen after a life is lost do no work; leave them out
+        if wasFrozen and game.frozen:
+            recorder.skipTick()
+        else:
+            recorder.endTick()
+
+    summary = recorder.summarize()
+    summary["entities"] = {"mushrooms": len(game.mushrooms), "sprites": len(game.allSprites)}
+    summary["repainted"] = round(screenRenderer.getStats()["averageFraction"], 4)
+    return summary
+
+def runStress(board, ticks, seed, vectorized=False):
+    '''This function runs the stress scenario on a board given as (cols, rows,
+    cell size) for the given number of ticks (int) with a seed (int), drawing
+    to an offscreen surface, and returns a dictionary with the tick and draw
+    time statistics (ms) of the ticks not spent frozen and the mean number of
+    each kind of entity.'''
+    cols, rows, cellSize = board
+    game = simulation.GameSimulation(seed=seed, lives=ticks+1, vectorized=vectorized,
+                                     cols=cols, rows=rows, cellSize=cellSize)
+    chains = max(1, cols//4)
+    makeMushrooms(int(cols*rows*STRESS_DENSITY))(game)
+    makeChains(chains)(game)
+
+    screen = pygame.Surface(game.bounds.size).convert()
+    background = pygame.transform.smoothscale(
+        pygame.image.load("images/crystal-cave.jpg").convert(), game.bounds.size)
+    screen.blit(background, (0, 0))
+    screenRenderer = renderer.DirtyRenderer(screen, background, game.allSprites,
+                                            mushrooms=game.mushrooms, present=False)
+
+    tickTimes, drawTimes = [], []
+    counts = dict((name, 0) for name in ("mushrooms", "chains", "segments", "lasers", "sprites"))
+    for tick in range(ticks):
+        keepEnemiesAlive(game)
+        wasFrozen = game.frozen
+        start = time.perf_counter()
+        game.step(sweepAndFire(tick))
+        tickTime = time.perf_counter()-start
+
+        start = time.perf_counter()
+        screenRenderer.draw()
+        if not (wasFrozen and game.frozen):
+            tickTimes.append(tickTime)
+            drawTimes.append(time.perf_counter()-start)
+
+        counts["mushrooms"] += len(game.mushrooms)
+        counts["chains"] += len(game.chains)
+        counts["segments"] += len(game.centipedes)
+        counts["lasers"] += len(game.lasers)
+        counts["sprites"] += len(game.allSprites)
+
+    summary = {"board": "%dx%dx%d" % board, "chains": chains,
+               "entities": dict((name, round(total/max(ticks, 1), 1)) for name, total in counts.items()),
+               "repainted": round(screenRenderer.getStats()["averageFraction"], 4)}
+    for name, values in (("tick", tickTimes), ("draw", drawTimes)):
+        ordered = sorted(values)
+        summary[name] = {"mean": round(sum(ordered)/max(len(ordered), 1)*1000, 4),
+                         "p99": round(percentile(ordered, 99)*1000, 4)}
+    return summary
+
+def parseBoard(value):
+    '''This function parses a board given on the command line as
+    COLSxROWSxCELL (string) and returns (cols, rows, cell size).'''
+    try:
+        cols, rows, cellSize = (int(part) for part in value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("a board is given as COLSxROWSxCELL, e.g. 48x64x20")
+    if cellSize <= 0 or cellSize % simulation.CENTIPEDE_SPEED or cols < 8 or rows < 12:
+        raise argparse.ArgumentTypeError("a board needs at least 8x12 cells of a multiple of %d px"
+                                         % simulation.CENTIPEDE_SPEED)
+    return (cols, rows, cellSize)
+
+def compare(results, baseline):
+    '''This function prints the change in mean and p99 tick time of every
+    scenario against a baseline dictionary.'''
+    for name, summary in sorted(results["scenarios"].items()):
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            print("%-16s (not in baseline)" % name)
+            continue
+        for stat in ("mean", "p99"):
+            before, after = old["total"][stat], summary["total"][stat]
+            change = (after-before)/before*100 if before else 0.0
+            print("%-16s total %-4s %8.3f ms -> %8.3f ms (%+.1f%%)" % (name, stat, before, after, change))
+
+def main():
+    '''This function parses the command line and runs the benchmark.'''
+    parser = argparse.ArgumentParser(description="Benchmark the Centipede game loop.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (default: all)")
+    parser.add_argument("--ticks", type=int, default=900, help="ticks per scenario")
+    parser.add_argument("--seed", type=int, default=2019)
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy entity engine")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare against this JSON baseline")
+    parser.add_argument("--stress", action="store_true",
+                        help="run the stress scenario on boards of growing size instead")
+    parser.add_argument("--board", action="append", type=parseBoard, metavar="COLSxROWSxCELL",
+                        help="with --stress, a board to run (default: %s)"
+                        % ", ".join("%dx%dx%d" % board for board in STRESS_BOARDS))
+    args = parser.parse_args()
+
+    # Work from the game's directory so the assets are found
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    pygame.init()
+
+    results = {"ticks": args.ticks, "seed": args.seed, "vectorized": args.vectorized,
+               "python": sys.version.split()[0], "pygame": pygame.version.ver,
+               "scenarios": {}}
+    if args.stress:
+        # The boards are drawn offscreen, so the window only sets the pixel format
+        pygame.display.set_mode((1, 1))
+        results["stress"] = []
+        for board in args.board or STRESS_BOARDS:
+            summary = runStress(board, args.ticks, args.seed, args.vectorized)
+            results["stress"].append(summary)
+            entities = summary["entities"]
+            print("%-12s tick %8.3f/%8.3f  draw %8.3f/%8.3f  mushrooms %7.1f  segments %6.1f  "
+                  "chains %5.1f  lasers %4.1f  sprites %6.1f  repainted %5.1f%%"
+                  % (summary["board"], summary["tick"]["mean"], summary["tick"]["p99"],
+                     summary["draw"]["mean"], summary["draw"]["p99"], entities["mushrooms"],
+                     entities["segments"], entities["chains"], entities["lasers"], entities["sprites"],
+                     summary["repainted"]*100))
+        print("(mean/p99 in ms per tick)")
+        if args.save:
+            with open(args.save, "w") as outFile:
+                json.dump(results, outFile, indent=2, sort_keys=True)
+                outFile.write("\n")
+        pygame.quit()
+        return
+
+    for name in args.scenario or sorted(SCENARIOS):
+        summary = runScenario(name, args.ticks, args.seed, args.vectorized)
+        results["scenarios"][name] = summary
+        print("%-16s %s  repainted %.1f%%" %
+              (name, "  ".join("%s %.3f/%.3f" % (phase, summary[phase]["p50"], summary[phase]["p99"])
+                               for phase in PHASES + ("total",)), summary["repainted"]*100))
+    print("(p50/p99 in ms per tick; repainted is the mean fraction of the screen redrawn per frame)")
+
+    if args.compare:
+        with open(args.compare) as baselineFile:
+            compare(results, json.load(baselineFile))
+    if args.save:
+        with open(args.save, "w") as outFile:
+            json.dump(results, outFile, indent=2, sort_keys=True)
+            outFile.write("\n")
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
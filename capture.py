@@ -0,0 +1,308 @@
+'''Desc: Gameplay capture for the remake of Atari Centipede. A FrameCapture
+   copies the screen into one of a few preallocated surfaces after it is
+   drawn (a single blit, well under a millisecond) and hands it to a writer
+   thread. The writer converts the frame to RGB, XORs it with the previous
+   frame so that everything that did not change becomes zeros, compresses it
+   and appends it to a chunked file. If the writer falls behind and every
+   surface is still waiting, the frame is dropped and counted instead of
+   making the game wait.
+
+   Every keyframeEvery frames a keyframe is stored in full, and closing the
+   file appends an index of the keyframes and the number of frames dropped,
+   so a frame can be found without decoding the whole file. A file whose
+   index is missing (e.g. the game crashed) is still readable by scanning its
+   chunks.
+
+   Usage:
+       python capture.py info game.ccap
+       python capture.py export game.ccap frames/ --start 300 --end 600
+'''
+import os, sys, time, struct, zlib, threading, queue, argparse
+import pygame
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MAGIC = b"CCAP"
+VERSION = 2
+END = b"CEND"
+
+# magic, version, width, height, frames per second, keyframe interval
+HEADER = struct.Struct("<4sHHHHH")
+# kind, frame number, time since the capture started (ms), length of the data
+CHUNK = struct.Struct("<BIII")
+KEYFRAME, DELTA, INDEX = 1, 2, 3
+# One keyframe in the index: frame number, offset of its chunk
+INDEX_ENTRY = struct.Struct("<IQ")
+# Offset of the index chunk, frames dropped, END
+TRAILER = struct.Struct("<QI4s")
+
+def xorFrames(frame, previous):
+    '''This function returns the bytes of two frames of equal length XORed
+    together, which are zero wherever they are the same.'''
+    if numpy is not None:
+        return numpy.bitwise_xor(numpy.frombuffer(frame, dtype=numpy.uint8),
+                                 numpy.frombuffer(previous, dtype=numpy.uint8)).tobytes()
+    return (int.from_bytes(frame, "little") ^ int.from_bytes(previous, "little")).to_bytes(len(frame), "little")
+
+class FrameCapture(object):
+    '''This class records the frames drawn on a surface to a capture file
+    from a background thread.'''
+    def __init__(self, path, screen, fps=30, ringSize=8, keyframeEvery=30, level=1):
+        '''This initializer takes the path of the file to write (string), the
+        surface to capture (its size and pixel format are used), the frames
+        per second (int), the number of frames (int) that can wait for the
+        writer, the frames between keyframes (int) and the zlib level (int).
+        The file's directory is created if needed.'''
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.size = screen.get_size()
+        self.keyframeEvery = keyframeEvery
+        self.level = level
+
+        # Surfaces a frame is copied into, and the queues of free and filled ones
+        self.ring = [screen.copy() for i in range(ringSize)]
+        self.free = queue.Queue()
+        for slot in range(ringSize):
+            self.free.put(slot)
+        self.filled = queue.Queue()
+
+        self.outFile = open(path, "wb")
+        self.outFile.write(HEADER.pack(MAGIC, VERSION, self.size[0], self.size[1], fps, keyframeEvery))
+        self.keyframes = []
+        self.origin = time.perf_counter()
+        self.frame = 0
+
+        # Statistics; the game thread's time to capture a frame, and the
+        # writer's time to encode and write one
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.bytesWritten = HEADER.size
+        self.captureTime = 0.0
+        self.longestCapture = 0.0
+        self.encodeTime = 0.0
+
+        self.writer = threading.Thread(target=self.write, name="capture writer", daemon=True)
+        self.writer.start()
+
+    def capture(self, screen):
+        '''This method copies the surface for the writer. It returns False if
+        the frame was dropped because the writer is behind.'''
+        start = time.perf_counter()
+        frame = self.frame
+        self.frame += 1
+        try:
+            slot = self.free.get_nowait()
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        self.ring[slot].blit(screen, (0, 0))
+        self.filled.put((slot, frame, int((start - self.origin)*1000)))
+        self.captured += 1
+        elapsed = time.perf_counter() - start
+        self.captureTime += elapsed
+        self.longestCapture = max(self.longestCapture, elapsed)
+        return True
+
+    def write(self):
+        '''This method runs on the writer thread. It encodes and writes the
+        captured frames until close() is called.'''
+        previous = None
+        while True:
+            item = self.filled.get()
+            if item is None:
+                break
+            slot, frame, ms = item
+            start = time.perf_counter()
+            pixels = pygame.image.tobytes(self.ring[slot], "RGB")
+            self.free.put(slot)
+            if previous is None or self.written % self.keyframeEvery == 0:
+                kind = KEYFRAME
+                data = zlib.compress(pixels, self.level)
+                self.keyframes.append((frame, self.bytesWritten))
+            else:
+                kind = DELTA
+                data = zlib.compress(xorFrames(pixels, previous), self.level)
+            previous = pixels
+            self.outFile.write(CHUNK.pack(kind, frame, ms, len(data)))
+            self.outFile.write(data)
+            self.bytesWritten += CHUNK.size + len(data)
+            self.written += 1
+            self.encodeTime += time.perf_counter() - start
+
+    def close(self):
+        '''This method waits for the writer to finish the frames captured so
+        far, then writes the index and closes the file.'''
+        self.filled.put(None)
+        self.writer.join()
+        index = b"".join(INDEX_ENTRY.pack(frame, offset) for frame, offset in self.keyframes)
+        indexOffset = self.bytesWritten
+        self.outFile.write(CHUNK.pack(INDEX, 0, 0, len(index)))
+        self.outFile.write(index)
+        self.outFile.write(TRAILER.pack(indexOffset, self.dropped, END))
+        self.outFile.close()
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of frames
+        captured, dropped and written, the bytes written, the mean and longest
+        time to capture a frame on the game thread (ms) and the mean time to
+        encode one on the writer thread (ms).'''
+        return {"captured": self.captured, "dropped": self.dropped, "written": self.written,
+                "bytes": self.bytesWritten,
+                "captureTime": self.captureTime/max(self.captured, 1)*1000,
+                "longestCapture": self.longestCapture*1000,
+                "encodeTime": self.encodeTime/max(self.written, 1)*1000}
+
+class CaptureReader(object):
+    '''This class reads the frames of a capture file.'''
+    def __init__(self, path):
+        '''This initializer takes the path of a capture file (string) and
+        reads its header and keyframe index. It raises ValueError if the file
+        is not a capture of this version.'''
+        self.inFile = open(path, "rb")
+        data = self.inFile.read(HEADER.size)
+        if len(data) < HEADER.size:
+            raise ValueError("not a capture")
+        magic, version, width, height, self.fps, self.keyframeEvery = HEADER.unpack(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a capture, or an unsupported version")
+        self.size = (width, height)
+
+        # (frame number, offset) of every keyframe, and the frames dropped
+        # (None if the file has no index)
+        self.dropped = None
+        self.keyframes = self.readIndex()
+        self.complete = self.keyframes is not None
+        if self.keyframes is None:
+            self.keyframes = [(frame, offset) for kind, frame, ms, offset, length in self.scan()
+                              if kind == KEYFRAME]
+
+    def readIndex(self):
+        '''This method returns the keyframe index stored at the end of the
+        file, or None if there is none, and reads the number of frames
+        dropped.'''
+        self.inFile.seek(0, os.SEEK_END)
+        end = self.inFile.tell()
+        if end < HEADER.size + TRAILER.size:
+            return None
+        self.inFile.seek(end - TRAILER.size)
+        indexOffset, dropped, magic = TRAILER.unpack(self.inFile.read(TRAILER.size))
+        if magic != END:
+            return None
+        self.inFile.seek(indexOffset)
+        kind, frame, ms, length = CHUNK.unpack(self.inFile.read(CHUNK.size))
+        if kind != INDEX:
+            return None
+        data = self.inFile.read(length)
+        self.dropped = dropped
+        return [INDEX_ENTRY.unpack_from(data, i) for i in range(0, length, INDEX_ENTRY.size)]
+
+    def scan(self, offset=HEADER.size):
+        '''This generator reads the chunk headers from the given offset and
+        yields (kind, frame number, ms, offset, length of the data) for every
+        frame, stopping at the index or at a chunk cut short.'''
+        fileLength = self.getLength()
+        while True:
+            self.inFile.seek(offset)
+            data = self.inFile.read(CHUNK.size)
+            if len(data) < CHUNK.size:
+                return
+            kind, frame, ms, length = CHUNK.unpack(data)
+            if kind not in (KEYFRAME, DELTA) or offset + CHUNK.size + length > fileLength:
+                return
+            yield kind, frame, ms, offset, length
+            offset += CHUNK.size + length
+
+    def getLength(self):
+        '''This accessor returns the length of the file in bytes.'''
+        return os.fstat(self.inFile.fileno()).st_size
+
+    def frames(self, start=0, end=None):
+        '''This generator yields (frame number, ms, RGB bytes) for the frames
+        numbered from start to end (ints, end excluded; None for the last),
+        decoding from the last keyframe at or before start.'''
+        offset = HEADER.size
+        for frame, keyOffset in self.keyframes:
+            if frame > start:
+                break
+            offset = keyOffset
+        pixels = None
+        for kind, frame, ms, chunkOffset, length in self.scan(offset):
+            if end is not None and frame >= end:
+                return
+            self.inFile.seek(chunkOffset + CHUNK.size)
+            try:
+                data = zlib.decompress(self.inFile.read(length))
+            except zlib.error:
+                return
+            if kind == KEYFRAME:
+                pixels = data
+            elif pixels is not None:
+                pixels = xorFrames(data, pixels)
+            else:
+                continue
+            if frame >= start:
+                yield frame, ms, pixels
+
+    def close(self):
+        '''This method closes the file.'''
+        self.inFile.close()
+
+def export(reader, directory, start=0, end=None, every=1):
+    '''This function saves every given frame (int) numbered from start to end
+    as frame-NNNNNN.png in a directory (string), and returns how many were
+    saved.'''
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    for frame, ms, pixels in reader.frames(start, end):
+        if (frame - start) % every:
+            continue
+        image = pygame.image.frombytes(pixels, reader.size, "RGB")
+        pygame.image.save(image, os.path.join(directory, "frame-%06d.png" % frame))
+        saved += 1
+    return saved
+
+def main():
+    '''This function parses the command line and prints a capture's details
+    or exports its frames.'''
+    parser = argparse.ArgumentParser(description="Read a Centipede capture file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info = commands.add_parser("info", help="print the size, frames and gaps of a capture")
+    info.add_argument("path")
+    exporter = commands.add_parser("export", help="save frames as PNG images")
+    exporter.add_argument("path")
+    exporter.add_argument("directory")
+    exporter.add_argument("--start", type=int, default=0, help="first frame")
+    exporter.add_argument("--end", type=int, default=None, help="frame to stop before")
+    exporter.add_argument("--every", type=int, default=1, help="save every Nth frame")
+    args = parser.parse_args()
+
+    try:
+        reader = CaptureReader(args.path)
+    except ValueError as error:
+        sys.exit("%s: %s" % (args.path, error))
+    if args.command == "info":
+        chunks = list(reader.scan())
+        numbers = [chunk[1] for chunk in chunks]
+        print("%dx%d at %d fps, %d frames written, %d keyframes, %s index" %
+              (reader.size[0], reader.size[1], reader.fps, len(chunks), len(reader.keyframes),
+               "with an" if reader.complete else "no"))
+        if numbers:
+            # Without an index, only the drops between written frames are known
+            dropped = reader.dropped
+            if dropped is None:
+                dropped = numbers[-1] - numbers[0] + 1 - len(numbers)
+            print("frames %d to %d (%.1f s), %d dropped, %.1f KB per frame" %
+                  (numbers[0], numbers[-1], chunks[-1][2]/1000, dropped,
+                   reader.getLength()/len(numbers)/1024))
+    else:
+        print("%d frames saved" % export(reader, args.directory, args.start, args.end, args.every))
+    reader.close()
+
+if __name__ == "__main__":
+    main()
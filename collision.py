@@ -0,0 +1,219 @@
+'''Desc: Collision detection for the remake of Atari Centipede. Each tick the
+   sprites that can be hit are put in a SpatialHash over the board's
+   cells, so a sprite is only tested against the sprites that share a cell
+   with it, not against whole groups. Mushrooms are not hashed, since the
+   MushroomField is already indexed by cell.
+
+   What happens when two kinds of sprites meet is declared as rules in a
+   Collider's dispatch table instead of being written as nested loops:
+
+       collider = collision.Collider(mushrooms)
+       collider.addGroup("centipede", centipedes)
+       collider.addRule("mushrooms", "centipede", collision.MUSHROOM, onMushroom)
+       ...
+       collider.reset()             # once per tick, before anything is tested
+       collider.resolve("mushrooms")
+'''
+
+# The kind of the mushrooms in the field, which are not a sprite group
+MUSHROOM = "mushroom"
+
+# A cell is keyed by row*ROW_KEY + col, which stays unique for cells off the
+# board (e.g. a negative column) as long as |col| < ROW_KEY/2
+ROW_KEY = 1 << 16
+
+class SpatialHash(object):
+    '''This class buckets sprites by the board cells their rects overlap.'''
+    def __init__(self, cellSize=20):
+        '''This initializer takes the size of a cell in pixels (int).'''
+        self.cellSize = cellSize
+
+        # cell key -> list of (serial, kind, sprite)
+        self.buckets = {}
+        self.count = 0
+
+    def clear(self):
+        '''This method removes every sprite.'''
+        self.buckets = {}
+        self.count = 0
+
+    def insert(self, kind, sprite):
+        '''This method adds a sprite of the given kind (string) to every cell
+        its rect overlaps. Cells off the board are used as they are, so sprites
+        that are partly off it are still hashed by where they are.'''
+        self.count += 1
+        entry = (self.count, kind, sprite)
+        buckets = self.buckets
+        rect = sprite.rect
+        size = self.cellSize
+        left = rect.left//size
+        right = (rect.right-1)//size
+        for row in range(rect.top//size, (rect.bottom-1)//size + 1):
+            start = row*ROW_KEY
+            for key in range(start + left, start + right + 1):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = [entry]
+                else:
+                    bucket.append(entry)
+
+    def query(self, rect, kinds):
+        '''This method returns a list of (kind, sprite) for the sprites whose
+        kind is in kinds (a collection of strings) that share a cell with the
+        rect, each once and in the order they were inserted. Their rects are
+        not tested against it.'''
+        found = {}
+        buckets = self.buckets
+        size = self.cellSize
+        left = rect.left//size
+        right = (rect.right-1)//size
+        for row in range(rect.top//size, (rect.bottom-1)//size + 1):
+            start = row*ROW_KEY
+            for key in range(start + left, start + right + 1):
+                if key in buckets:
+                    for serial, kind, sprite in buckets[key]:
+                        if kind in kinds:
+                            found[serial] = (kind, sprite)
+        if len(found) < 2:
+            return list(found.values())
+        return [found[serial] for serial in sorted(found)]
+
+class Collider(object):
+    '''This class holds named sprite groups and a dispatch table of rules, each
+    saying what happens when a sprite of one kind overlaps a sprite (or a
+    mushroom) of another kind. It counts the candidate pairs it tests and the
+    hits it dispatches.'''
+    def __init__(self, mushrooms):
+        '''This initializer takes the MushroomField the sprites move over.'''
+        self.mushrooms = mushrooms
+        self.hash = SpatialHash(mushrooms.cellSize)
+
+        # kind -> sprite group, and kind -> function giving a projectile's sweep
+        self.groups = {}
+        self.sweeps = {}
+
+        # (stage, kind, other kind, handler), in the order they are tested,
+        # and the same rules by stage
+        self.rules = []
+        self.stages = {}
+
+        # Whether the hash must be rebuilt before the next resolve()
+        self.stale = True
+
+        # Candidate pairs tested and hits dispatched since the last reset()
+        self.candidates = 0
+        self.hits = 0
+
+    def addGroup(self, kind, group, sweep=None):
+        '''This method takes a kind (string) and the sprite group holding the
+        sprites of that kind. If a sweep is given, the kind is a projectile:
+        sweep(sprite) must return the rect the sprite covered since the last
+        tick, and the sprite only hits the first target it reached in that
+        rect. Projectiles travel up the screen, so that is the lowest one.'''
+        self.groups[kind] = group
+        if sweep is not None:
+            self.sweeps[kind] = sweep
+
+    def addRule(self, stage, kind, other, handler):
+        '''This method adds a rule to the dispatch table. It takes the stage
+        (string) the rule is resolved in, the kind of sprite it applies to, the
+        kind it hits (or MUSHROOM) and the handler. The handler is called as
+        handler(sprite, target, other), where target is a sprite, or the
+        (col, row) of the cell for a mushroom. A handler that returns True
+        stops the stage.'''
+        rule = (stage, kind, other, handler)
+        self.rules.append(rule)
+        self.stages.setdefault(stage, []).append(rule)
+
+    def reset(self):
+        '''This method is called at the start of a tick. It clears the counters
+        and makes the next resolve() rebuild the hash, since the sprites have
+        moved.'''
+        self.stale = True
+        self.candidates = 0
+        self.hits = 0
+
+    def build(self):
+        '''This method puts every sprite that some rule can hit in the hash.'''
+        self.hash.clear()
+        targets = set(rule[2] for rule in self.rules)
+        for kind, group in self.groups.items():
+            if kind in targets:
+                for sprite in group:
+                    self.hash.insert(kind, sprite)
+        self.stale = False
+
+    def getTargets(self, rect, other):
+        '''This method returns the live targets of the given kind (string) that
+        the rect overlaps: (col, row) cells for MUSHROOM, sprites otherwise.'''
+        if other == MUSHROOM:
+            cells = list(self.mushrooms.cellsOverlapping(rect))
+            self.candidates += len(cells)
+            return cells
+        targets = []
+        for kind, sprite in self.hash.query(rect, (other,)):
+            self.candidates += 1
+            if sprite.alive() and rect.colliderect(sprite.rect):
+                targets.append(sprite)
+        return targets
+
+    def resolve(self, stage):
+        '''This method tests the rules of the given stage (string) in the order
+        they were added and calls the handler for every hit. It returns True if
+        a handler stopped the stage.'''
+        if self.stale:
+            self.build()
+        rules = self.stages.get(stage, ())
+        done = set()
+        for stage, kind, other, handler in rules:
+            if kind in self.sweeps:
+                # A projectile's rules are resolved together, the first time
+                # one of them comes up
+                if kind not in done:
+                    done.add(kind)
+                    if self.resolveProjectiles(kind, [rule for rule in rules if rule[1] == kind]):
+                        return True
+                continue
+            for sprite in self.groups[kind].sprites():
+                if not sprite.alive():
+                    continue
+                for target in self.getTargets(sprite.rect, other):
+                    self.hits += 1
+                    if handler(sprite, target, other):
+                        return True
+        return False
+
+    def resolveProjectiles(self, kind, rules):
+        '''This method takes a projectile kind (string) and its rules, and
+        calls the handler of the first target each projectile reached. Targets
+        level with each other are taken in the order of the rules. It returns
+        True if a handler stopped the stage.'''
+        sweep = self.sweeps[kind]
+        size = self.mushrooms.cellSize
+        # target kind -> (order, handler)
+        dispatch = dict((rule[2], (order, rule[3])) for order, rule in enumerate(rules))
+        mushroomOrder = dispatch[MUSHROOM][0] if MUSHROOM in dispatch else None
+
+        for sprite in self.groups[kind].sprites():
+            rect = sweep(sprite)
+            # ((bottom, -order), target kind, target) of the first target
+            first = None
+            if mushroomOrder is not None:
+                # Only the lowest mushroom can be the first one reached
+                cell = self.mushrooms.lowestCellOverlapping(rect)
+                if cell is not None:
+                    self.candidates += 1
+                    first = (((cell[1]+1)*size, -mushroomOrder), MUSHROOM, cell)
+            for other, target in self.hash.query(rect, dispatch):
+                self.candidates += 1
+                if target.alive() and rect.colliderect(target.rect):
+                    key = (target.rect.bottom, -dispatch[other][0])
+                    # Strictly greater, so the first of equal targets is kept
+                    if first is None or key > first[0]:
+                        first = (key, other, target)
+            if first is not None:
+                self.hits += 1
+                key, other, target = first
+                if dispatch[other][1](sprite, target, other):
+                    return True
+        return False
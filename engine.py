@@ -0,0 +1,152 @@
+'''Desc: An optional vectorized entity engine for the remake of Atari
+   Centipede. The positions and velocities of every spider, flea, scorpion
+   and laser are stored in NumPy arrays (one entry per sprite), and a tick
+   advances all of them with batched array operations instead of calling each
+   sprite's update() method. The sprites are kept only as views: after each
+   tick their rects are written back from the arrays. Centipedes are not
+   stored here, since a CentipedeChain already moves all of its segments with
+   one decision per tick.
+
+   NumPy is optional. If it is not installed, AVAILABLE is False and
+   GameSimulation falls back to the per-sprite update() methods.
+'''
+import sprites
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+AVAILABLE = numpy is not None
+
+# Kinds of entity
+SPIDER, FLEA, SCORPION, LASER = range(4)
+
+KINDS = {sprites.Spider: SPIDER,
+         sprites.Flea: FLEA,
+         sprites.Scorpion: SCORPION,
+         sprites.Laser: LASER}
+
+class EntityEngine(object):
+    '''This class stores every moving enemy but the centipedes, and every
+    laser, in a struct of arrays and moves them all at once. Slots of killed
+    sprites are reused.'''
+    def __init__(self, mushrooms, bounds, capacity=64):
+        '''This initializer takes the MushroomField (whose cell size the
+        spiders' area is measured in), the screen's rect and an initial
+        capacity (int). It raises RuntimeError if NumPy is not installed.'''
+        if numpy is None:
+            raise RuntimeError("the vectorized engine needs NumPy")
+
+        self.mushrooms = mushrooms
+        self.bounds = bounds
+
+        self.capacity = 0
+        self.sprites = []
+        self.free = []
+        # sprite -> its slot; a pooled sprite can be added again before
+        # writeBack() has noticed that it died
+        self.slots = {}
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        '''This method enlarges every array to the given capacity (int),
+        keeping the current contents.'''
+        old = self.capacity
+        def resize(array, dtype):
+            new = numpy.zeros(capacity, dtype=dtype)
+            if old:
+                new[:old] = array
+            return new
+
+        self.x = resize(getattr(self, "x", None), numpy.int32)
+        self.y = resize(getattr(self, "y", None), numpy.int32)
+        self.dx = resize(getattr(self, "dx", None), numpy.int32)
+        self.dy = resize(getattr(self, "dy", None), numpy.int32)
+        self.kind = resize(getattr(self, "kind", None), numpy.int8)
+        self.alive = resize(getattr(self, "alive", None), numpy.bool_)
+
+        self.sprites.extend([None]*(capacity-old))
+        self.free.extend(range(capacity-1, old-1, -1))
+        self.capacity = capacity
+
+    def __len__(self):
+        '''This method returns the number of entities in the engine.'''
+        return self.capacity - len(self.free)
+
+    def add(self, sprite):
+        '''This method takes a Spider, Flea, Scorpion or Laser sprite and copies
+        its state into a free slot. The sprite is moved by the engine from
+        then on.'''
+        if sprite in self.slots:
+            self.release(self.slots[sprite])
+        if not self.free:
+            self.grow(self.capacity*2)
+        slot = self.free.pop()
+        kind = KINDS[type(sprite)]
+
+        self.sprites[slot] = sprite
+        self.slots[sprite] = slot
+        self.kind[slot] = kind
+        self.alive[slot] = True
+        self.x[slot], self.y[slot] = sprite.rect.center
+        self.dx[slot] = getattr(sprite, "dx", 0)
+        self.dy[slot] = getattr(sprite, "dy", 0)
+        if kind == LASER:
+            self.dy[slot] = -20
+
+    def release(self, slot):
+        '''This method frees the given slot (int).'''
+        del self.slots[self.sprites[slot]]
+        self.sprites[slot] = None
+        self.alive[slot] = False
+        self.free.append(slot)
+
+    def step(self):
+        '''This method advances every entity by one tick.'''
+        alive = self.alive
+        size = self.mushrooms.cellSize
+        half = size//2
+
+        # Spiders bounce between the top of the last 8 rows and the bottom
+        spy = numpy.flatnonzero(alive & (self.kind == SPIDER))
+        if len(spy):
+            y = self.y[spy]
+            bounce = (y-half < self.bounds.height - 8*size) | (y+half > self.bounds.bottom)
+            self.dy[spy] = numpy.where(bounce, -self.dy[spy], self.dy[spy])
+
+        # Everything moves in a straight line
+        self.x[alive] += self.dx[alive]
+        self.y[alive] += self.dy[alive]
+
+    def writeBack(self):
+        '''This method copies the arrays back into the sprites' rects, releases
+        the slots of sprites that were killed and releases lasers the engine
+        has moved off the screen.'''
+        slots = numpy.flatnonzero(self.alive).tolist()
+        xs = self.x[slots].tolist()
+        ys = self.y[slots].tolist()
+        dys = self.dy[slots].tolist()
+        kinds = self.kind[slots].tolist()
+        for slot, x, y, dy, kind in zip(slots, xs, ys, dys, kinds):
+            sprite = self.sprites[slot]
+            if not sprite.alive():
+                self.release(slot)
+                continue
+            sprite.rect.center = (x, y)
+            if kind == LASER:
+                sprite.travel = -dy
+                if sprite.rect.bottom <= 0:
+                    sprite.release()
+                    self.release(slot)
+
+    def syncSprites(self):
+        '''This method copies the velocity of every live entity into its
+        sprite, which writeBack() leaves alone (e.g. to take a snapshot of the
+        game).'''
+        for slot in numpy.flatnonzero(self.alive).tolist():
+            sprite = self.sprites[slot]
+            if self.kind[slot] == LASER:
+                continue
+            sprite.dx = int(self.dx[slot])
+            sprite.dy = int(self.dy[slot])
@@ -0,0 +1,198 @@
+'''Desc: A vectorized, Gym-style training environment for the remake of Atari
+   Centipede. A VectorEnv steps N headless GameSimulations in lockstep and
+   returns batched NumPy arrays. The default observation is a compact grid
+   tensor of shape (N, CHANNELS, 32, 24), one cell per 20 px square of the
+   board, built straight from the game state without drawing anything.
+   Downsampled RGB frames can be requested as an extra observation.
+
+   Usage:
+       vec = env.VectorEnv(8)
+       obs = vec.reset(range(8))
+       obs, rewards, dones, infos = vec.step([env.FIRE]*8)
+
+   NumPy is required.
+'''
+import os
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, assets, simulation, renderer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Channels of the grid observation
+MUSHROOM_HEALTH, MUSHROOM_POISON, CENTIPEDE_HEADS, CENTIPEDE_BODIES, SPIDER, FLEA, \
+    SCORPION, PLAYER, LASERS = range(9)
+CHANNELS = 9
+
+# Actions are indices into this list of (direction, fire) inputs
+ACTIONS = [(direction, fire) for fire in (False, True)
+           for direction in (simulation.STILL, simulation.UP, simulation.DOWN,
+                             simulation.LEFT, simulation.RIGHT)]
+NOOP, FIRE = 0, 5
+
+def markCentipedes(grid, chains, field):
+    '''This function takes a grid observation of one game, its centipede
+    chains (list of CentipedeChains) and MushroomField, and marks the cell of
+    each chain's head as a head and the cells of its other segments as body.'''
+    size = field.cellSize
+    for chain in chains:
+        for i, cent in enumerate(chain.segments):
+            col, row = cent.rect.centerx//size, cent.rect.centery//size
+            if 0 <= col < field.cols and 0 <= row < field.rows:
+                if i:
+                    grid[CENTIPEDE_BODIES, row, col] = 1
+                else:
+                    grid[CENTIPEDE_HEADS, row, col] = 1
+
+def markGroup(grid, channel, group, field):
+    '''This function marks the cell under the center of every sprite in a group
+    in the given channel of a grid observation.'''
+    size = field.cellSize
+    for sprite in group:
+        col = sprite.rect.centerx//size
+        row = sprite.rect.centery//size
+        if 0 <= col < field.cols and 0 <= row < field.rows:
+            grid[channel, row, col] = 1
+
+class VectorEnv(object):
+    '''This class runs a batch of games that are reset and stepped together.
+    A game that ends is reset straight away with its next seed, so the batch
+    never has to wait for the slowest game.'''
+    def __init__(self, numEnvs, pixels=False, pixelScale=4, maxTicks=simulation.TICK_RATE*60*20,
+                 lives=3, vectorized=False):
+        '''This initializer takes the number of games (int), whether to also
+        return RGB frames (boolean), the factor the 480x640 frames are shrunk
+        by (int), the number of ticks after which a game is cut short (int),
+        the number of lives (int) and whether the games use the vectorized
+        EntityEngine (boolean). It raises RuntimeError if NumPy is not
+        installed.'''
+        if numpy is None:
+            raise RuntimeError("the training environment needs NumPy")
+
+        self.numEnvs = numEnvs
+        self.pixels = pixels
+        self.pixelScale = pixelScale
+        self.maxTicks = maxTicks
+        self.lives = lives
+        self.vectorized = vectorized
+
+        self.games = [None]*numEnvs
+        self.seeds = [None]*numEnvs
+        self.lastScores = [0]*numEnvs
+
+        # The grid observations are written into this array on every step
+        self.grids = None
+
+        # Offscreen canvas for the pixel observations, and the background with
+        # the mushrooms of each game drawn on it
+        self.canvas = None
+        self.background = None
+        self.layers = [None]*numEnvs
+        if pixels:
+            self.canvas = pygame.Surface((480, 640))
+            self.background = assets.getImage("images/crystal-cave.jpg", (480, 640))
+
+    def resetOne(self, index, seed):
+        '''This method starts a new game in the given slot (int) with a seed.'''
+        self.games[index] = simulation.GameSimulation(seed=seed, lives=self.lives,
+                                                      vectorized=self.vectorized)
+        self.seeds[index] = seed
+        self.lastScores[index] = 0
+
+    def reset(self, seeds=None):
+        '''This method takes an optional sequence of one seed per game and
+        starts every game over. It returns the first observations.'''
+        if seeds is None:
+            seeds = [None]*self.numEnvs
+        seeds = list(seeds)
+        if len(seeds) != self.numEnvs:
+            raise ValueError("expected %d seeds, got %d" % (self.numEnvs, len(seeds)))
+        for index, seed in enumerate(seeds):
+            self.resetOne(index, seed)
+        return self.observe()
+
+    def step(self, actions):
+        '''This method takes one action index per game (see ACTIONS) and
+        advances every game by one tick. It returns the observations, the
+        rewards (the points scored this tick, float32), whether each game ended
+        (bool) and a list of info dictionaries. When a game ends its info holds
+        the final "score" and "ticks", and the game is reset with seed+numEnvs
+        (or a random seed if it had none).'''
+        if len(actions) != self.numEnvs:
+            raise ValueError("expected %d actions, got %d" % (self.numEnvs, len(actions)))
+        rewards = numpy.zeros(self.numEnvs, dtype=numpy.float32)
+        dones = numpy.zeros(self.numEnvs, dtype=numpy.bool_)
+        infos = []
+        for index, game in enumerate(self.games):
+            game.step(ACTIONS[int(actions[index])])
+            rewards[index] = game.score - self.lastScores[index]
+            self.lastScores[index] = game.score
+
+            info = {"lives": game.lives, "events": game.events}
+            if game.gameOver or game.tick >= self.maxTicks:
+                dones[index] = True
+                info["score"] = game.score
+                info["ticks"] = game.tick
+                info["truncated"] = not game.gameOver
+                seed = self.seeds[index]
+                self.resetOne(index, None if seed is None else seed + self.numEnvs)
+            infos.append(info)
+        return self.observe(), rewards, dones, infos
+
+    def observe(self):
+        '''This method returns the observations of every game: the grid array,
+        or a dictionary of "grid" and "pixels" if pixel observations are on.'''
+        grids = self.observeGrids()
+        if not self.pixels:
+            return grids
+        return {"grid": grids, "pixels": self.observePixels()}
+
+    def observeGrids(self):
+        '''This method returns a new uint8 array of shape (numEnvs, CHANNELS,
+        rows, cols) built from the state of every game. The mushroom channels
+        are copied from the fields' arrays; the sprites mark the cell under
+        their center.'''
+        first = self.games[0].mushrooms
+        shape = (self.numEnvs, CHANNELS, first.rows, first.cols)
+        if self.grids is None or self.grids.shape != shape:
+            self.grids = numpy.zeros(shape, dtype=numpy.uint8)
+        else:
+            self.grids.fill(0)
+
+        for index, game in enumerate(self.games):
+            grid = self.grids[index]
+            field = game.mushrooms
+            cells = (field.rows, field.cols)
+            grid[MUSHROOM_HEALTH] = numpy.frombuffer(field.health, dtype=numpy.uint8).reshape(cells)
+            grid[MUSHROOM_POISON] = numpy.frombuffer(field.poison, dtype=numpy.uint8).reshape(cells)
+            markCentipedes(grid, game.chains, field)
+            markGroup(grid, SPIDER, game.spiders, field)
+            markGroup(grid, FLEA, game.fleas, field)
+            markGroup(grid, SCORPION, game.scorpions, field)
+            markGroup(grid, PLAYER, game.players, field)
+            markGroup(grid, LASERS, game.lasers, field)
+        return self.grids.copy()
+
+    def observePixels(self):
+        '''This method draws every game onto the offscreen canvas and returns
+        a uint8 array of shape (numEnvs, 640/pixelScale, 480/pixelScale, 3).'''
+        size = (480//self.pixelScale, 640//self.pixelScale)
+        frames = numpy.empty((self.numEnvs, size[1], size[0], 3), dtype=numpy.uint8)
+        for index, game in enumerate(self.games):
+            layer = self.layers[index]
+            if layer is None or layer.field is not game.mushrooms:
+                layer = self.layers[index] = renderer.MushroomLayer(game.mushrooms, self.background)
+            layer.update()
+            self.canvas.blit(layer.surface, (0, 0))
+            for sprite in game.allSprites.sprites():
+                if sprite.visible:
+                    self.canvas.blit(sprite.image, sprite.rect)
+            small = pygame.transform.smoothscale(self.canvas, size)
+            frames[index] = pygame.surfarray.pixels3d(small).transpose(1, 0, 2)
+        return frames
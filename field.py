@@ -0,0 +1,236 @@
+'''Desc: The mushroom field used in the remake of Atari Centipede. The board is
+   a lattice of square cells (by default 24 cols and 32 rows of 20 px), so the
+   health and poison state of every mushroom is kept in a compact array indexed
+   by cell. Asking whether a cell holds a mushroom is O(1), and Mushroom
+   sprites are only a view over the array. The field records which cells
+   changed, so that renderer.MushroomLayer only repaints those.
+'''
+import pygame, random, sprites, pool
+
+class MushroomField(object):
+    '''This class stores the health and poison state of every cell on the
+    board. A health of 0 means the cell is empty.'''
+    def __init__(self, cols=24, rows=32, cellSize=20, poolCap=256):
+        '''This initializer takes the number of columns (int), number of rows
+        (int) and the size of a cell in pixels (int) as parameters, and the
+        most destroyed Mushroom sprites to keep for reuse (int). It creates an
+        empty field.'''
+        self.cols = cols
+        self.rows = rows
+        self.cellSize = cellSize
+
+        # One byte per cell, indexed by row*cols + col
+        self.health = bytearray(cols*rows)
+        self.poison = bytearray(cols*rows)
+
+        # Mushroom sprites drawing the occupied cells, and the groups each
+        # one joins when it is created
+        self.views = {}
+        self.pool = pool.SpritePool(sprites.Mushroom, poolCap)
+        self.group = pygame.sprite.Group()
+        self.groups = [self.group]
+
+        # Indexes of the cells whose mushroom was created, damaged, poisoned,
+        # healed or destroyed since the last call to takeChanged()
+        self.changed = set()
+
+    def __len__(self):
+        '''This method returns the number of mushrooms in the field.'''
+        return len(self.views)
+
+    def addGroup(self, group):
+        '''This method takes a sprite group (e.g. a layered group used for
+        drawing) that every Mushroom sprite should also belong to, and adds the
+        existing mushrooms to it.'''
+        self.groups.append(group)
+        group.add(*self.views.values())
+
+    def removeGroup(self, group):
+        '''This method takes a group given to addGroup() and removes every
+        Mushroom sprite from it.'''
+        self.groups.remove(group)
+        group.remove(*self.views.values())
+
+    def getCell(self, position):
+        '''This accessor takes a position (tuple) in pixels and returns the
+        (col, row) of the cell containing it, or None if it is off the board.'''
+        col = int(position[0])//self.cellSize
+        row = int(position[1])//self.cellSize
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return (col, row)
+        return None
+
+    def getCenter(self, cell):
+        '''This accessor takes a (col, row) tuple and returns the center of that
+        cell in pixels.'''
+        half = self.cellSize//2
+        return (cell[0]*self.cellSize + half, cell[1]*self.cellSize + half)
+
+    def hasMushroom(self, cell):
+        '''This method takes a (col, row) tuple and returns True if the cell
+        holds a mushroom.'''
+        return self.health[cell[1]*self.cols + cell[0]] > 0
+
+    def getHealth(self, cell):
+        '''This accessor returns the health of the mushroom in the given cell
+        (0 if the cell is empty).'''
+        return self.health[cell[1]*self.cols + cell[0]]
+
+    def setHealth(self, cell, health):
+        '''This mutator takes a (col, row) tuple and an int and changes the
+        health of the mushroom in that cell. A health of 0 or less removes it.'''
+        if health <= 0:
+            self.remove(cell)
+        else:
+            index = cell[1]*self.cols + cell[0]
+            if self.health[index] != health:
+                self.health[index] = health
+                self.changed.add(index)
+
+    def isPoisonous(self, cell):
+        '''This method returns True if the mushroom in the given cell is
+        poisonous.'''
+        return self.poison[cell[1]*self.cols + cell[0]] == 1
+
+    def setPoisonous(self, cell, poisonous):
+        '''This mutator takes a (col, row) tuple and a boolean and changes
+        whether the mushroom in that cell is poisonous. Empty cells are left
+        alone.'''
+        index = cell[1]*self.cols + cell[0]
+        if self.health[index] and self.poison[index] != poisonous:
+            self.poison[index] = 1 if poisonous else 0
+            self.views[index].refresh()
+            self.changed.add(index)
+
+    def place(self, position, health=4):
+        '''This method takes a position (tuple) in pixels and puts a mushroom
+        with full health in the cell containing it. It returns the Mushroom
+        sprite for the cell, or None if the position is off the board. A cell
+        that already holds a mushroom is left unchanged.'''
+        cell = self.getCell(position)
+        if cell is None:
+            return None
+        index = cell[1]*self.cols + cell[0]
+        if not self.health[index]:
+            self.health[index] = health
+            self.poison[index] = 0
+            self.views[index] = self.pool.acquire(self, cell)
+            self.views[index].add(*self.groups)
+            self.changed.add(index)
+        return self.views[index]
+
+    def scatter(self, count, rng=random):
+        '''This method takes a number of mushrooms (int) and an optional random
+        number generator and places that many mushrooms in random cells, away
+        from the edges of the board.'''
+        size = self.cellSize
+        for i in range(count):
+            xPos = rng.randrange(size*3//2, (self.cols-1)*size, size)
+            yPos = rng.randrange(size*3//2, (self.rows-1)*size, size)
+            self.place((xPos, yPos))
+
+    def remove(self, cell):
+        '''This method takes a (col, row) tuple and removes the mushroom in that
+        cell, if there is one.'''
+        index = cell[1]*self.cols + cell[0]
+        if self.health[index]:
+            self.health[index] = 0
+            self.poison[index] = 0
+            self.views.pop(index).release()
+            self.changed.add(index)
+
+    def damage(self, cell):
+        '''This method takes a (col, row) tuple and takes 1 health from the
+        mushroom in that cell. It returns True if the mushroom was destroyed.'''
+        health = self.getHealth(cell)
+        if health:
+            self.setHealth(cell, health-1)
+            return health == 1
+        return False
+
+    def cellsOverlapping(self, rect):
+        '''This generator takes a rect and yields the (col, row) of every
+        occupied cell the rect overlaps. Since mushrooms fill their cell, this
+        gives the same result as pygame.sprite.spritecollide against them.'''
+        size = self.cellSize
+        left = max(rect.left//size, 0)
+        right = min((rect.right-1)//size, self.cols-1)
+        top = max(rect.top//size, 0)
+        bottom = min((rect.bottom-1)//size, self.rows-1)
+        for row in range(top, bottom+1):
+            start = row*self.cols
+            for col in range(left, right+1):
+                if self.health[start + col]:
+                    yield (col, row)
+
+    def lowestCellOverlapping(self, rect):
+        '''This method takes a rect and returns the (col, row) of the lowest
+        occupied cell it overlaps (the leftmost one if several are level), or
+        None if it overlaps no mushroom.'''
+        size = self.cellSize
+        left = max(rect.left//size, 0)
+        right = min((rect.right-1)//size, self.cols-1)
+        top = max(rect.top//size, 0)
+        bottom = min((rect.bottom-1)//size, self.rows-1)
+        for row in range(bottom, top-1, -1):
+            start = row*self.cols
+            for col in range(left, right+1):
+                if self.health[start + col]:
+                    return (col, row)
+        return None
+
+    def load(self, health, poison):
+        '''This method takes the health and poison of every cell (bytes, as
+        stored in the health and poison arrays) and makes the field match them.
+        The arrays are updated in place, and Mushroom sprites are only acquired,
+        released or refreshed for the cells that changed.'''
+        if health == self.health and poison == self.poison:
+            return
+        oldHealth = bytes(self.health)
+        oldPoison = bytes(self.poison)
+        self.health[:] = health
+        self.poison[:] = poison
+        changed = []
+        for start in range(0, len(oldHealth), self.cols):
+            # Compare whole rows first; most of them have not changed
+            end = start + self.cols
+            if oldHealth[start:end] != health[start:end] or oldPoison[start:end] != poison[start:end]:
+                changed.extend(index for index in range(start, end)
+                               if oldHealth[index] != health[index] or oldPoison[index] != poison[index])
+        self.changed.update(changed)
+        for index in changed:
+            if not health[index]:
+                if index in self.views:
+                    self.views.pop(index).release()
+            elif index not in self.views:
+                self.views[index] = self.pool.acquire(self, (index % self.cols, index//self.cols))
+                self.views[index].add(*self.groups)
+            elif oldPoison[index] != poison[index]:
+                self.views[index].refresh()
+
+    def cells(self):
+        '''This method returns a list of the (col, row) of every occupied cell.'''
+        return [(index % self.cols, index//self.cols) for index in self.views]
+
+    def heal(self):
+        '''This method restores every damaged mushroom to full health and
+        reverts poisoned mushrooms to normal. It returns the number of damaged
+        mushrooms that were healed.'''
+        healed = 0
+        for index, mush in self.views.items():
+            if self.health[index] < 4:
+                self.health[index] = 4
+                self.changed.add(index)
+                healed += 1
+            if self.poison[index]:
+                self.poison[index] = 0
+                mush.refresh()
+                self.changed.add(index)
+        return healed
+
+    def takeChanged(self):
+        '''This method returns the indexes of the cells that changed since it
+        was last called, in order, and forgets them.'''
+        changed = sorted(self.changed)
+        self.changed = set()
+        return changed
@@ -0,0 +1,216 @@
+'''Desc: The leaderboard of the remake of Atari Centipede. Scores are kept in an
+   append-only log of checksummed records, and the best scores are kept in a
+   small index file, so the top score and the top ten can be read at startup
+   without parsing every score ever recorded. Writes are protected by a lock
+   file, so several game processes can record scores at once, and the index
+   and compacted log are replaced atomically. A plain-text leaderboard.txt
+   from older versions is imported the first time the log is created.
+'''
+import os, struct, time, zlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# One record in the log: score, time recorded, CRC32 of the first two fields
+RECORD = struct.Struct("<qdI")
+# Index header: magic, version, log offset covered by the index, number of scores
+INDEX_HEADER = struct.Struct("<4sHqI")
+INDEX_MAGIC = b"CLBI"
+INDEX_VERSION = 1
+
+class FileLock(object):
+    '''This class is an exclusive lock on a file shared between processes. It
+    is used as a context manager.'''
+    def __init__(self, path):
+        '''This initializer takes the path of the lock file (string).'''
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        '''This method blocks until the lock is acquired.'''
+        self.file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        else:
+            self.file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self.file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        return self
+
+    def __exit__(self, *exc):
+        '''This method releases the lock.'''
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+        return False
+
+def packRecord(score, timestamp):
+    '''This function packs a score (int) and a time (float) into a checksummed
+    log record (bytes).'''
+    body = struct.pack("<qd", score, timestamp)
+    return RECORD.pack(score, timestamp, zlib.crc32(body))
+
+def readRecords(data):
+    '''This generator takes the bytes of a log and yields the (score, time) of
+    every record whose checksum is valid. A torn record at the end of the log
+    (e.g. after a crash mid-write) is ignored.'''
+    for offset in range(0, len(data) - RECORD.size + 1, RECORD.size):
+        score, timestamp, checksum = RECORD.unpack_from(data, offset)
+        if zlib.crc32(data[offset:offset+16]) == checksum:
+            yield score, timestamp
+
+def writeAtomically(path, data):
+    '''This function writes bytes to a temporary file and moves it over the
+    given path, so readers see either the old or the new file.'''
+    temp = path + ".tmp"
+    with open(temp, "wb") as outFile:
+        outFile.write(data)
+        outFile.flush()
+        os.fsync(outFile.fileno())
+    os.replace(temp, path)
+
+class Leaderboard(object):
+    '''This class keeps the top scores of the leaderboard in memory, backed by
+    the record log and the index file.'''
+    def __init__(self, basename="leaderboard", topK=10, compactAfter=1000):
+        '''This initializer takes the base name of the leaderboard files
+        (string), the number of top scores to keep (int) and the number of
+        records after which the log is compacted (int). It loads the index,
+        catching up on any records appended since it was written.'''
+        self.logPath = basename + ".log"
+        self.indexPath = basename + ".idx"
+        self.lockPath = basename + ".lock"
+        self.legacyPath = basename + ".txt"
+        self.topK = topK
+        self.compactAfter = compactAfter
+
+        # Best scores, highest first, and the log offset they cover
+        self.top = []
+        self.offset = 0
+
+        with FileLock(self.lockPath):
+            if not os.path.exists(self.logPath):
+                self.importLegacy()
+            self.refresh()
+
+    def importLegacy(self):
+        '''This method creates the log from a plain-text leaderboard (one score
+        per line), skipping malformed lines. It must be called with the lock
+        held.'''
+        records = []
+        try:
+            with open(self.legacyPath, "r") as legacy:
+                for line in legacy:
+                    try:
+                        records.append(packRecord(int(line), 0.0))
+                    except ValueError:
+                        pass
+        except FileNotFoundError:
+            pass
+        writeAtomically(self.logPath, b"".join(records))
+
+    def loadIndex(self):
+        '''This method reads the index file into top and offset. It returns
+        False if the index is missing, corrupt or ahead of the log.'''
+        try:
+            with open(self.indexPath, "rb") as indexFile:
+                data = indexFile.read()
+        except FileNotFoundError:
+            return False
+
+        if len(data) < INDEX_HEADER.size + 4:
+            return False
+        body, checksum = data[:-4], struct.unpack("<I", data[-4:])[0]
+        if zlib.crc32(body) != checksum:
+            return False
+        magic, version, offset, count = INDEX_HEADER.unpack_from(body)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            return False
+        if offset > os.path.getsize(self.logPath):
+            return False
+
+        self.top = list(struct.unpack_from("<%dq" % count, body, INDEX_HEADER.size))
+        self.offset = offset
+        return True
+
+    def saveIndex(self):
+        '''This method writes top and offset to the index file atomically. It
+        must be called with the lock held.'''
+        body = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.offset, len(self.top))
+        body += struct.pack("<%dq" % len(self.top), *self.top)
+        writeAtomically(self.indexPath, body + struct.pack("<I", zlib.crc32(body)))
+
+    def merge(self, scores):
+        '''This method merges an iterable of scores into the top scores.'''
+        self.top.extend(scores)
+        self.top.sort(reverse=True)
+        del self.top[self.topK:]
+
+    def refresh(self):
+        '''This method brings the top scores up to date with the files on disk.
+        Only the records appended since the index was written are read. It
+        must be called with the lock held.'''
+        if not self.loadIndex():
+            self.top = []
+            self.offset = 0
+
+        with open(self.logPath, "rb") as log:
+            log.seek(self.offset)
+            data = log.read()
+        if data:
+            self.merge(score for score, timestamp in readRecords(data))
+            self.offset += len(data) - len(data) % RECORD.size
+            self.saveIndex()
+
+    def record(self, score):
+        '''This method appends a score (int) to the leaderboard. The record is
+        flushed to disk before the index is updated, and the log is compacted
+        once it holds more than compactAfter records.'''
+        with FileLock(self.lockPath):
+            self.refresh()
+            with open(self.logPath, "ab") as log:
+                # Drop a torn record left by a crash, so records stay aligned
+                if log.tell() % RECORD.size:
+                    log.truncate(log.tell() - log.tell() % RECORD.size)
+                log.write(packRecord(score, time.time()))
+                log.flush()
+                os.fsync(log.fileno())
+                self.offset = log.tell()
+            self.merge([score])
+            self.saveIndex()
+
+            if self.offset // RECORD.size > self.compactAfter:
+                self.compact()
+
+    def compact(self):
+        '''This method rewrites the log so that it only holds the records of the
+        top scores. It must be called with the lock held.'''
+        with open(self.logPath, "rb") as log:
+            records = sorted(readRecords(log.read()), reverse=True)[:self.topK]
+        data = b"".join(packRecord(score, timestamp) for score, timestamp in records)
+        writeAtomically(self.logPath, data)
+        self.top = [score for score, timestamp in records]
+        self.offset = len(data)
+        self.saveIndex()
+
+    def getBest(self):
+        '''This accessor returns the top score on the leaderboard (0 if there is
+        none).'''
+        if self.top:
+            return self.top[0]
+        return 0
+
+    def getTop(self, count=10):
+        '''This accessor returns a list of the best scores, highest first.'''
+        return self.top[:count]
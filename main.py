@@ -10,62 +10,83 @@
         Mushroom: 1
         Regenerating mushroom: 5
     
-    Rows and columns:
+    Rows and columns (on the default 24x32 board of 20 px cells):
         rows = tuple(range(10, 640, 20))
         cols = tuple(range(10, 480, 20))
 '''
 
-# I - Import and Initialize
-import os
-import pygame, random, sprites
-pygame.init()
-pygame.mixer.init()
+# I - Import (pygame is initialized by main(), so importing has no side effects)
+import os, time, random, argparse
+# Imported first so that the startup times include importing pygame
+import startup
+import pygame, sprites, assets, audio, field, simulation, collision, renderer, text, leaderboard, profiler, replay, timestep, capture, pool, scheduler
 
-def showMenu(leadScore, highScore):
+def loadBackground(size):
+    '''This function takes the size (tuple) of the screen and returns the
+    background image, converted for the display and scaled if the board is not
+    the image's own 480x640.'''
+    background = pygame.image.load("images/crystal-cave.jpg")
+    background = background.convert()
+    if background.get_size() != tuple(size):
+        background = pygame.transform.smoothscale(background, size)
+    return background
+
+def showMenu(leadScore, highScore, scores, frameProfiler=profiler.NULL, measureStartup=False,
+             board=(24, 32, 20)):
     '''This function defines a game loop for the menu screen of the game. It
-    takes the top score on the leaderboard (int) and the player's personal
-    highscore (int) as parameters. It returns a boolean indicating whether or
-    not to quit the game, and a configuration of mushrooms (sprite group).'''
+    takes the top score on the leaderboard (int), the player's personal
+    highscore (int), the Leaderboard to record it in, an optional
+    FrameProfiler, whether to leave as soon as the background loading is
+    done (boolean) and the board's columns, rows and cell size in pixels
+    (tuple) as parameters. It returns a boolean indicating whether or not to
+    quit the game, and a configuration of mushrooms (MushroomField).'''
+    cols, rows, cellSize = board
+    mushrooms = field.MushroomField(cols, rows, cellSize)
+    mushrooms.scatter(20*cols*rows//(24*32))
+    
     # Display
-    screen = pygame.display.set_mode((480, 640)) # 24 cols, 32 rows (each col/row 20 px wide)
+    screen = pygame.display.set_mode((cols*cellSize, rows*cellSize))
     pygame.display.set_caption("Atari Centipede")
     
+    # Decode the images the menu draws; the others load in the background
+    assets.registry.preload(assets.getMenuImages(cellSize))
+    
     # Entities
     cwd = os.getcwd()
-    background = pygame.image.load("images/crystal-cave.jpg")
-    background = background.convert()
+    background = loadBackground(screen.get_size())
     screen.blit(background, (0, 0))
-    quitMsgFont = pygame.font.Font("Eater.ttf", 25)
     
-    # Music
-    pygame.mixer.music.load("sounds/Adrian von Ziegler - Evocation (Chiptune).mp3")
-    pygame.mixer.music.set_volume(0.5)
-    pygame.mixer.music.play(-1)
+    # Music (carries on if it is already playing, and is started by the
+    # preloader the first time)
+    audio.manager.playMusic()
     
     # Instantiate Sprites
     # Text
     title = sprites.Text("Centipede", (screen.get_width()/2, 200), 70, (0,255,0))
     leadScoreMsg = sprites.Text("Leaderboard: "+str(leadScore), (screen.get_width()/2, 275), 25)
     highScoreMsg = sprites.Text("Your highscore: "+str(highScore), (screen.get_width()/2, 315), 25)
-    startMsg = sprites.Text("Press Space to start", (screen.get_width()/2, 575), 25)
+    startMsg = sprites.Text("Press Space to start", (screen.get_width()/2, screen.get_height()-65), 25)
     
     menuText = pygame.sprite.Group(title, leadScoreMsg, highScoreMsg, startMsg)
     
     # Other
-    centipedes = pygame.sprite.Group()
-    for i in range(12):
-        centipedes.add(sprites.Centipede(i*-20+10, 4))
-    
-    mushrooms = pygame.sprite.Group()
-    for i in range(20):
-        xPos = random.randrange(30, 460, 20)
-        yPos = random.randrange(30, 620, 20)          
-        mushrooms.add(sprites.Mushroom((xPos, yPos)))
+    chain = sprites.CentipedeChain.spawn(simulation.CENTIPEDE_LENGTH, simulation.CENTIPEDE_SPEED,
+                                         screen.get_rect(), cellSize)
+    centipedes = pygame.sprite.Group(chain.segments)
+    heads = pygame.sprite.Group(chain.getHead())
     
     spiders = pygame.sprite.Group()
     
-    # All sprites
-    allSprites = pygame.sprite.OrderedUpdates(centipedes, mushrooms, spiders, menuText)
+    # Centipede head + Mushrooms: make centipede go down
+    collider = collision.Collider(mushrooms)
+    collider.addGroup("head", heads)
+    collider.addRule("mushrooms", "head", collision.MUSHROOM,
+                     lambda head, cell, kind: head.chain.goDown())
+    
+    # All sprites, kept by layer and redrawn only where they change
+    allSprites = pygame.sprite.LayeredDirty(centipedes, spiders, menuText)
+    frameProfiler.attach(allSprites)
+    screenRenderer = renderer.DirtyRenderer(screen, background, allSprites, mushrooms=mushrooms)
     
     # ACTION
     
@@ -74,14 +95,22 @@ def showMenu(leadScore, highScore):
     quitGame = False
     clock = pygame.time.Clock()
     
-    # variables to keep track of the spider
-    spiderDeathTime = pygame.time.get_ticks()
+    # The next spider is spawned by a scheduled event (in frames)
+    frame = 0
+    def spawnSpider(argument):
+        sprites.Spider(screen.get_rect(), 4, random, cellSize).add(spiders, allSprites)
+    menuEvents = scheduler.Scheduler()
+    menuEvents.setHandler("spider", spawnSpider)
+    menuEvents.schedule(simulation.SPIDER_DELAY, "spider")
     
     # Loop
     while keepGoing:
         
         # Time
+        frameProfiler.beginFrame()
         clock.tick(30)
+        frame += 1
+        frameProfiler.mark("wait")
         
         # Events
         for event in pygame.event.get():
@@ -90,359 +119,368 @@ def showMenu(leadScore, highScore):
                 quitGame = True
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
                 keepGoing = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                frameProfiler.toggleOverlay()
+        frameProfiler.mark("events")
         
-        # Kill or instantiate spiders if necessary
-        if spiders:
-            for spy in spiders:
-                if spy.rect.left < 0 or spy.rect.left > screen.get_width():
-                    # kill if they have gone off the screen
-                    spy.kill()
-                    spiderDeathTime = pygame.time.get_ticks()
-        else:
-            if pygame.time.get_ticks() - spiderDeathTime >= 5000:
-                # instantiate if 5 seconds have passed since their death
-                spiders.add(sprites.Spider(screen, 4))
-                allSprites = pygame.sprite.OrderedUpdates(centipedes, mushrooms, spiders, menuText)
+        # Kill spiders if necessary; the next one comes 5 seconds later
+        for spy in spiders:
+            if spy.rect.left < 0 or spy.rect.left > screen.get_width():
+                # kill if they have gone off the screen
+                spy.kill()
+                menuEvents.schedule(frame + simulation.SPIDER_DELAY, "spider")
+        menuEvents.run(frame)
+        frameProfiler.mark("spawn")
     
         # Collision Detection
-        # Centipedes + Mushrooms: make centipede go down
-        for cent in centipedes:
-            mushroomsHit = pygame.sprite.spritecollide(cent, mushrooms, False)
-            for mush in mushroomsHit:
-                cent.goDown()
+        collider.reset()
+        collider.resolve("mushrooms")
+        frameProfiler.mark("mushrooms")
         
         # Refresh screen
-        allSprites.clear(screen, background)
-        screen.blit(background, (0, 0))
-        allSprites.update()
-        allSprites.draw(screen)
+        chain.update()
+        spiders.update()
+        frameProfiler.mark("update")
+        screenRenderer.draw()
+        frameProfiler.mark("draw")
+        startup.mark("first frame")
         
-        pygame.display.flip()
-    
-    if quitGame:
+        if measureStartup and startup.preloader.isLoaded():
+            keepGoing = False
+            quitGame = True
+        
+        if frameProfiler.enabled:
+            frameProfiler.count("centipedes", len(centipedes))
+            frameProfiler.count("mushrooms", len(mushrooms))
+            frameProfiler.count("spiders", len(spiders))
+            frameProfiler.count("checks", collider.candidates)
+            frameProfiler.count("repainted", screenRenderer.lastFraction)
+            frameProfiler.count("assetHits", assets.registry.hits)
+            frameProfiler.count("assetMisses", assets.registry.misses)
+        frameProfiler.endFrame(clock)
+    
+    if quitGame and not measureStartup:
         # Display quit message
-        thanks = quitMsgFont.render("Thank You for Playing!", True, (255,0,255))
+        thanks = text.render("Thank You for Playing!", 25, (255,0,255))
         screen.blit(thanks, (75, 340))
         
         # If the player got a score greater than 0, add it to the leaderboard
         if highScore:
-            leaderboard = open("leaderboard.txt", "a")
-            leaderboard.write(str(highScore)+"\n")
-            leaderboard.close()
-            msgPt1 = quitMsgFont.render("Your Score has been added", True, (255,0,255))
-            msgPt2 = quitMsgFont.render("to the leaderboard.", True, (255,0,255))
+            scores.record(highScore)
+            msgPt1 = text.render("Your Score has been added", 25, (255,0,255))
+            msgPt2 = text.render("to the leaderboard.", 25, (255,0,255))
             screen.blit(msgPt1, (40, 375))
             screen.blit(msgPt2, (90, 405))
         
         pygame.display.flip()
-        pygame.mixer.music.fadeout(3000)
+        audio.manager.fadeoutMusic(3000)
         pygame.time.delay(3500)
     
     return quitGame, mushrooms
 
-def playGame(mushrooms, leadScore):
+def readInputs():
+    '''This function reads the keyboard and returns the player's inputs for a
+    tick: a direction and whether the fire button is held (tuple). WASD and
+    the arrow keys move the player and Space shoots lasers.'''
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_w] or keys[pygame.K_UP]:
+        direction = simulation.UP
+    elif keys[pygame.K_s] or keys[pygame.K_DOWN]:
+        direction = simulation.DOWN
+    elif keys[pygame.K_a] or keys[pygame.K_LEFT]:
+        direction = simulation.LEFT
+    elif keys[pygame.K_d] or keys[pygame.K_RIGHT]:
+        direction = simulation.RIGHT
+    else:
+        direction = simulation.STILL
+    return (direction, keys[pygame.K_SPACE])
+
+def playGame(mushrooms, leadScore, seed=None, frameProfiler=profiler.NULL, replayDir="replays",
+             fixedStep=False, fps=0, captureDir=None, collectBetweenLives=False):
     '''This function defines the main game loop of the game. It takes a
-    configuration of mushrooms (sprite group) and the top score on the
-    leaderboard (int) as parameters. It returns the player's score (int).'''
-    # Display
-    screen = pygame.display.set_mode((480, 640)) # 24 cols, 32 rows (each col/row 20 px wide)
+    configuration of mushrooms (MushroomField), the top score on the
+    leaderboard (int), an optional seed (int) for the game's random number
+    generator, an optional FrameProfiler, the directory to save the game's
+    replay in (string, or None not to save it), whether to draw frames
+    independently of the ticks (boolean), if so, the most frames to draw
+    per second (int, 0 for as many as the display allows), the directory to
+    record the game's frames in (string, or None not to record them) and
+    whether to keep the garbage collector from running during frames and
+    collect while the board is frozen after a life is lost (boolean) as
+    parameters. It returns the player's score (int). The game itself is
+    advanced by a GameSimulation; this loop only reads the keyboard, plays
+    sounds and draws the sprites.'''
+    # Display, the size of the board
+    size = (mushrooms.cols*mushrooms.cellSize, mushrooms.rows*mushrooms.cellSize)
+    screen = None
+    if fixedStep:
+        try:
+            # Wait for the vertical blank, if the display supports it
+            screen = pygame.display.set_mode(size, pygame.SCALED, vsync=1)
+        except pygame.error:
+            pass
+    if screen is None:
+        screen = pygame.display.set_mode(size)
     pygame.display.set_caption("Atari Centipede")
     
     # Entities
-    background = pygame.image.load("images/crystal-cave.jpg")
-    background = background.convert()
+    background = loadBackground(size)
     screen.blit(background, (0, 0))
     
-    gameOverFont = pygame.font.Font("Eater.ttf", 50)
-    
-    # Music and Sound Effects
-    pygame.mixer.music.load("sounds/Adrian von Ziegler - Evocation (Chiptune).mp3")
-    pygame.mixer.music.set_volume(0.5)
-    pygame.mixer.music.play(-1)
-    # When a laser is shot
-    shoot = pygame.mixer.Sound("sounds/shoot.wav")
-    shoot.set_volume(0.4)
-    # When a centipede is hit
-    splat = pygame.mixer.Sound("sounds/splat.wav")
-    splat.set_volume(1)    
-    # When any other enemy is hit
-    hit = pygame.mixer.Sound("sounds/hit.wav")
-    hit.set_volume(0.9)    
-    # When the player loses a life
-    buzzer = pygame.mixer.Sound("sounds/buzzer.wav")
-    buzzer.set_volume(1)       
+    # Wait for the sound effects and sprite images (usually long loaded)
+    startup.preloader.wait()
     
-    # Instantiate Sprites
-    player = sprites.Player()
-    scoreKeeper = sprites.Counter("Score", 0, 10)
-    lifeKeeper = sprites.Counter("Lives", 3, 360)
-    leadingScore = sprites.Text(str(leadScore), (screen.get_width()/2, 20), 25)
+    # Music (carries on from the menu)
+    audio.manager.playMusic()
     
-    centipedes = pygame.sprite.Group()
-    for i in range(12):
-        centipedes.add(sprites.Centipede(i*-20+10, 4))
+    # Simulation, recorded so that the game can be replayed
+    if seed is None:
+        seed = random.randrange(2**63)
+    gameReplay = replay.Replay(seed, mushrooms)
+    game = simulation.GameSimulation(mushrooms, seed)
     
-    spiders = pygame.sprite.Group()
-    fleas = pygame.sprite.Group()
-    scorpions = pygame.sprite.Group()
-    lasers = pygame.sprite.Group()
-        
-    # All sprites
-    allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
+    # Instantiate Sprites
+    scoreKeeper = sprites.Counter("Score", game.score, 10)
+    lifeKeeper = sprites.Counter("Lives", game.lives, screen.get_width()-120)
+    leadingScore = sprites.Text(str(leadScore), (screen.get_width()/2, 20), 25)
+    hud = pygame.sprite.Group(scoreKeeper, lifeKeeper, leadingScore)
+    game.allSprites.add(hud)
+    frameProfiler.attach(game.allSprites)
+    screenRenderer = renderer.DirtyRenderer(screen, background, game.allSprites,
+                                            mushrooms=game.mushrooms)
+    
+    # Frames recorded by a background thread, named like the replay
+    recorder = None
+    if captureDir is not None:
+        recorder = capture.FrameCapture(os.path.join(captureDir, time.strftime("%Y%m%d-%H%M%S") + ".ccap"),
+                                        screen, simulation.TICK_RATE)
+    
+    # Ticks to run per frame, and in-between positions of the moving sprites
+    stepper = None
+    interpolator = None
+    if fixedStep:
+        stepper = timestep.FixedTimestep(simulation.TICK_RATE)
+        interpolator = timestep.Interpolator(game.updateGroups)
+    
+    # Garbage collection only between lives, if asked for
+    collector = pool.GarbageCollector(collectBetweenLives)
+    
+    # Shown while the game is paused (P); holding F runs 4 ticks per frame
+    pausedMsg = sprites.Text("PAUSED", (screen.get_width()/2, screen.get_height()/2), 50, (255, 0, 255))
+    fastForward = 4
     
     # ACTION
     
     # Assign
     keepGoing = True
+    paused = False
     clock = pygame.time.Clock()
-    rows = tuple(range(10, 640, 20))
-    firingRate = 500  # how many miliseconds must pass between shots
-    
-    # variables to keep track of periodic events
-    centipedeDeathTime = pygame.time.get_ticks()
-    spiderDeathTime = pygame.time.get_ticks()
-    fleaDeathTime = pygame.time.get_ticks()
-    scorpionDeathTime = pygame.time.get_ticks()
-    shootTime = pygame.time.get_ticks()
+    collector.start()
     
     # Loop
     while keepGoing:
         
         # Time
-        clock.tick(30)
+        frameProfiler.beginFrame()
+        if stepper is None:
+            clock.tick(simulation.TICK_RATE)
+            ticks = 1
+        else:
+            clock.tick(fps)
+            ticks = stepper.advance(clock.get_time()/1000)
+        frameProfiler.mark("wait")
         
         # Events
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 keepGoing = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                frameProfiler.toggleOverlay()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                paused = not paused
+                if paused:
+                    pausedMsg.dirty = 1
+                    game.allSprites.add(pausedMsg)
+                else:
+                    pausedMsg.kill()
         
-        # WASD and arrow keys move the player
-        if pygame.key.get_pressed()[pygame.K_w] or pygame.key.get_pressed()[pygame.K_UP]:
-            player.setDirection((0,1))
-        elif pygame.key.get_pressed()[pygame.K_s] or pygame.key.get_pressed()[pygame.K_DOWN]:
-            player.setDirection((0,-1))
-        elif pygame.key.get_pressed()[pygame.K_a] or pygame.key.get_pressed()[pygame.K_LEFT]:
-            player.setDirection((-1,0))
-        elif pygame.key.get_pressed()[pygame.K_d] or pygame.key.get_pressed()[pygame.K_RIGHT]:
-            player.setDirection((1,0))
-        else:
-            player.setDirection((0,0))
-
-        # Space shoots lasers
-        if pygame.key.get_pressed()[pygame.K_SPACE]:
-            if pygame.time.get_ticks() - shootTime >= firingRate:
-                laser = sprites.Laser(player.rect.centerx, player.rect.top)
-                lasers.add(laser)
-                shootTime = pygame.time.get_ticks()
-                allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
-                shoot.play()
-
-        
-        # Update enemy sprites (kill or instantiate centipedes, spiders, fleas and scorpions)
-        if not centipedes and (pygame.time.get_ticks() - centipedeDeathTime >= 1500):
-            # If 1.5 seconds have passed since the centipedes died, spawn a new centipede
-            for i in range(12):
-                centipedes.add(sprites.Centipede(i*-20+10, 4)) # speed must be a factor of 20
-            allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
+        # Nothing is simulated (or recorded) while paused; everything is
+        # counted in ticks, so the game carries on where it stopped
+        if paused:
+            ticks = 0
+        elif pygame.key.get_pressed()[pygame.K_f]:
+            ticks *= fastForward
         
-        if spiders:
-            for spy in spiders:
-                if spy.rect.left < 0 or spy.rect.left > screen.get_width():
-                    # kill if they have gone off the screen
-                    spy.kill()
-                    spiderDeathTime = pygame.time.get_ticks()
-        else:
-            if pygame.time.get_ticks() - spiderDeathTime >= 5000:
-                # instantiate if 5 seconds have passed since their death
-                spiders.add(sprites.Spider(screen, 4))
-                allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
+        inputs = readInputs()
+        frameProfiler.mark("events")
         
-        if fleas:
-            for flea in fleas:
-                if flea.rect.centery in rows and random.randrange(15) == 0:
-                    # if flea is on a row, there is a 1 in 15 chance it will leave a mushroom behind
-                    mush = sprites.Mushroom(flea.rect.center)
-                    mushrooms.add(mush)
-                    allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
-                
-                if flea.rect.top > screen.get_height():
-                    # kill if they have gone off the screen
-                    flea.kill()
-                    fleaDeathTime = pygame.time.get_ticks()
-        else:
-            if pygame.time.get_ticks() - fleaDeathTime >= 7000:
-                # instantiate if 7 seconds have passed since their death
-                fleas.add(sprites.Flea(5))
-                allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
-        
-        if scorpions:
-            for scor in scorpions:
-                if scor.rect.right < 0 or scor.rect.left > screen.get_width():
-                    # kill if they have gone off the screen
-                    scor.kill()
-                    scorpionDeathTime = pygame.time.get_ticks()
-        else:
-            if pygame.time.get_ticks() - scorpionDeathTime >= 6000:
-                # instantiate if 6 seconds have passed since their death
-                scorpions.add(sprites.Scorpion(screen))
-                allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
-                
-        # Collision Detection
-        # Lasers + ...
-        for l in lasers:
-            # ...Centipedes: kill both, spawn mushroom, score 50 pts
-            centipedesHit = pygame.sprite.spritecollide(l, centipedes, False)
-            for cent in centipedesHit:
-                splat.play()
-                scoreKeeper.setCount(50)
-                cent.kill()
-                l.kill()
-                mush = sprites.Mushroom(cent.rect.center)
-                mushrooms.add(mush)
-                allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
-                if not centipedes:
-                    centipedeDeathTime = pygame.time.get_ticks()
-            
-            # ...Mushrooms: kill laser, damage mushroom, maybe score 1 pt
-            mushroomsHit = pygame.sprite.spritecollide(l, mushrooms, False)
-            for mush in mushroomsHit:
-                l.kill()
-                mush.setHealth(mush.getHealth()-1)
-                if mush.getHealth() == 0:
-                    scoreKeeper.setCount(1)
+        for tick in range(ticks):
+            if interpolator is not None and tick == ticks-1:
+                interpolator.capture()
+            gameReplay.record(inputs)
+            game.step(inputs, frameProfiler.timer)
             
-            # ...Spiders: kill both, score 600 pts
-            spidersHit = pygame.sprite.spritecollide(l, spiders, False)
-            for spy in spidersHit:
-                hit.play()
-                l.kill()
-                spy.kill()
-                spiderDeathTime = pygame.time.get_ticks()
-                scoreKeeper.setCount(600)
+            # Sound effects for this tick
+            for name in game.events:
+                audio.manager.play(name)
+            frameProfiler.mark("sounds")
             
-            # ...Fleas: kill both, score 200 pts
-            fleasHit = pygame.sprite.spritecollide(l, fleas, False)
-            for flea in fleasHit:
-                hit.play()
-                l.kill()
-                flea.kill()
-                fleaDeathTime = pygame.time.get_ticks()
-                scoreKeeper.setCount(200)
+            # A life was lost and the board is frozen: collect now
+            if "buzzer" in game.events:
+                collector.collect()
+                frameProfiler.mark("gc")
             
-            # ...Scorpions: kill both, score 1000 pts
-            scorpionsHit = pygame.sprite.spritecollide(l, scorpions, False)
-            for scor in scorpionsHit:
-                hit.play()
-                l.kill()
-                scor.kill()
-                scorpionDeathTime = pygame.time.get_ticks()
-                scoreKeeper.setCount(1000)                   
-        
-        # Mushrooms + ...
-        for mush in mushrooms:
-            # ...Centipedes: make centipede go down
-            centipedesHit = pygame.sprite.spritecollide(mush, centipedes, False)
-            for cent in centipedesHit:
-                cent.goDown()
-                if mush.getIsPoisonous():
-                    cent.setIsPoisoned(True)
-            
-            # ...Spiders: 1/3 chance of killing mushroom
-            spidersHit = pygame.sprite.spritecollide(mush, spiders, False)
-            for spy in spidersHit:
-                if random.randrange(3) == 0:
-                    mush.kill()
-            
-            # ...Scorpions: turn mushroom poisonous
-            scorpionsHit = pygame.sprite.spritecollide(mush, scorpions, False)
-            for scor in scorpionsHit:
-                mush.setIsPoisonous(True)
-        
-        # Player + Centipedes or Spiders or Fleas: lose life, reset screen
-        if pygame.sprite.spritecollide(player, centipedes, False) or pygame.sprite.spritecollide(player, spiders, False) or pygame.sprite.spritecollide(player, fleas, False):
-            # Lose a life
-            lifeKeeper.setCount(-1)
-            buzzer.play()
-            if lifeKeeper.getCount() <= 0:
+            if game.gameOver:
                 keepGoing = False
-            pygame.time.delay(1000)
-            
-            # Heal and award 5 points for any damaged mushrooms
-            # Also revert poisoned mushrooms to normal
-            for mush in mushrooms:
-                if mush.getHealth() < 4:
-                    mush.setHealth(4)
-                    scoreKeeper.setCount(5)
-                if mush.getIsPoisonous():
-                    mush.setIsPoisonous(False)
-            
-            # Reset screen:
-            # Kill all enemy sprites
-            for cent in centipedes:
-                cent.kill()
-            
-            for spy in spiders:
-                spy.kill()
-            spiderDeathTime = pygame.time.get_ticks()
-            
-            for flea in fleas:
-                flea.kill()
-            fleaDeathTime = pygame.time.get_ticks()
-            
-            for scor in scorpions:
-                scor.kill()
-            scorpionDeathTime = pygame.time.get_ticks()
-            
-            # Spawn new centipede
-            for i in range(12):
-                centipedes.add(sprites.Centipede(i*-20+10, 4)) # speed must be a factor of 20
-            allSprites = pygame.sprite.OrderedUpdates(lasers, player, centipedes, mushrooms, scorpions, spiders, fleas, scoreKeeper, lifeKeeper, leadingScore)
+                break
+        
+        # Keep the counters in step with the simulation
+        scoreKeeper.setCount(game.score-scoreKeeper.getCount())
+        lifeKeeper.setCount(game.lives-lifeKeeper.getCount())
         
         # Refresh screen
-        allSprites.clear(screen, background)
-        screen.blit(background, (0, 0))
-        allSprites.update()
-        allSprites.draw(screen)
+        hud.update()
+        frameProfiler.mark("hud")
+        if interpolator is not None and not paused:
+            interpolator.apply(stepper.getAlpha())
+        screenRenderer.draw()
+        if interpolator is not None:
+            interpolator.restore()
+        frameProfiler.mark("draw")
+        if recorder is not None:
+            recorder.capture(screen)
+            frameProfiler.mark("capture")
         
-        pygame.display.flip()
-    
-    # Display Game Over message and fade out music
-    gameOver = gameOverFont.render("GAME OVER", True, (255, 0, 255))
+        if frameProfiler.enabled:
+            frameProfiler.count("ticks", ticks)
+            frameProfiler.count("centipedes", len(game.centipedes))
+            frameProfiler.count("mushrooms", len(game.mushrooms))
+            frameProfiler.count("lasers", len(game.lasers))
+            frameProfiler.count("spiders", len(game.spiders))
+            frameProfiler.count("fleas", len(game.fleas))
+            frameProfiler.count("scorpions", len(game.scorpions))
+            frameProfiler.count("checks", game.collisionChecks)
+            frameProfiler.count("hits", game.collisionHits)
+            frameProfiler.count("stolen", audio.manager.stolen)
+            frameProfiler.count("dropped", audio.manager.dropped)
+            if recorder is not None:
+                frameProfiler.count("captureDrops", recorder.dropped)
+            frameProfiler.count("poolReused", sum(stats["reused"] for stats in game.getPoolStats().values()))
+            frameProfiler.count("repainted", screenRenderer.lastFraction)
+            frameProfiler.count("assetHits", assets.registry.hits)
+            frameProfiler.count("assetMisses", assets.registry.misses)
+        frameProfiler.endFrame(clock)
+    collector.stop()
+    
+    # Display Game Over message (the music keeps playing into the menu)
+    gameOver = text.render("GAME OVER", 50, (255, 0, 255))
     
     # Blit the messages
     screen.blit(gameOver, (90, 230))
     pygame.display.flip()
     
-    pygame.mixer.music.fadeout(2000)
+    # Finish the recording with the message
+    if recorder is not None:
+        recorder.capture(screen)
+        recorder.close()
+        stats = recorder.getStats()
+        print("capture: %d frames written, %d dropped, %.3f ms per frame (longest %.3f ms) to %s" %
+              (stats["written"], stats["dropped"], stats["captureTime"], stats["longestCapture"],
+               recorder.path))
+    
+    if frameProfiler.enabled:
+        print("pools: " + ", ".join("%s %d reused/%d created" % (kind, stats["reused"], stats["created"])
+                                    for kind, stats in sorted(game.getPoolStats().items())))
+    if collector.enabled:
+        print("gc: %d collections between lives, %d objects, longest %.3f ms" %
+              (collector.collections, collector.collected, collector.longest*1000))
+    
+    # Save the replay
+    if replayDir is not None:
+        gameReplay.score = game.score
+        name = time.strftime("%Y%m%d-%H%M%S") + "-" + str(game.score) + ".replay"
+        gameReplay.save(os.path.join(replayDir, name))
+    
     pygame.time.delay(2000)
     
-    return scoreKeeper.getCount()
+    return game.score
 
 def main():
     '''This function defines the 'mainline logic' of the program.'''
-    # Read the highest score on the leaderboard
-    try:
-        leaderboard = open("leaderboard.txt", "r")
-        leadScore = 0
-        for line in leaderboard:
-            if int(line) > leadScore:
-                leadScore = int(line)
-        leaderboard.close()
+    # Command line options
+    parser = argparse.ArgumentParser(description="A remake of Atari Centipede.")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each frame (F3 shows the overlay)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="with --profile, stream frames to a .csv or Chrome trace .json file")
+    parser.add_argument("--measure-startup", action="store_true",
+                        help="report the time to the first frame and to fully loaded, then quit")
+    parser.add_argument("--fixed-step", action="store_true",
+                        help="draw frames as fast as the display allows, between fixed 30 Hz ticks")
+    parser.add_argument("--fps", type=int, default=0,
+                        help="with --fixed-step, the most frames to draw per second (default: no limit)")
+    parser.add_argument("--capture", metavar="DIR",
+                        help="record every game's frames to a file in DIR (see capture.py)")
+    parser.add_argument("--gc-between-lives", action="store_true",
+                        help="keep the garbage collector from running during frames; collect after a life is lost")
+    parser.add_argument("--cols", type=int, default=24, help="columns on the board")
+    parser.add_argument("--rows", type=int, default=32, help="rows on the board")
+    parser.add_argument("--cell-size", type=int, default=20,
+                        help="size of a cell in pixels (a multiple of %d)" % simulation.CENTIPEDE_SPEED)
+    args = parser.parse_args()
+    if args.cell_size <= 0 or args.cell_size % simulation.CENTIPEDE_SPEED:
+        parser.error("--cell-size must be a multiple of %d" % simulation.CENTIPEDE_SPEED)
+    if args.cols < 8 or args.rows < 12:
+        parser.error("the board must be at least 8 columns by 12 rows")
+    
+    # Initialize only what the first menu frame needs
+    pygame.display.init()
+    pygame.font.init()
+    
+    # Everything else is decoded in the background while the menu runs
+    startup.preloader.start([
+        ("images", lambda: assets.registry.loadAll(assets.getSpriteImages(args.cell_size))),
+        ("mixer", audio.manager.init),
+        ("sounds", audio.manager.start),
+        ("music", audio.manager.playMusic)])
+    
+    frameProfiler = profiler.NULL
+    if args.profile:
+        frameProfiler = profiler.FrameProfiler(args.trace)
     
-    except FileNotFoundError:
-        leadScore = 0
+    # Read the highest score on the leaderboard
+    scores = leaderboard.Leaderboard()
+    leadScore = scores.getBest()
     
     # Game loops
     quitGame = False
     highScore = 0
     while not quitGame:
-        quitGame, mushrooms = showMenu(leadScore, highScore)
+        quitGame, mushrooms = showMenu(leadScore, highScore, scores, frameProfiler,
+                                       args.measure_startup, (args.cols, args.rows, args.cell_size))
         if quitGame:
             break
-        highScore = max(playGame(mushrooms, leadScore), highScore)
-    
-    # Close the game window
+        highScore = max(playGame(mushrooms, leadScore, frameProfiler=frameProfiler,
+                                 fixedStep=args.fixed_step, fps=args.fps,
+                                 captureDir=args.capture,
+                                 collectBetweenLives=args.gc_between_lives), highScore)
+    
+    if args.measure_startup:
+        startup.preloader.wait()
+        print("first frame:  %7.1f ms" % (startup.marks["first frame"]*1000))
+        print("fully loaded: %7.1f ms" % (startup.marks["fully loaded"]*1000))
+        for name, seconds in startup.preloader.timings.items():
+            print("  %-10s %7.1f ms" % (name, seconds*1000))
+    
+    if args.profile:
+        stats = assets.registry.getStats()
+        print("assets: %d hits, %d misses, %d surfaces cached" %
+              (stats["hits"], stats["misses"], stats["surfaces"]))
+    
+    # Close the trace file and the game window
+    frameProfiler.close()
     pygame.quit()    
 
 # Call the main function
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,890 @@
+'''Desc: Two-player co-op over a LAN for the remake of Atari Centipede. A
+   GameServer runs the only GameSimulation (it is authoritative) at TICK_RATE,
+   and a GameClient on every cabinet sends it that player's input each tick.
+   Both ends are asyncio datagram protocols, so one event loop can run a
+   server and its clients, e.g. for a test over loopback.
+
+   After every tick the server sends each client the state of the game as a
+   delta against the last state that client acknowledged: the mushroom cells
+   that changed, the entities that appeared (in full), moved (a few bytes each)
+   or disappeared, and only the counters that changed. A client that has not
+   acknowledged a state the server still holds gets a full one. Nothing is
+   resent when a datagram is lost, since the next delta is against a state the
+   client is known to have.
+
+   Each input datagram repeats the last few inputs the server has not
+   processed, so a lost one costs nothing. A client moves its own Player as
+   soon as its input is read (prediction); when a state arrives, it puts the
+   Player where the server says and replays the inputs the server has not
+   processed yet (reconciliation).
+
+   Both ends count the bytes they send and receive, and a client measures the
+   time from sending an input to receiving the first state that includes it.
+   A LinkShim delays, jitters and drops outgoing datagrams, to try all of this
+   on one machine.
+
+   Usage:
+       python netplay.py --host                  host a game and play it
+       python netplay.py --join 192.168.0.7      join it from another cabinet
+       python netplay.py --loopback --latency 0.05 --jitter 0.01 --loss 0.05
+                                                 two bots over loopback, headless
+'''
+import os, sys, time, random, struct, zlib, asyncio, argparse, collections
+import pygame, assets, sprites, field, simulation, replay
+
+PORT = 47600
+
+# Every datagram starts with the magic and the message type
+MAGIC = b"CN"
+VERSION = 1
+HEADER = struct.Struct("<2sB")
+HELLO, WELCOME, INPUT, STATE, BYE = 1, 2, 3, 4, 5
+
+# HELLO: protocol version
+HELLO_MSG = struct.Struct("<H")
+# WELCOME: protocol version, player index, number of players, cols, rows, cell size
+WELCOME_MSG = struct.Struct("<HBBHHH")
+# INPUT: newest state tick received (0 for none), newest input number, number
+# of inputs, then one input code per byte, oldest first
+INPUT_MSG = struct.Struct("<IIB")
+# STATE: tick, tick of the base state (0 for a full state), last input number
+# processed for this client, flags, then the delta
+STATE_MSG = struct.Struct("<IIIB")
+
+# Flags of a state
+COMPRESSED = 1
+
+# Delta: which counters follow and the sounds of the tick (bits), then the
+# counters, the changed cells, the removed, new or changed, and moved entities
+COUNTERS = struct.Struct("<BB")
+COUNTER_FORMATS = (struct.Struct("<q"), struct.Struct("<h"), struct.Struct("<H"), struct.Struct("<?"))
+SCORE, LIVES, PAUSE, GAME_OVER = range(4)
+EVENTS = ("shoot", "splat", "hit", "buzzer")
+COUNT = struct.Struct("<H")
+CELL = struct.Struct("<HBB")         # index, health, poison
+ENTITY = struct.Struct("<HBBhh")     # id, kind, frame, left, top
+MOVE = struct.Struct("<Hbb")         # id, dx, dy
+
+# Kinds of entities. The players' ids are their indexes; ids from
+# FIRST_ID up are given to the other sprites.
+PLAYER, CENTIPEDE, SPIDER, FLEA, SCORPION, LASER = range(6)
+FIRST_ID = 16
+
+# States kept by both ends to decode deltas against (ticks)
+HISTORY = 64
+# Inputs repeated in every input datagram
+REDUNDANCY = 8
+# Inputs the server holds for a client before it drops the oldest
+MAX_QUEUED = 3
+# Bodies larger than this (bytes) are compressed if that makes them smaller
+COMPRESS_OVER = 256
+
+# Seconds between HELLOs, before giving up on joining and on a silent server
+HELLO_INTERVAL = 0.25
+JOIN_TIMEOUT = 10.0
+SERVER_TIMEOUT = 5.0
+# BYEs sent when a game ends, in case some are lost
+BYE_REPEATS = 5
+
+class NetState(object):
+    '''This class holds what a client needs to draw one tick: the counters
+    (score, lives, pause ticks, game over), the health and poison of every
+    cell, every entity by id as (kind, frame, left, top) and the sounds of the
+    tick.'''
+    def __init__(self, tick, counters, health, poison, entities, events=()):
+        '''This initializer takes the tick (int), the counters (tuple), the
+        health and poison arrays (bytearray), the entities (dict) and the
+        sounds (tuple of strings).'''
+        self.tick = tick
+        self.counters = counters
+        self.health = health
+        self.poison = poison
+        self.entities = entities
+        self.events = events
+
+    def __eq__(self, other):
+        '''This method returns True if both states hold the same game state
+        (the tick and the sounds are not compared).'''
+        return (self.counters == other.counters and self.health == other.health and
+                self.poison == other.poison and self.entities == other.entities)
+
+def emptyState(cells):
+    '''This function returns the state a full state is a delta against: no
+    mushrooms in the given number of cells (int), no entities and unknown
+    counters.'''
+    return NetState(0, (None,)*len(COUNTER_FORMATS), bytearray(cells), bytearray(cells), {})
+
+class EntityIds(object):
+    '''This class gives every sprite a small id that stays the same for as
+    long as it is alive. A pooled sprite handed out again is given a new id.'''
+    def __init__(self):
+        '''This initializer has no parameters.'''
+        self.ids = {}
+        self.used = set()
+        self.next = FIRST_ID
+
+    def get(self, sprite):
+        '''This method returns the sprite's id, giving it the next free one if
+        it has none.'''
+        key = (sprite, getattr(sprite, "generation", 0))
+        entityId = self.ids.get(key)
+        if entityId is None:
+            entityId = self.next
+            while entityId in self.used:
+                entityId = entityId + 1 if entityId < 0xFFFF else FIRST_ID
+            self.next = entityId + 1 if entityId < 0xFFFF else FIRST_ID
+            self.ids[key] = entityId
+            self.used.add(entityId)
+        return entityId
+
+    def prune(self):
+        '''This method frees the ids of the sprites that died.'''
+        self.ids = dict((key, entityId) for key, entityId in self.ids.items()
+                        if key[0].alive() and key[1] == getattr(key[0], "generation", 0))
+        self.used = set(self.ids.values())
+
+def captureState(game, ids):
+    '''This function takes a GameSimulation and its EntityIds and returns the
+    game's NetState.'''
+    entities = {}
+    for index, player in enumerate(game.players):
+        entities[index] = (PLAYER, index, player.rect.left, player.rect.top)
+    for cent in game.centipedes:
+        entities[ids.get(cent)] = (CENTIPEDE, 1 if cent.image is cent.LR else 0,
+                                   cent.rect.left, cent.rect.top)
+    for kind, group in ((SPIDER, game.spiders), (FLEA, game.fleas), (LASER, game.lasers)):
+        for sprite in group:
+            entities[ids.get(sprite)] = (kind, 0, sprite.rect.left, sprite.rect.top)
+    for scor in game.scorpions:
+        entities[ids.get(scor)] = (SCORPION, 0 if scor.dx > 0 else 1, scor.rect.left, scor.rect.top)
+    ids.prune()
+    counters = (game.score, game.lives, game.getPauseTicks(), game.gameOver)
+    return NetState(game.tick, counters, bytearray(game.mushrooms.health),
+                    bytearray(game.mushrooms.poison), entities, tuple(game.events))
+
+def changedCells(base, state, width=64):
+    '''This function returns the indexes of the cells whose health or poison
+    differs between two states, comparing blocks of the given width first.'''
+    if base.health == state.health and base.poison == state.poison:
+        return []
+    changed = []
+    for start in range(0, len(state.health), width):
+        end = start + width
+        if base.health[start:end] != state.health[start:end] or base.poison[start:end] != state.poison[start:end]:
+            changed.extend(index for index in range(start, min(end, len(state.health)))
+                           if base.health[index] != state.health[index] or
+                           base.poison[index] != state.poison[index])
+    return changed
+
+def encodeDelta(base, state):
+    '''This function returns the bytes that turn the base NetState into the
+    given one.'''
+    mask = 0
+    parts = [b""]
+    for i, (old, new) in enumerate(zip(base.counters, state.counters)):
+        if old != new:
+            mask |= 1 << i
+            parts.append(COUNTER_FORMATS[i].pack(new))
+    events = 0
+    for i, name in enumerate(EVENTS):
+        if name in state.events:
+            events |= 1 << i
+    parts[0] = COUNTERS.pack(mask, events)
+
+    cells = changedCells(base, state)
+    parts.append(COUNT.pack(len(cells)))
+    for index in cells:
+        parts.append(CELL.pack(index, state.health[index], state.poison[index]))
+
+    removed = [entityId for entityId in base.entities if entityId not in state.entities]
+    changed = []
+    moves = []
+    for entityId, entity in state.entities.items():
+        old = base.entities.get(entityId)
+        if old is None or old[:2] != entity[:2]:
+            changed.append(ENTITY.pack(entityId, *entity))
+            continue
+        dx, dy = entity[2]-old[2], entity[3]-old[3]
+        if dx or dy:
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                moves.append(MOVE.pack(entityId, dx, dy))
+            else:
+                changed.append(ENTITY.pack(entityId, *entity))
+    parts.append(COUNT.pack(len(removed)))
+    parts.append(struct.pack("<%dH" % len(removed), *removed))
+    parts.append(COUNT.pack(len(changed)))
+    parts += changed
+    parts.append(COUNT.pack(len(moves)))
+    parts += moves
+    return b"".join(parts)
+
+def decodeDelta(base, tick, body):
+    '''This function takes the base NetState, the tick (int) of the new state
+    and bytes made by encodeDelta(), and returns the new NetState. It raises
+    ValueError if the bytes do not apply to the base.'''
+    try:
+        mask, events = COUNTERS.unpack_from(body)
+        offset = COUNTERS.size
+        counters = list(base.counters)
+        for i, counter in enumerate(COUNTER_FORMATS):
+            if mask & (1 << i):
+                counters[i], = counter.unpack_from(body, offset)
+                offset += counter.size
+
+        health = bytearray(base.health)
+        poison = bytearray(base.poison)
+        count, = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        for i in range(count):
+            index, health[index], poison[index] = CELL.unpack_from(body, offset)
+            offset += CELL.size
+
+        entities = dict(base.entities)
+        count, = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        for entityId in struct.unpack_from("<%dH" % count, body, offset):
+            del entities[entityId]
+        offset += 2*count
+        count, = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        for i in range(count):
+            entityId, kind, frame, left, top = ENTITY.unpack_from(body, offset)
+            entities[entityId] = (kind, frame, left, top)
+            offset += ENTITY.size
+        count, = COUNT.unpack_from(body, offset)
+        offset += COUNT.size
+        for i in range(count):
+            entityId, dx, dy = MOVE.unpack_from(body, offset)
+            kind, frame, left, top = entities[entityId]
+            entities[entityId] = (kind, frame, left+dx, top+dy)
+            offset += MOVE.size
+    except (struct.error, IndexError, KeyError):
+        raise ValueError("the delta does not apply to its base")
+    return NetState(tick, tuple(counters), health, poison, entities,
+                    tuple(name for i, name in enumerate(EVENTS) if events & (1 << i)))
+
+class LinkShim(object):
+    '''This class sends datagrams through a simulated link that delays them
+    by a latency give or take a jitter (seconds), so they can arrive out of
+    order, and drops a fraction of them.'''
+    def __init__(self, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        '''This initializer takes the one-way latency and jitter (seconds),
+        the fraction of datagrams to drop (0 to 1) and an optional seed.'''
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, transport, data, address):
+        '''This method sends a datagram on the transport, or drops it.'''
+        self.sent += 1
+        if self.loss and self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self.rng.uniform(-self.jitter, self.jitter))
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self.deliver, transport, data, address)
+        else:
+            self.deliver(transport, data, address)
+
+    def deliver(self, transport, data, address):
+        '''This method sends a delayed datagram, unless the transport has been
+        closed since.'''
+        if not transport.is_closing():
+            transport.sendto(data, address)
+
+class ClientSlot(object):
+    '''This class holds what the server knows about one client.'''
+    def __init__(self, address, index):
+        '''This initializer takes the client's address (tuple) and its player
+        index (int).'''
+        self.address = address
+        self.index = index
+        # True once the client said BYE; its player then stands still
+        self.left = False
+
+        # Inputs received but not applied yet, as (number, code)
+        self.inputs = collections.deque()
+        self.newestSeq = 0
+        self.lastSeq = 0
+        self.lastInput = (simulation.STILL, False)
+
+        # Newest state the client acknowledged (0 for none)
+        self.ackTick = 0
+
+        # Statistics
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.fullStates = 0
+        self.deltaStates = 0
+        self.largestState = 0
+        self.droppedInputs = 0
+
+class GameServer(asyncio.DatagramProtocol):
+    '''This class runs a co-op game and sends its state to the clients.'''
+    def __init__(self, numPlayers=2, seed=None, lives=3, board=(24, 32, 20), shim=None, maxTicks=0):
+        '''This initializer takes the number of players (int) to wait for, an
+        optional seed (int), the number of lives (int), the board's columns,
+        rows and cell size (tuple), an optional LinkShim to send through and
+        the most ticks (int) to run, 0 to play until the game is over.'''
+        cols, rows, cellSize = board
+        self.game = simulation.GameSimulation(seed=seed, lives=lives, cols=cols, rows=rows,
+                                              cellSize=cellSize, numPlayers=numPlayers)
+        self.numPlayers = numPlayers
+        self.board = board
+        self.shim = shim or LinkShim()
+        self.maxTicks = maxTicks
+        self.transport = None
+
+        # address -> ClientSlot, and the slots by player index
+        self.clients = {}
+        self.slots = []
+        self.joined = asyncio.Event()
+
+        # tick -> NetState sent, for the last HISTORY ticks
+        self.ids = EntityIds()
+        self.history = {}
+        self.tickTime = 0.0
+
+    def connection_made(self, transport):
+        '''This method is called by asyncio with the server's transport.'''
+        self.transport = transport
+
+    def send(self, data, address):
+        '''This method sends a datagram to a client.'''
+        self.shim.send(self.transport, data, address)
+
+    def datagram_received(self, data, address):
+        '''This method is called by asyncio with every datagram received.'''
+        try:
+            magic, kind = HEADER.unpack_from(data)
+        except struct.error:
+            return
+        if magic != MAGIC:
+            return
+        slot = self.clients.get(address)
+        if kind == HELLO:
+            try:
+                version, = HELLO_MSG.unpack_from(data, HEADER.size)
+            except struct.error:
+                return
+            if version != VERSION:
+                return
+            if slot is None:
+                if len(self.slots) == self.numPlayers:
+                    # The game is full
+                    self.send(HEADER.pack(MAGIC, BYE), address)
+                    return
+                slot = ClientSlot(address, len(self.slots))
+                self.clients[address] = slot
+                self.slots.append(slot)
+                if len(self.slots) == self.numPlayers:
+                    self.joined.set()
+            self.send(HEADER.pack(MAGIC, WELCOME) +
+                      WELCOME_MSG.pack(VERSION, slot.index, self.numPlayers, *self.board), address)
+        elif kind == BYE and slot is not None:
+            # The client quit; stop sending to it and hold its player still
+            del self.clients[address]
+            slot.left = True
+            slot.inputs.clear()
+            slot.lastInput = (simulation.STILL, False)
+        elif kind == INPUT and slot is not None:
+            try:
+                ackTick, newestSeq, count = INPUT_MSG.unpack_from(data, HEADER.size)
+            except struct.error:
+                return
+            slot.bytesReceived += len(data)
+            slot.ackTick = max(slot.ackTick, ackTick)
+            codes = data[HEADER.size + INPUT_MSG.size:][:count]
+            for i, code in enumerate(codes):
+                seq = newestSeq - len(codes) + 1 + i
+                if seq > slot.newestSeq:
+                    slot.inputs.append((seq, code))
+                    slot.newestSeq = seq
+
+    async def run(self):
+        '''This coroutine waits for every player to join, then runs the game
+        at TICK_RATE until it is over (or maxTicks have run), sending a state
+        to every client after each tick. The game also ends once every client
+        has left.'''
+        await self.joined.wait()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        game = self.game
+        while not game.gameOver and not (self.maxTicks and game.tick >= self.maxTicks):
+            if all(slot.left for slot in self.slots):
+                break
+            self.step()
+            await asyncio.sleep(max(0.0, start + game.tick/simulation.TICK_RATE - loop.time()))
+        for i in range(BYE_REPEATS):
+            for slot in self.slots:
+                if not slot.left:
+                    self.send(HEADER.pack(MAGIC, BYE), slot.address)
+            await asyncio.sleep(HELLO_INTERVAL/5)
+
+    def step(self):
+        '''This method applies the next input of every client, advances the
+        game by one tick and sends the new state.'''
+        start = time.perf_counter()
+        inputs = []
+        for slot in self.slots:
+            # Catch up if inputs piled up, e.g. after a burst arrived at once
+            while len(slot.inputs) > MAX_QUEUED:
+                slot.inputs.popleft()
+                slot.droppedInputs += 1
+            if slot.inputs:
+                slot.lastSeq, code = slot.inputs.popleft()
+                slot.lastInput = replay.decodeInput(code)
+            # Without a new input the last one is held
+            inputs.append(slot.lastInput)
+        self.game.step(inputs)
+
+        state = captureState(self.game, self.ids)
+        self.history[state.tick] = state
+        self.history.pop(state.tick - HISTORY, None)
+        for slot in self.slots:
+            if not slot.left:
+                self.sendState(slot, state)
+        self.tickTime += time.perf_counter() - start
+
+    def sendState(self, slot, state):
+        '''This method sends a state to a client as a delta against the newest
+        state it acknowledged, or in full.'''
+        base = self.history.get(slot.ackTick)
+        if base is None:
+            body = encodeDelta(emptyState(len(state.health)), state)
+            baseTick = 0
+            slot.fullStates += 1
+        else:
+            body = encodeDelta(base, state)
+            baseTick = base.tick
+            slot.deltaStates += 1
+        flags = 0
+        if len(body) > COMPRESS_OVER:
+            packed = zlib.compress(body)
+            if len(packed) < len(body):
+                body = packed
+                flags |= COMPRESSED
+        data = HEADER.pack(MAGIC, STATE) + STATE_MSG.pack(state.tick, baseTick, slot.lastSeq, flags) + body
+        self.send(data, slot.address)
+        slot.bytesSent += len(data)
+        slot.largestState = max(slot.largestState, len(data))
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the ticks run, the mean time
+        per tick (ms) and, for every client, the bytes sent and received per
+        tick, the number of full and delta states, the largest state (bytes)
+        and the inputs dropped to catch up.'''
+        ticks = max(self.game.tick, 1)
+        return {"ticks": self.game.tick, "tickTime": self.tickTime/ticks*1000,
+                "clients": [{"sentPerTick": slot.bytesSent/ticks,
+                             "receivedPerTick": slot.bytesReceived/ticks,
+                             "fullStates": slot.fullStates, "deltaStates": slot.deltaStates,
+                             "largestState": slot.largestState,
+                             "droppedInputs": slot.droppedInputs} for slot in self.slots]}
+
+class NetSprite(pygame.sprite.DirtySprite):
+    '''This class draws an entity of a NetState on a client.'''
+    def __init__(self, kind, cellSize):
+        '''This initializer takes the kind of the entity (int) and the size of
+        a cell in pixels (int).'''
+        pygame.sprite.DirtySprite.__init__(self)
+        self.dirty = 2
+        self.kind = kind
+        self.cellSize = cellSize
+        self.frame = None
+        self._layer = sprites.PLAYER_LAYER if kind in (PLAYER, LASER) else sprites.ENEMY_LAYER
+        self.setFrame(0)
+        self.rect = self.image.get_rect()
+
+    def setFrame(self, frame):
+        '''This mutator changes the image to the given frame (int): which way a
+        centipede segment or scorpion faces.'''
+        if frame == self.frame:
+            return
+        self.frame = frame
+        size = (self.cellSize, self.cellSize)
+        if self.kind == LASER:
+            self.image = assets.getFilled((2, 15), (255, 0, 0))
+        elif self.kind == CENTIPEDE:
+            self.image = assets.getImage(("images/UD-centipede.png", "images/LR-centipede.png")[frame], size)
+        elif self.kind == SCORPION:
+            self.image = assets.getImage(("images/scorpion_right.png", "images/scorpion_left.png")[frame],
+                                         (self.cellSize*5//4, self.cellSize))
+        else:
+            path = {PLAYER: "images/head.png", SPIDER: "images/spider.png", FLEA: "images/flea.png"}[self.kind]
+            self.image = assets.getImage(path, size)
+
+class GameClient(asyncio.DatagramProtocol):
+    '''This class plays one player of a co-op game hosted by a GameServer. It
+    keeps a copy of the game to draw: a MushroomField and a LayeredDirty group
+    of sprites, with its own Player predicted.'''
+    def __init__(self, policy, shim=None):
+        '''This initializer takes the input policy, a function that takes the
+        tick (int) and returns the inputs (tuple) for it, and an optional
+        LinkShim to send through.'''
+        self.policy = policy
+        self.shim = shim or LinkShim()
+        self.transport = None
+        self.address = None
+        self.welcomed = asyncio.Event()
+        self.started = asyncio.Event()
+        self.finished = False
+
+        # Set by the server's WELCOME
+        self.index = None
+        self.numPlayers = 0
+        self.field = None
+        self.player = None
+        self.allSprites = pygame.sprite.LayeredDirty()
+        self.views = {}
+
+        # tick -> NetState received, for the last HISTORY ticks, and the newest
+        self.states = {}
+        self.newest = None
+        self.lastHeard = 0.0
+
+        # Inputs sent that the server has not processed: number -> (code,
+        # time sent), and where they put the predicted Player
+        self.seq = 0
+        self.pending = {}
+        self.predicted = {}
+        self.processedSeq = 0
+
+        # Statistics
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.statesReceived = 0
+        self.fullStates = 0
+        self.staleStates = 0
+        self.undecodable = 0
+        self.missedTicks = 0
+        self.latencies = []
+        self.corrections = 0
+        self.correctionDistance = 0
+
+    def connection_made(self, transport):
+        '''This method is called by asyncio with the client's transport.'''
+        self.transport = transport
+
+    def send(self, data):
+        '''This method sends a datagram to the server.'''
+        self.shim.send(self.transport, data, self.address)
+        self.bytesSent += len(data)
+
+    def datagram_received(self, data, address):
+        '''This method is called by asyncio with every datagram received.'''
+        try:
+            magic, kind = HEADER.unpack_from(data)
+        except struct.error:
+            return
+        if magic != MAGIC:
+            return
+        self.lastHeard = time.perf_counter()
+        self.bytesReceived += len(data)
+        if kind == WELCOME and not self.welcomed.is_set():
+            try:
+                version, self.index, self.numPlayers, cols, rows, cellSize = WELCOME_MSG.unpack_from(data, HEADER.size)
+            except struct.error:
+                return
+            bounds = pygame.Rect(0, 0, cols*cellSize, rows*cellSize)
+            self.field = field.MushroomField(cols, rows, cellSize)
+            self.player = sprites.Player(bounds, cellSize)
+            self.allSprites.add(self.player)
+            self.welcomed.set()
+        elif kind == STATE and self.welcomed.is_set():
+            self.receiveState(data)
+        elif kind == BYE:
+            self.finished = True
+
+    def receiveState(self, data):
+        '''This method decodes a state from the server and reconciles the
+        predicted Player with it. States older than the newest one are
+        ignored.'''
+        try:
+            tick, baseTick, lastSeq, flags = STATE_MSG.unpack_from(data, HEADER.size)
+        except struct.error:
+            return
+        self.statesReceived += 1
+        if self.newest is not None and tick <= self.newest.tick:
+            self.staleStates += 1
+            return
+        body = data[HEADER.size + STATE_MSG.size:]
+        try:
+            if flags & COMPRESSED:
+                body = zlib.decompress(body)
+            if baseTick:
+                base = self.states.get(baseTick)
+                if base is None:
+                    raise ValueError("the base state is not held")
+            else:
+                base = emptyState(len(self.field.health))
+                self.fullStates += 1
+            state = decodeDelta(base, tick, body)
+        except (ValueError, zlib.error):
+            self.undecodable += 1
+            return
+        if self.newest is not None:
+            self.missedTicks += tick - self.newest.tick - 1
+        self.states[tick] = state
+        for old in [old for old in self.states if old <= tick - HISTORY]:
+            del self.states[old]
+        self.newest = state
+        self.reconcile(lastSeq, state)
+        self.started.set()
+
+    def reconcile(self, lastSeq, state):
+        '''This method takes the number of the last input the server processed
+        (int) and the state it sent, moves the Player to where the server has
+        it and replays the inputs sent since.'''
+        kind, frame, left, top = state.entities[self.index]
+        if lastSeq > self.processedSeq:
+            sent = self.pending.get(lastSeq)
+            if sent is not None:
+                self.latencies.append(time.perf_counter() - sent[1])
+            predicted = self.predicted.get(lastSeq)
+            if predicted is not None and predicted != (left, top):
+                self.corrections += 1
+                self.correctionDistance += abs(predicted[0]-left) + abs(predicted[1]-top)
+            for seq in [seq for seq in self.pending if seq <= lastSeq]:
+                del self.pending[seq]
+                self.predicted.pop(seq, None)
+            self.processedSeq = lastSeq
+
+        self.player.rect.topleft = (left, top)
+        if not state.counters[PAUSE]:
+            for seq, (code, sent) in self.pending.items():
+                self.player.setDirection(replay.decodeInput(code)[0])
+                self.player.update()
+                self.predicted[seq] = self.player.rect.topleft
+
+    def sendInput(self, inputs):
+        '''This method sends the inputs (tuple) for the next tick, with the
+        ones the server has not processed yet, and predicts where they move
+        the Player.'''
+        self.seq += 1
+        code = replay.encodeInput(inputs)
+        self.pending[self.seq] = (code, time.perf_counter())
+        if self.newest is not None and not self.newest.counters[PAUSE]:
+            self.player.setDirection(inputs[0])
+            self.player.update()
+            self.predicted[self.seq] = self.player.rect.topleft
+        codes = bytes(entry[0] for entry in list(self.pending.values())[-REDUNDANCY:])
+        ackTick = self.newest.tick if self.newest is not None else 0
+        self.send(HEADER.pack(MAGIC, INPUT) + INPUT_MSG.pack(ackTick, self.seq, len(codes)) + codes)
+
+    def updateView(self):
+        '''This method makes the field and the sprites match the newest
+        state.'''
+        state = self.newest
+        self.field.load(state.health, state.poison)
+        for entityId in [entityId for entityId in self.views if entityId not in state.entities]:
+            self.views.pop(entityId).kill()
+        for entityId, (kind, frame, left, top) in state.entities.items():
+            if entityId == self.index:
+                continue
+            view = self.views.get(entityId)
+            if view is None or view.kind != kind:
+                if view is not None:
+                    view.kill()
+                view = NetSprite(kind, self.field.cellSize)
+                self.views[entityId] = view
+                self.allSprites.add(view)
+            view.setFrame(frame)
+            view.rect.topleft = (left, top)
+
+    async def join(self, host, port=PORT):
+        '''This coroutine sends HELLOs to the server until it answers. It
+        raises ConnectionError if it does not answer within JOIN_TIMEOUT.'''
+        self.address = (host, port)
+        deadline = time.perf_counter() + JOIN_TIMEOUT
+        while not self.welcomed.is_set():
+            if time.perf_counter() > deadline:
+                raise ConnectionError("the server at %s:%d did not answer" % self.address)
+            self.send(HEADER.pack(MAGIC, HELLO) + HELLO_MSG.pack(VERSION))
+            try:
+                await asyncio.wait_for(self.welcomed.wait(), HELLO_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, maxTicks=0, frame=None):
+        '''This coroutine waits for the game to start, then sends an input
+        every tick until the server ends the game (or maxTicks have run or the
+        server went silent). If frame is given, it is called with the client
+        after every tick, e.g. to draw.'''
+        await self.started.wait()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        tick = 0
+        while not self.finished and not (maxTicks and tick >= maxTicks):
+            tick += 1
+            self.sendInput(self.policy(tick))
+            self.updateView()
+            if frame is not None:
+                frame(self)
+            if time.perf_counter() - self.lastHeard > SERVER_TIMEOUT:
+                break
+            await asyncio.sleep(max(0.0, start + tick/simulation.TICK_RATE - loop.time()))
+        self.send(HEADER.pack(MAGIC, BYE))
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the bytes sent and received
+        per tick, the states received (full, stale, undecodable), the ticks
+        with no state, the input latency (ms: mean, p50, p99) and the number of
+        corrections to the predicted Player with their mean distance (px).'''
+        ticks = max(self.seq, 1)
+        latencies = sorted(self.latencies)
+        def percentile(pct):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies)-1, int(len(latencies)*pct/100))]*1000
+        return {"sentPerTick": self.bytesSent/ticks, "receivedPerTick": self.bytesReceived/ticks,
+                "states": self.statesReceived, "fullStates": self.fullStates,
+                "staleStates": self.staleStates, "undecodable": self.undecodable,
+                "missedTicks": self.missedTicks,
+                "latency": {"mean": sum(latencies)/max(len(latencies), 1)*1000,
+                            "p50": percentile(50), "p99": percentile(99)},
+                "corrections": self.corrections,
+                "correctionDistance": self.correctionDistance/max(self.corrections, 1)}
+
+def sweepPolicy(offset):
+    '''This function returns a bot's input policy: sweep left and right with
+    the fire button held, starting the sweep the given number of ticks (int)
+    late so that two bots do not move in step.'''
+    def policy(tick):
+        if ((tick + offset)//45) % 2:
+            return (simulation.LEFT, True)
+        return (simulation.RIGHT, True)
+    return policy
+
+async def loopback(args):
+    '''This coroutine runs a server and two bot clients over UDP on
+    127.0.0.1, through LinkShims with the given latency, jitter and loss, and
+    prints what each end measured. It returns True if every client ended with
+    the server's state.'''
+    loop = asyncio.get_running_loop()
+    server = GameServer(2, args.seed, args.ticks+1, shim=LinkShim(args.latency, args.jitter, args.loss, 1),
+                        maxTicks=args.ticks)
+    transport, protocol = await loop.create_datagram_endpoint(lambda: server, local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+    clients = []
+    for i in range(2):
+        client = GameClient(sweepPolicy(i*20), LinkShim(args.latency, args.jitter, args.loss, i+2))
+        await loop.create_datagram_endpoint(lambda: client, local_addr=("127.0.0.1", 0))
+        clients.append(client)
+    serverTask = asyncio.ensure_future(server.run())
+    for client in clients:
+        await client.join("127.0.0.1", port)
+    await asyncio.gather(serverTask, *[client.run() for client in clients])
+
+    stats = server.getStats()
+    print("server: %d ticks, %.3f ms per tick" % (stats["ticks"], stats["tickTime"]))
+    inSync = True
+    for i, (client, slot) in enumerate(zip(clients, stats["clients"])):
+        sent = client.getStats()
+        print("client %d: down %.1f B/tick (largest %d B, %d full, %d deltas), up %.1f B/tick, "
+              "%d inputs dropped" % (i, slot["sentPerTick"], slot["largestState"], slot["fullStates"],
+                                     slot["deltaStates"], slot["receivedPerTick"], slot["droppedInputs"]))
+        print("          input latency mean %.1f ms, p50 %.1f ms, p99 %.1f ms; %d ticks missed, "
+              "%d stale, %d undecodable; %d corrections (%.1f px)"
+              % (sent["latency"]["mean"], sent["latency"]["p50"], sent["latency"]["p99"],
+                 sent["missedTicks"], sent["staleStates"], sent["undecodable"],
+                 sent["corrections"], sent["correctionDistance"]))
+        final = server.history.get(client.newest.tick)
+        if final is None or final != client.newest:
+            inSync = False
+    print("clients in sync with the server: %s" % inSync)
+    for client in clients:
+        client.transport.close()
+    transport.close()
+    return inSync
+
+async def play(args):
+    '''This coroutine plays one player of a co-op game in a window, hosting
+    the server as well if --host was given.'''
+    import renderer, main
+    loop = asyncio.get_running_loop()
+    serverTask = None
+    host = args.join
+    if args.host:
+        server = GameServer(2, args.seed, board=(args.cols, args.rows, args.cell_size))
+        await loop.create_datagram_endpoint(lambda: server, local_addr=("0.0.0.0", args.port))
+        serverTask = asyncio.ensure_future(server.run())
+        host = "127.0.0.1"
+    client = GameClient(lambda tick: main.readInputs())
+    await loop.create_datagram_endpoint(lambda: client, local_addr=("0.0.0.0", 0))
+    await client.join(host, args.port)
+
+    size = (client.field.cols*client.field.cellSize, client.field.rows*client.field.cellSize)
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption("Atari Centipede - player %d" % (client.index+1))
+    background = main.loadBackground(size)
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+    print("waiting for the other player...")
+    await client.started.wait()
+
+    scoreKeeper = sprites.Counter("Score", 0, 10)
+    lifeKeeper = sprites.Counter("Lives", 0, size[0]-120)
+    client.allSprites.add(scoreKeeper, lifeKeeper)
+    screenRenderer = renderer.DirtyRenderer(screen, background, client.allSprites, mushrooms=client.field)
+
+    def frame(client):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                client.finished = True
+        scoreKeeper.setCount(client.newest.counters[SCORE]-scoreKeeper.getCount())
+        lifeKeeper.setCount(client.newest.counters[LIVES]-lifeKeeper.getCount())
+        scoreKeeper.update()
+        lifeKeeper.update()
+        screenRenderer.draw()
+    await client.run(frame=frame)
+    if serverTask is not None:
+        await serverTask
+
+def main():
+    '''This function parses the command line and hosts, joins or tests a
+    co-op game.'''
+    parser = argparse.ArgumentParser(description="Two-player co-op Centipede over a LAN.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--host", action="store_true", help="host a game and play in it")
+    mode.add_argument("--join", metavar="HOST", help="join the game hosted at HOST")
+    mode.add_argument("--loopback", action="store_true",
+                      help="run a server and two bots over loopback and print the measurements")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cols", type=int, default=24)
+    parser.add_argument("--rows", type=int, default=32)
+    parser.add_argument("--cell-size", type=int, default=20)
+    parser.add_argument("--ticks", type=int, default=900, help="with --loopback, ticks to run")
+    parser.add_argument("--latency", type=float, default=0.0, help="with --loopback, one-way latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="with --loopback, latency jitter (s)")
+    parser.add_argument("--loss", type=float, default=0.0, help="with --loopback, fraction of datagrams lost")
+    args = parser.parse_args()
+    if args.cell_size <= 0 or args.cell_size % simulation.CENTIPEDE_SPEED:
+        parser.error("--cell-size must be a multiple of %d" % simulation.CENTIPEDE_SPEED)
+    if args.cols < 8 or args.rows < 12:
+        parser.error("the board must be at least 8 columns by 12 rows")
+
+    # Work from the game's directory so the assets are found
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.loopback:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        pygame.display.init()
+        # The sprites are drawn nowhere, so the window only sets the pixel format
+        pygame.display.set_mode((1, 1))
+        if args.seed is None:
+            args.seed = 2019
+        inSync = asyncio.run(loopback(args))
+        pygame.quit()
+        sys.exit(0 if inSync else 1)
+    pygame.init()
+    asyncio.run(play(args))
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+'''Desc: Object pools for the remake of Atari Centipede. Lasers, spiders,
+   fleas, scorpions, centipede segments and mushrooms are spawned and killed
+   many times a minute. A SpritePool keeps the sprites that died and hands
+   them out again, reset in place, instead of constructing new ones and
+   leaving the old ones to the garbage collector.
+
+   A GarbageCollector can also keep Python's cyclic garbage collector from
+   running in the middle of a frame: it is switched off while a game is
+   played and run by hand when a life is lost, while the board is frozen.
+
+   Usage:
+       lasers = pool.SpritePool(sprites.Laser, 32)
+       l = lasers.acquire(xPos, yPos)   # instead of sprites.Laser(xPos, yPos)
+       ...
+       l.release()                      # instead of l.kill()
+'''
+import gc, time
+
+class SpritePool(object):
+    '''This class keeps up to a given number of dead sprites of one class
+    for reuse. The class must be a sprites.PooledSprite whose reset() method
+    takes the same parameters as its initializer.'''
+    def __init__(self, spriteClass, cap=64):
+        '''This initializer takes the class of the sprites (a subclass of
+        sprites.PooledSprite) and the most dead sprites to keep (int); sprites
+        released while the pool is full are left to the garbage collector.'''
+        self.spriteClass = spriteClass
+        self.cap = cap
+        self.free = []
+
+        # Statistics; sprites constructed, handed out again and not kept
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def __len__(self):
+        '''This method returns the number of dead sprites waiting for reuse.'''
+        return len(self.free)
+
+    def acquire(self, *args):
+        '''This method takes the parameters of the class's initializer and
+        returns a sprite in the state the initializer would give it, reusing a
+        released one if there is any.'''
+        if self.free:
+            sprite = self.free.pop()
+            sprite.reset(*args)
+            self.reused += 1
+        else:
+            sprite = self.spriteClass(*args)
+            sprite.pool = self
+            self.created += 1
+        sprite.pooled = False
+        sprite.generation += 1
+        return sprite
+
+    def release(self, sprite):
+        '''This method kills a sprite handed out by acquire() and keeps it for
+        reuse if the pool is not full. Releasing a sprite twice does nothing.'''
+        sprite.kill()
+        if sprite.pooled:
+            return
+        sprite.pooled = True
+        if len(self.free) < self.cap:
+            self.free.append(sprite)
+        else:
+            self.discarded += 1
+
+    def setCap(self, cap):
+        '''This mutator takes the most dead sprites to keep (int) and drops
+        the extra ones.'''
+        self.cap = cap
+        self.discarded += max(len(self.free) - cap, 0)
+        del self.free[cap:]
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of sprites
+        constructed, reused (the allocations avoided) and discarded, and the
+        number waiting for reuse.'''
+        return {"created": self.created, "reused": self.reused,
+                "discarded": self.discarded, "free": len(self.free)}
+
+class GarbageCollector(object):
+    '''This class switches the cyclic garbage collector off while a game is
+    played, so that it cannot pause a frame, and runs it when asked.'''
+    def __init__(self, enabled=True):
+        '''This initializer takes whether to take over from the automatic
+        collector at all (boolean); if not, every method does nothing.'''
+        self.enabled = enabled
+        self.wasEnabled = gc.isenabled()
+
+        # Statistics; collections run, objects found unreachable and the
+        # longest collection (s)
+        self.collections = 0
+        self.collected = 0
+        self.longest = 0.0
+
+    def start(self):
+        '''This method switches the automatic collector off.'''
+        if self.enabled:
+            self.wasEnabled = gc.isenabled()
+            gc.disable()
+
+    def collect(self):
+        '''This method runs a full collection (e.g. between lives) and returns
+        the number of unreachable objects it found.'''
+        if not self.enabled:
+            return 0
+        start = time.perf_counter()
+        found = gc.collect()
+        self.longest = max(self.longest, time.perf_counter() - start)
+        self.collections += 1
+        self.collected += found
+        return found
+
+    def stop(self):
+        '''This method collects once more and switches the automatic
+        collector back on if it was on before start().'''
+        if self.enabled:
+            self.collect()
+            if self.wasEnabled:
+                gc.enable()
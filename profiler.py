@@ -0,0 +1,229 @@
+'''Desc: Opt-in, per-frame instrumentation for the game loops of the remake of
+   Atari Centipede. A FrameProfiler times each section of a frame, counts the
+   sprites in each group and the collision checks made, records frames that
+   overrun the 33 ms budget, draws a toggleable on-screen overlay and streams
+   every frame to a CSV or Chrome trace (chrome://tracing) JSON file.
+
+   When profiling is off the loops are given NULL, whose methods do nothing,
+   and GameSimulation.step() is passed no timer, so the cost is a few empty
+   method calls per frame.
+'''
+import json, time
+import pygame, sprites, text
+
+# Frame budget at clock.tick(30), in milliseconds
+BUDGET = 1000/30
+
+# Columns of the CSV trace (sections in ms, then counts)
+CSV_SECTIONS = ("wait", "events", "spawn", "lasers", "mushrooms", "player", "update",
+                "sounds", "gc", "hud", "draw", "capture")
+CSV_COUNTS = ("ticks", "centipedes", "mushrooms", "lasers", "spiders", "fleas", "scorpions",
+              "checks", "hits", "stolen", "dropped", "captureDrops", "poolReused", "repainted",
+              "assetHits", "assetMisses")
+
+class NullProfiler(object):
+    '''This class has the same interface as FrameProfiler but does nothing.'''
+    enabled = False
+    timer = None
+
+    def beginFrame(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def count(self, name, value):
+        pass
+
+    def endFrame(self, clock):
+        pass
+
+    def toggleOverlay(self):
+        pass
+
+    def attach(self, group):
+        pass
+
+    def close(self):
+        pass
+
+# The profiler used when profiling is off
+NULL = NullProfiler()
+
+class Overlay(pygame.sprite.DirtySprite):
+    '''This class defines the sprite showing the profiler's statistics on top
+    of everything else.'''
+    _layer = sprites.HUD_LAYER+1
+    def __init__(self):
+        '''This initializer has no parameters. The overlay starts hidden.'''
+        # Call the parent __init__() method
+        pygame.sprite.DirtySprite.__init__(self)
+        self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.rect = self.image.get_rect()
+        self.rect.topleft = (5, 45)
+        self.visible = 0
+
+    def setLines(self, lines):
+        '''This mutator takes a list of strings and redraws the overlay with one
+        line per string.'''
+        font = text.getFont(12, None)
+        rendered = [font.render(line, True, (255, 255, 0)) for line in lines]
+        width = max(line.get_width() for line in rendered) + 8
+        height = sum(line.get_height() for line in rendered) + 8
+        self.image = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.image.fill((0, 0, 0, 170))
+        yPos = 4
+        for line in rendered:
+            self.image.blit(line, (4, yPos))
+            yPos += line.get_height()
+        self.rect = self.image.get_rect(topleft=self.rect.topleft)
+        self.dirty = 1
+
+class FrameProfiler(object):
+    '''This class collects the timings and counts of every frame.'''
+    enabled = True
+
+    def __init__(self, tracePath=None, budget=BUDGET, refresh=15):
+        '''This initializer takes an optional path (string) to stream the frames
+        to (CSV if it ends in ".csv", Chrome trace JSON otherwise), the frame
+        budget in milliseconds and how often the overlay is redrawn (frames).'''
+        self.budget = budget
+        self.refresh = refresh
+        self.frame = 0
+        self.overruns = 0
+        self.overlay = Overlay()
+
+        # The current frame: (name, start, duration) per section, and counts
+        self.sections = []
+        self.counts = {}
+        self.frameStart = 0.0
+        self.lastMark = 0.0
+
+        # Totals since the overlay was last redrawn
+        self.totals = {}
+        self.totalFrameTime = 0.0
+        self.totalFrames = 0
+
+        # Trace file
+        self.traceFile = None
+        self.chrome = False
+        if tracePath is not None:
+            self.traceFile = open(tracePath, "w")
+            self.chrome = not tracePath.endswith(".csv")
+            if self.chrome:
+                self.traceFile.write("[\n")
+            else:
+                header = ["frame", "frameMs", "overrun"] + [name+"Ms" for name in CSV_SECTIONS]
+                self.traceFile.write(",".join(header + list(CSV_COUNTS)) + "\n")
+        self.origin = time.perf_counter()
+
+    def beginFrame(self):
+        '''This method starts timing a new frame.'''
+        self.sections = []
+        self.counts = {}
+        self.frameStart = self.lastMark = time.perf_counter()
+
+    def mark(self, name):
+        '''This method charges the time since the last mark (or the start of the
+        frame) to the section with the given name (string).'''
+        now = time.perf_counter()
+        self.sections.append((name, self.lastMark, now-self.lastMark))
+        self.lastMark = now
+
+    def timer(self, name, seconds):
+        '''This method is passed to GameSimulation.step() to record each phase
+        of the simulation as its own section.'''
+        now = time.perf_counter()
+        self.sections.append((name, now-seconds, seconds))
+        self.lastMark = now
+
+    def count(self, name, value):
+        '''This method records a count (int) for this frame, e.g. the number of
+        sprites in a group or of collision checks, or a fraction (float), e.g.
+        of the screen repainted.'''
+        self.counts[name] = value
+
+    def attach(self, group):
+        '''This method adds the overlay sprite to a LayeredDirty group so that
+        it is drawn with the rest of the screen.'''
+        group.add(self.overlay)
+
+    def toggleOverlay(self):
+        '''This method shows or hides the on-screen overlay.'''
+        self.overlay.visible = 0 if self.overlay.visible else 1
+
+    def endFrame(self, clock):
+        '''This method takes the loop's pygame.time.Clock and finishes the
+        frame: it checks the frame time against the budget, writes the frame to
+        the trace file and refreshes the overlay.'''
+        frameTime = clock.get_time()
+        overrun = frameTime > self.budget
+        if overrun:
+            self.overruns += 1
+
+        for name, start, duration in self.sections:
+            self.totals[name] = self.totals.get(name, 0.0) + duration
+        self.totalFrameTime += frameTime
+        self.totalFrames += 1
+
+        if self.traceFile is not None:
+            self.writeFrame(frameTime, overrun)
+        if self.overlay.visible and self.totalFrames >= self.refresh:
+            self.updateOverlay(clock)
+        if self.totalFrames >= self.refresh:
+            self.totals = {}
+            self.totalFrameTime = 0.0
+            self.totalFrames = 0
+        self.frame += 1
+
+    def updateOverlay(self, clock):
+        '''This method redraws the overlay with the average time of each section
+        and the latest counts.'''
+        frames = self.totalFrames
+        lines = ["frame %d  %.1f fps  %.1f ms/frame  overruns %d" %
+                 (self.frame, clock.get_fps(), self.totalFrameTime/frames, self.overruns)]
+        for name, total in self.totals.items():
+            lines.append("%-10s %7.3f ms" % (name, total/frames*1000))
+        for name, value in sorted(self.counts.items()):
+            if isinstance(value, float):
+                lines.append("%-10s %7.3f" % (name, value))
+            else:
+                lines.append("%-10s %7d" % (name, value))
+        self.overlay.setLines(lines)
+
+    def writeFrame(self, frameTime, overrun):
+        '''This method streams the current frame to the trace file.'''
+        if self.chrome:
+            events = []
+            for name, start, duration in self.sections:
+                events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": round((start-self.origin)*1e6, 1),
+                               "dur": round(duration*1e6, 1)})
+            timestamp = round((self.frameStart-self.origin)*1e6, 1)
+            counts = dict(self.counts)
+            counts["frameMs"] = frameTime
+            events.append({"name": "counts", "ph": "C", "pid": 1, "tid": 1,
+                           "ts": timestamp, "args": counts})
+            if overrun:
+                events.append({"name": "overrun", "ph": "i", "s": "t", "pid": 1,
+                               "tid": 1, "ts": timestamp})
+            for event in events:
+                self.traceFile.write(json.dumps(event) + ",\n")
+        else:
+            durations = {}
+            for name, start, duration in self.sections:
+                durations[name] = durations.get(name, 0.0) + duration
+            row = [str(self.frame), str(frameTime), str(int(overrun))]
+            row += ["%.4f" % (durations.get(name, 0.0)*1000) for name in CSV_SECTIONS]
+            for name in CSV_COUNTS:
+                value = self.counts.get(name, 0)
+                row.append("%.4f" % value if isinstance(value, float) else str(value))
+            self.traceFile.write(",".join(row) + "\n")
+
+    def close(self):
+        '''This method finishes and closes the trace file.'''
+        if self.traceFile is not None:
+            if self.chrome:
+                self.traceFile.write("{}]\n")
+            self.traceFile.close()
+            self.traceFile = None
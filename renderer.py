@@ -0,0 +1,116 @@
+'''Desc: A dirty-rectangle renderer for the remake of Atari Centipede. The
+   sprites live in one persistent pygame.sprite.LayeredDirty group (background /
+   mushrooms / enemies / player / HUD), so nothing is rebuilt when a sprite
+   spawns or dies. Each frame only the regions that changed are erased, redrawn
+   and pushed to the display with pygame.display.update(rects).
+
+   The mushrooms are not in the group. A MushroomLayer bakes them onto a copy
+   of the background, which the group erases with, and repaints a cell only
+   when its mushroom changes, so the cost of a frame does not grow with the
+   number of mushrooms.
+'''
+import pygame
+
+class MushroomLayer(object):
+    '''This class keeps a copy of the background with the mushrooms of a
+    MushroomField drawn on it.'''
+    def __init__(self, field, background):
+        '''This initializer takes a MushroomField and the background surface,
+        and draws every mushroom.'''
+        self.field = field
+        self.background = background
+        self.surface = background.copy()
+        field.takeChanged()
+        for index in field.views:
+            self.paint(index)
+
+    def paint(self, index):
+        '''This method redraws the cell with the given index (int) from the
+        background and its mushroom, if it has one. It returns the cell's rect.'''
+        size = self.field.cellSize
+        rect = pygame.Rect(index % self.field.cols*size, index//self.field.cols*size, size, size)
+        self.surface.blit(self.background, rect, rect)
+        view = self.field.views.get(index)
+        if view is not None:
+            self.surface.blit(view.image, view.rect)
+        return rect
+
+    def update(self):
+        '''This method repaints the cells that changed since the last update
+        and returns their rects.'''
+        return [self.paint(index) for index in self.field.takeChanged()]
+
+class DirtyRenderer(object):
+    '''This class draws a LayeredDirty group onto the screen and keeps count of
+    how much of the screen is repainted per frame.'''
+    def __init__(self, screen, background, sprites, dirtyRects=True, mushrooms=None,
+                 present=True):
+        '''This initializer takes the screen surface, the background surface, a
+        LayeredDirty sprite group, whether to use dirty rectangles (boolean),
+        an optional MushroomField to draw under the sprites and whether to push
+        the frames to the display (boolean; False to draw on an offscreen
+        surface). If dirtyRects is False, the whole screen is redrawn every
+        frame.'''
+        self.screen = screen
+        self.present = present
+        self.layer = None
+        if mushrooms is not None:
+            self.layer = MushroomLayer(mushrooms, background)
+            background = self.layer.surface
+        self.background = background
+        self.sprites = sprites
+        self.sprites.clear(screen, background)
+        self.setDirtyRects(dirtyRects)
+
+        # Statistics
+        self.screenArea = screen.get_width()*screen.get_height()
+        self.frames = 0
+        self.totalFraction = 0.0
+        self.lastFraction = 0.0
+
+    def setDirtyRects(self, dirtyRects):
+        '''This mutator accepts a boolean and switches between dirty rectangle
+        mode and full-screen redraws.'''
+        self.dirtyRects = dirtyRects
+        if dirtyRects:
+            # Never fall back to full-screen redraws because a frame was slow
+            self.sprites.set_timing_threshold(float("inf"))
+        else:
+            self.sprites.set_timing_threshold(-1)
+        # The next frame repaints the whole screen
+        self.repaintAll()
+
+    def repaintAll(self):
+        '''This method makes the next frame repaint the whole screen, e.g.
+        after something was drawn on the screen outside of the sprite group.'''
+        self.sprites.repaint_rect(self.screen.get_rect())
+
+    def draw(self):
+        '''This method erases and redraws the sprites that changed since the
+        last frame and pushes only those regions to the display. It returns the
+        list of rects that were updated.'''
+        if self.layer is not None:
+            for rect in self.layer.update():
+                self.sprites.repaint_rect(rect)
+        rects = self.sprites.draw(self.screen)
+        if self.present:
+            pygame.display.update(rects)
+
+        # The rects LayeredDirty returns do not overlap
+        area = 0
+        for rect in rects:
+            area += rect.width*rect.height
+        self.lastFraction = min(area/self.screenArea, 1.0)
+        self.totalFraction += self.lastFraction
+        self.frames += 1
+        return rects
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of frames drawn,
+        the fraction of the screen repainted in the last frame and the average
+        fraction over all frames.'''
+        average = 0.0
+        if self.frames:
+            average = self.totalFraction/self.frames
+        return {"frames": self.frames, "lastFraction": self.lastFraction,
+                "averageFraction": average}
@@ -0,0 +1,305 @@
+'''Desc: Input-log replays for the remake of Atari Centipede. Since a
+   GameSimulation is deterministic, a game is recorded as its seed, number of
+   lives, the starting mushroom layout and one input (direction + fire) per tick. The
+   inputs are run-length encoded and compressed, so a game of several minutes
+   fits in a few hundred bytes.
+
+   A ReplayPlayer re-runs the simulation from the recording. It keeps a
+   snapshot of the game every KEYFRAME_EVERY ticks, so seeking only
+   re-simulates the ticks since the nearest keyframe.
+
+   Usage:
+       python replay.py replays/game.replay             watch at 1x
+       python replay.py replays/game.replay --seek 900  start at tick 900
+       python replay.py replays/game.replay --verify    fast-forward headlessly
+
+   While watching: F toggles fast-forward (frames are not drawn), left and
+   right arrows seek back and forward 10 seconds, Escape quits.
+'''
+import os, sys, struct, time, zlib, argparse
+
+import pygame, field, simulation, snapshot
+
+# File header: magic, version, seed, lives, cols, rows, cell size, ticks,
+# final score, mushrooms
+HEADER = struct.Struct("<4sHqBHHHIqH")
+MAGIC = b"CRPL"
+VERSION = 5
+# One starting mushroom: cell index, health, poison
+MUSHROOM = struct.Struct("<HBB")
+
+# Inputs are stored as DIRECTIONS.index(direction)*2 + fire
+DIRECTIONS = (simulation.STILL, simulation.UP, simulation.DOWN, simulation.LEFT, simulation.RIGHT)
+
+# Ticks between keyframes
+KEYFRAME_EVERY = simulation.TICK_RATE*2
+
+def encodeInput(inputs):
+    '''This function packs a (direction, fire) input into one small int.'''
+    return DIRECTIONS.index(tuple(inputs[0]))*2 + (1 if inputs[1] else 0)
+
+def decodeInput(code):
+    '''This function unpacks an int made by encodeInput().'''
+    return (DIRECTIONS[code//2], bool(code % 2))
+
+def writeVarint(out, value):
+    '''This function appends an unsigned int to a bytearray, 7 bits per byte.'''
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def readVarint(data, offset):
+    '''This function reads an int written by writeVarint() and returns it with
+    the offset of the next byte.'''
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+class Replay(object):
+    '''This class holds a recorded game: the seed, the starting mushrooms and
+    the inputs as a list of [code, run length] pairs.'''
+    def __init__(self, seed, mushrooms, lives=3):
+        '''This initializer takes the seed (int) of the game, the
+        MushroomField it starts with and the number of lives (int). The layout
+        is copied, since the game changes the field as it is played.'''
+        self.seed = seed
+        self.lives = lives
+        self.cols = mushrooms.cols
+        self.rows = mushrooms.rows
+        self.cellSize = mushrooms.cellSize
+        self.layout = [(index, mushrooms.health[index], mushrooms.poison[index])
+                       for index in sorted(mushrooms.views)]
+        self.runs = []
+        self.ticks = 0
+        self.score = 0
+
+    def record(self, inputs):
+        '''This method appends the inputs (tuple) given to one tick.'''
+        code = encodeInput(inputs)
+        if self.runs and self.runs[-1][0] == code:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([code, 1])
+        self.ticks += 1
+
+    def inputs(self):
+        '''This generator yields the input of every tick in order.'''
+        for code, length in self.runs:
+            inputs = decodeInput(code)
+            for i in range(length):
+                yield inputs
+
+    def makeField(self):
+        '''This method returns a new MushroomField holding the starting
+        mushrooms.'''
+        mushrooms = field.MushroomField(self.cols, self.rows, self.cellSize)
+        for index, health, poison in self.layout:
+            cell = (index % self.cols, index//self.cols)
+            mushrooms.place(mushrooms.getCenter(cell), health)
+            if poison:
+                mushrooms.setPoisonous(cell, True)
+        return mushrooms
+
+    def makeGame(self):
+        '''This method returns a new GameSimulation in the recorded starting
+        state.'''
+        return simulation.GameSimulation(self.makeField(), self.seed, self.lives)
+
+    def toBytes(self):
+        '''This method returns the replay as bytes.'''
+        body = bytearray()
+        for entry in self.layout:
+            body += MUSHROOM.pack(*entry)
+        for code, length in self.runs:
+            body.append(code)
+            writeVarint(body, length)
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.lives, self.cols, self.rows,
+                             self.cellSize, self.ticks, self.score, len(self.layout))
+        return header + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def fromBytes(cls, data):
+        '''This class method parses bytes made by toBytes() and returns the
+        Replay. It raises ValueError if they are not a replay.'''
+        if len(data) < HEADER.size:
+            raise ValueError("not a replay")
+        magic, version, seed, lives, cols, rows, cellSize, ticks, score, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a replay, or an unsupported version")
+        try:
+            body = zlib.decompress(data[HEADER.size:])
+        except zlib.error:
+            raise ValueError("the replay is corrupt")
+
+        replay = cls(seed, field.MushroomField(cols, rows, cellSize), lives)
+        try:
+            replay.layout = [MUSHROOM.unpack_from(body, i*MUSHROOM.size) for i in range(count)]
+            offset = count*MUSHROOM.size
+            while offset < len(body):
+                code = body[offset]
+                length, offset = readVarint(body, offset+1)
+                replay.runs.append([code, length])
+        except (struct.error, IndexError):
+            raise ValueError("the replay is corrupt")
+        replay.ticks = ticks
+        replay.score = score
+        if sum(length for code, length in replay.runs) != ticks:
+            raise ValueError("the replay is corrupt")
+        return replay
+
+    def save(self, path):
+        '''This method writes the replay to a file, creating its directory.'''
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "wb") as outFile:
+            outFile.write(self.toBytes())
+
+    @classmethod
+    def load(cls, path):
+        '''This class method reads a replay from a file.'''
+        with open(path, "rb") as inFile:
+            return cls.fromBytes(inFile.read())
+
+class ReplayPlayer(object):
+    '''This class plays a Replay back one tick at a time and can seek to any
+    tick. The game is restored in place, so its allSprites group (and any
+    sprites added to it, e.g. the HUD) stays the same after a seek.'''
+    def __init__(self, replay, keyframeEvery=KEYFRAME_EVERY):
+        '''This initializer takes a Replay and the number of ticks between
+        keyframes (int).'''
+        self.replay = replay
+        self.keyframeEvery = keyframeEvery
+        self.inputs = list(replay.inputs())
+        self.game = replay.makeGame()
+        # tick -> snapshot of the game at the start of that tick
+        self.keyframes = {0: snapshot.capture(self.game)}
+
+    def getTick(self):
+        '''This accessor returns the number of ticks played so far.'''
+        return self.game.tick
+
+    def isFinished(self):
+        '''This method returns True once every recorded tick has been played.'''
+        return self.game.tick >= len(self.inputs)
+
+    def step(self):
+        '''This method plays the next recorded tick, storing a keyframe when one
+        is due. It returns False if the replay has ended.'''
+        tick = self.game.tick
+        if tick >= len(self.inputs):
+            return False
+        if tick % self.keyframeEvery == 0 and tick not in self.keyframes:
+            self.keyframes[tick] = snapshot.capture(self.game)
+        self.game.step(self.inputs[tick])
+        return True
+
+    def seek(self, tick):
+        '''This method moves the replay to the start of the given tick (int),
+        restoring the nearest keyframe before it and playing on from there.'''
+        tick = max(0, min(tick, len(self.inputs)))
+        start = max(key for key in self.keyframes if key <= tick)
+        if tick < self.game.tick or start > self.game.tick:
+            snapshot.restore(self.game, self.keyframes[start])
+        while self.game.tick < tick:
+            self.step()
+
+def watch(replay, seek=0):
+    '''This function opens a window and plays a replay at 1x speed, with
+    fast-forward and seeking (see the module docstring).'''
+    import assets, renderer, sprites
+
+    player = ReplayPlayer(replay)
+    game = player.game
+    screen = pygame.display.set_mode(game.bounds.size)
+    pygame.display.set_caption("Atari Centipede - replay")
+    background = assets.getImage("images/crystal-cave.jpg", game.bounds.size)
+    screen.blit(background, (0, 0))
+    pygame.display.flip()
+
+    scoreKeeper = sprites.Counter("Score", 0, 10)
+    lifeKeeper = sprites.Counter("Lives", game.lives, game.bounds.width-120)
+    hud = pygame.sprite.Group(scoreKeeper, lifeKeeper)
+    game.allSprites.add(hud)
+    player.seek(seek)
+    screenRenderer = renderer.DirtyRenderer(screen, background, game.allSprites,
+                                            mushrooms=game.mushrooms)
+
+    clock = pygame.time.Clock()
+    fastForward = False
+    keepGoing = True
+    while keepGoing:
+        clock.tick(30)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                keepGoing = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    keepGoing = False
+                elif event.key == pygame.K_f:
+                    fastForward = not fastForward
+                elif event.key == pygame.K_LEFT:
+                    player.seek(player.getTick() - simulation.TICK_RATE*10)
+                    screenRenderer.repaintAll()
+                elif event.key == pygame.K_RIGHT:
+                    player.seek(player.getTick() + simulation.TICK_RATE*10)
+                    screenRenderer.repaintAll()
+
+        if fastForward:
+            # Play as many ticks as fit in a frame without drawing them
+            deadline = time.perf_counter() + 0.025
+            while time.perf_counter() < deadline and player.step():
+                pass
+        else:
+            player.step()
+        if player.isFinished():
+            keepGoing = False
+
+        scoreKeeper.setCount(game.score-scoreKeeper.getCount())
+        lifeKeeper.setCount(game.lives-lifeKeeper.getCount())
+        hud.update()
+        screenRenderer.draw()
+
+def verify(replay):
+    '''This function plays a replay headlessly as fast as possible and returns
+    True if it reaches the recorded score.'''
+    player = ReplayPlayer(replay)
+    start = time.perf_counter()
+    while player.step():
+        pass
+    elapsed = time.perf_counter() - start
+    print("%d ticks in %.2f s (%.0fx real time), score %d (recorded %d)" %
+          (player.getTick(), elapsed, player.getTick()/simulation.TICK_RATE/max(elapsed, 1e-9),
+           player.game.score, replay.score))
+    return player.game.score == replay.score
+
+def main():
+    '''This function parses the command line and plays or verifies a replay.'''
+    parser = argparse.ArgumentParser(description="Play back a Centipede replay.")
+    parser.add_argument("path", help="replay file")
+    parser.add_argument("--seek", type=int, default=0, help="tick to start at")
+    parser.add_argument("--verify", action="store_true",
+                        help="fast-forward headlessly and check the recorded score")
+    args = parser.parse_args()
+
+    try:
+        replay = Replay.load(args.path)
+    except (ValueError, OSError) as error:
+        sys.exit("%s: %s" % (args.path, getattr(error, "strerror", None) or error))
+    # Work from the game's directory so the assets are found
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    if args.verify:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        sys.exit(0 if verify(replay) else 1)
+    pygame.init()
+    watch(replay, args.seek)
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
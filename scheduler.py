@@ -0,0 +1,106 @@
+'''Desc: A tick-based event scheduler for the remake of Atari Centipede.
+   Instead of comparing a "time of death" with the current time every tick
+   for every enemy type and player, the game schedules a named event for the
+   tick it is due at, and the Scheduler keeps the events in a heap so that
+   only the events that are due are looked at. Scheduling and running an
+   event is O(log n).
+
+   An event is a name and an argument (e.g. ("reload", 1) for the second
+   player), and there is at most one pending event for each pair:
+   scheduling it again moves it, and cancel() drops it. Everything is counted
+   in ticks, never in wall-clock time, so a game can be paused, fast-forwarded
+   or run headless simply by calling run() with the ticks it reaches.
+
+   Usage:
+       events = scheduler.Scheduler()
+       events.setHandler("spider", spawnSpider)
+       events.schedule(tick + 150, "spider")
+       ...
+       events.run(tick)   # calls spawnSpider(0) once tick reaches the event
+'''
+import heapq
+
+class Scheduler(object):
+    '''This class keeps pending events ordered by the tick they are due at,
+    and by the order they were scheduled in for events due at the same tick.'''
+    def __init__(self):
+        '''This initializer has no parameters. It creates an empty scheduler.'''
+        # (tick, sequence, name, argument) of every event scheduled; entries
+        # that were moved or cancelled are skipped when they reach the top
+        self.heap = []
+        # (name, argument) -> (tick, sequence) of the pending events
+        self.pending = {}
+        self.sequence = 0
+        self.handlers = {}
+
+    def __len__(self):
+        '''This method returns the number of pending events.'''
+        return len(self.pending)
+
+    def setHandler(self, name, handler):
+        '''This method takes the name of an event (string) and the function to
+        call with the event's argument when it is due.'''
+        self.handlers[name] = handler
+
+    def schedule(self, tick, name, argument=0):
+        '''This method schedules the named event (string) with the given
+        argument (int) for the given tick (int), replacing the pending event
+        with the same name and argument, if any.'''
+        self.sequence += 1
+        self.pending[(name, argument)] = (tick, self.sequence)
+        heapq.heappush(self.heap, (tick, self.sequence, name, argument))
+
+        # Drop the moved and cancelled entries once they outnumber the rest
+        if len(self.heap) > 2*len(self.pending) + 16:
+            self.heap = [(tick, sequence, name, argument)
+                         for (name, argument), (tick, sequence) in self.pending.items()]
+            heapq.heapify(self.heap)
+
+    def cancel(self, name, argument=0):
+        '''This method drops the pending event with the given name (string)
+        and argument (int), if any.'''
+        self.pending.pop((name, argument), None)
+
+    def getDue(self, name, argument=0):
+        '''This accessor returns the tick (int) the event with the given name
+        (string) and argument (int) is due at, or None if it is not pending.'''
+        entry = self.pending.get((name, argument))
+        if entry is None:
+            return None
+        return entry[0]
+
+    def run(self, tick):
+        '''This method calls the handler of every pending event due at or
+        before the given tick (int), in order, and returns how many it called.
+        Events the handlers schedule for that tick or earlier also run.'''
+        heap = self.heap
+        count = 0
+        while heap and heap[0][0] <= tick:
+            due, sequence, name, argument = heapq.heappop(heap)
+            if self.pending.get((name, argument)) != (due, sequence):
+                continue
+            del self.pending[(name, argument)]
+            self.handlers[name](argument)
+            count += 1
+        return count
+
+    def getEvents(self):
+        '''This accessor returns the pending events as a list of (tick,
+        sequence, name, argument) tuples in the order they will run.'''
+        return sorted((tick, sequence, name, argument)
+                      for (name, argument), (tick, sequence) in self.pending.items())
+
+    def load(self, events, sequence):
+        '''This method replaces the pending events with the given list of
+        (tick, sequence, name, argument) tuples, as returned by getEvents(),
+        and sets the number of events scheduled so far (int).'''
+        self.pending = dict(((name, argument), (tick, number))
+                            for tick, number, name, argument in events)
+        self.heap = list(events)
+        heapq.heapify(self.heap)
+        self.sequence = sequence
+
+    def clear(self):
+        '''This method drops every pending event.'''
+        self.heap = []
+        self.pending = {}
@@ -0,0 +1,520 @@
+'''Desc: The headless simulation core of the remake of Atari Centipede. A
+   GameSimulation advances the game by exactly one tick per call to step(),
+   using a tick counter instead of pygame.time.get_ticks() and a seeded random
+   number generator instead of the global random module. It never touches
+   pygame.display, so it can run under the SDL dummy driver (or without a
+   display at all) much faster than real time.
+
+   Everything that happens after a delay (spawns, the firing rate, the pause
+   after a lost life and the players' invulnerability) is an event in a
+   scheduler.Scheduler, due at a given tick.
+'''
+import pygame, random, time, sprites, field, engine, collision, pool, scheduler
+
+# The game loop in main.py runs at clock.tick(30)
+TICK_RATE = 30
+
+def msToTicks(ms):
+    '''This function converts a duration in milliseconds (int) to a number of
+    simulation ticks (int).'''
+    return ms*TICK_RATE//1000
+
+# Periodic events, in ticks
+CENTIPEDE_DELAY = msToTicks(1500)  # after the whole centipede dies
+SPIDER_DELAY = msToTicks(5000)
+FLEA_DELAY = msToTicks(7000)
+SCORPION_DELAY = msToTicks(6000)
+FIRING_RATE = msToTicks(500)       # how many ticks must pass between shots
+LIFE_LOST_PAUSE = msToTicks(1000)  # the board freezes after a life is lost
+INVULNERABLE_TICKS = 0             # invulnerability after a reset is off; set with invulnerableTicks
+
+# Enemies spawned by "spawn" events, whose argument is an index into it
+SPAWNED = ("centipede", "spider", "flea", "scorpion")
+# Every kind of scheduled event
+EVENTS = ("spawn", "reload", "resume", "vulnerable")
+
+# Pixels a centipede moves per tick; the cell size must be a multiple of it
+CENTIPEDE_SPEED = 4
+
+# Each centipede is a segment shorter than the last, down to MIN_LENGTH, and
+# every WAVES_PER_SPEEDUP centipedes it moves faster
+CENTIPEDE_LENGTH = 12
+MIN_LENGTH = 6
+WAVES_PER_SPEEDUP = 4
+
+# The most dead sprites of each kind kept for reuse
+POOL_CAPS = {"laser": 32, "centipede": 64, "spider": 4, "flea": 4, "scorpion": 4,
+             "mushroom": 256}
+
+# Points awarded
+POINTS = {"centipede": 50, "spider": 600, "flea": 200, "scorpion": 1000,
+          "mushroom": 1, "heal": 5}
+
+# Directions accepted by step()
+STILL, UP, DOWN, LEFT, RIGHT = (0,0), (0,1), (0,-1), (-1,0), (1,0)
+
+class GameSimulation(object):
+    '''This class holds the whole state of one game: the player, the enemy
+    sprite groups, the mushroom field, the score, the lives and the scheduled
+    events. It has no display, input or sound of its own; the sounds a tick
+    would play are listed in the events attribute instead.'''
+    def __init__(self, mushrooms=None, seed=None, lives=3, vectorized=False,
+                 cols=24, rows=32, cellSize=20, numPlayers=1, poolCaps=None):
+        '''This initializer takes an optional configuration of mushrooms
+        (MushroomField), an optional seed for the random number generator, the
+        number of lives (int), whether to move the enemies and lasers with
+        the vectorized EntityEngine (boolean) and the size of the board: its
+        number of columns and rows (int) and the size of a cell in pixels (int),
+        which must be a multiple of the centipedes' starting speed of 4. If
+        mushrooms are given, the board is the size of their field; if not, 20
+        are scattered at random (more on a larger board) using the seeded
+        generator. In a co-op game, numPlayers (int) players share the score
+        and the lives. poolCaps (dictionary) overrides the number of dead
+        sprites of some kinds kept for reuse (see POOL_CAPS). It raises
+        ValueError if the cell size is not allowed.'''
+        if mushrooms is not None:
+            cols, rows, cellSize = mushrooms.cols, mushrooms.rows, mushrooms.cellSize
+        if cellSize <= 0 or cellSize % CENTIPEDE_SPEED:
+            raise ValueError("the cell size must be a multiple of %d" % CENTIPEDE_SPEED)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.cellSize = cellSize
+        self.bounds = pygame.Rect(0, 0, cols*cellSize, rows*cellSize)
+        self.rows = range(cellSize//2, rows*cellSize, cellSize)
+
+        # Mushrooms
+        if mushrooms is None:
+            mushrooms = field.MushroomField(cols, rows, cellSize)
+            mushrooms.scatter(20*cols*rows//(24*32), self.rng)
+        self.mushrooms = mushrooms
+
+        # Dead sprites kept for reuse, by kind; the mushrooms' pool is the
+        # field's own
+        caps = dict(POOL_CAPS)
+        if poolCaps is not None:
+            caps.update(poolCaps)
+        self.pools = {"laser": pool.SpritePool(sprites.Laser, caps["laser"]),
+                      "centipede": pool.SpritePool(sprites.Centipede, caps["centipede"]),
+                      "spider": pool.SpritePool(sprites.Spider, caps["spider"]),
+                      "flea": pool.SpritePool(sprites.Flea, caps["flea"]),
+                      "scorpion": pool.SpritePool(sprites.Scorpion, caps["scorpion"]),
+                      "mushroom": mushrooms.pool}
+        mushrooms.pool.setCap(caps["mushroom"])
+
+        # Optional struct-of-arrays engine for the moving enemies and lasers
+        self.engine = None
+        if vectorized:
+            self.engine = engine.EntityEngine(mushrooms, self.bounds)
+
+        # Sprites; the players are spread evenly across the board, and the
+        # first one is also kept as player
+        self.players = pygame.sprite.Group()
+        for i in range(numPlayers):
+            self.players.add(sprites.Player(self.bounds, cellSize,
+                                            self.bounds.width*(i+1)//(numPlayers+1)))
+        self.player = self.players.sprites()[0]
+        self.centipedes = pygame.sprite.Group()
+        self.heads = pygame.sprite.Group()
+        self.chains = []
+        self.spiders = pygame.sprite.Group()
+        self.fleas = pygame.sprite.Group()
+        self.scorpions = pygame.sprite.Group()
+        self.lasers = pygame.sprite.Group()
+
+        # Moving groups in the order they are updated
+        self.updateGroups = (self.lasers, self.players, self.centipedes,
+                             self.scorpions, self.spiders, self.fleas)
+
+        # Every sprite but the mushrooms, kept by layer for drawing (the
+        # mushrooms are drawn by renderer.MushroomLayer)
+        self.allSprites = pygame.sprite.LayeredDirty(self.players)
+        self.wave = 0
+        self.spawnCentipede()
+
+        # Score and lives, and how many lives each enemy type has taken
+        self.score = 0
+        self.lives = lives
+        self.livesLost = {"centipede": 0, "spider": 0, "flea": 0}
+
+        # Delays (in ticks) and points; these can be changed to tune the game
+        self.centipedeDelay = CENTIPEDE_DELAY
+        self.spiderDelay = SPIDER_DELAY
+        self.fleaDelay = FLEA_DELAY
+        self.scorpionDelay = SCORPION_DELAY
+        self.firingRate = FIRING_RATE
+        self.invulnerableTicks = INVULNERABLE_TICKS
+        self.points = dict(POINTS)
+
+        # Tick counter, the events due at later ticks (the first tick
+        # schedules the first ones) and whether the board is frozen after a
+        # lost life
+        self.tick = 0
+        self.scheduler = scheduler.Scheduler()
+        self.scheduler.setHandler("spawn", self.spawnDue)
+        self.scheduler.setHandler("reload", self.reload)
+        self.scheduler.setHandler("resume", self.resume)
+        self.scheduler.setHandler("vulnerable", self.endInvulnerability)
+        self.frozen = False
+        self.gameOver = False
+
+        # Sounds to play for the last tick ("shoot", "splat", "hit", "buzzer")
+        self.events = []
+
+        # Inputs for the current tick: the first player's, and every player's
+        self.direction = STILL
+        self.shooting = False
+        self.inputs = [(STILL, False)]*numPlayers
+
+        # Number of candidate pairs tested and hits found in the last tick
+        self.collisionChecks = 0
+        self.collisionHits = 0
+
+        # What happens when two kinds of sprites meet, by phase
+        self.collider = collision.Collider(self.mushrooms)
+        for kind, group in (("player", self.players), ("centipede", self.centipedes),
+                            ("head", self.heads), ("spider", self.spiders), ("flea", self.fleas),
+                            ("scorpion", self.scorpions)):
+            self.collider.addGroup(kind, group)
+        self.collider.addGroup("laser", self.lasers, self.sweepLaser)
+        rules = [("lasers", "laser", "centipede", self.laserHitCentipede),
+                 ("lasers", "laser", collision.MUSHROOM, self.laserHitMushroom),
+                 ("lasers", "laser", "spider", self.laserHitEnemy),
+                 ("lasers", "laser", "flea", self.laserHitEnemy),
+                 ("lasers", "laser", "scorpion", self.laserHitEnemy),
+                 ("mushrooms", "head", collision.MUSHROOM, self.centipedeHitMushroom),
+                 ("mushrooms", "spider", collision.MUSHROOM, self.spiderHitMushroom),
+                 ("mushrooms", "scorpion", collision.MUSHROOM, self.scorpionHitMushroom),
+                 ("player", "player", "centipede", self.enemyCaughtPlayer),
+                 ("player", "player", "spider", self.enemyCaughtPlayer),
+                 ("player", "player", "flea", self.enemyCaughtPlayer)]
+        for rule in rules:
+            self.collider.addRule(*rule)
+
+        # The phases of a tick, in order. A phase that returns True ends the
+        # tick. Spawning comes first, so that the players reload before they
+        # shoot.
+        self.phases = (("spawn", self.spawnEnemies),
+                       ("events", self.handleInput),
+                       ("lasers", self.collideLasers),
+                       ("mushrooms", self.collideMushrooms),
+                       ("player", self.collidePlayer),
+                       ("update", self.updateSprites))
+
+    def add(self, group, sprite):
+        '''This method adds a newly spawned sprite to the given group and to
+        allSprites, and to the engine if the simulation is vectorized.'''
+        sprite.add(group, self.allSprites)
+        if self.engine is not None:
+            self.engine.add(sprite)
+
+    def addChain(self, chain):
+        '''This method adds a CentipedeChain's segments to the centipedes and
+        allSprites groups and its head to the heads group. Chains are moved by
+        their own update() method, never by the engine.'''
+        self.chains.append(chain)
+        for segment in chain.segments:
+            segment.add(self.centipedes, self.allSprites)
+        self.heads.add(chain.getHead())
+
+    def getWaveSpeed(self, wave):
+        '''This method returns the speed (int) of the centipedes of the given
+        wave (int): the next factor of the cell size every WAVES_PER_SPEEDUP
+        waves, up to half a cell per tick.'''
+        speeds = [speed for speed in range(CENTIPEDE_SPEED, self.cellSize//2 + 1)
+                  if self.cellSize % speed == 0] or [CENTIPEDE_SPEED]
+        return speeds[min(wave//WAVES_PER_SPEEDUP, len(speeds)-1)]
+
+    def spawnCentipede(self, length=None, xPos=None):
+        '''This method spawns a new centipede with the given number of segments
+        (int, one fewer for each wave cleared by default) at the top of the
+        screen, with its head at the given x-coordinate (int, 10 cells from
+        the left by default, or the last column on a narrower board). It moves
+        at the current wave's speed.'''
+        if length is None:
+            length = max(MIN_LENGTH, CENTIPEDE_LENGTH - self.wave)
+        self.addChain(sprites.CentipedeChain.spawn(length, self.getWaveSpeed(self.wave),
+                                                   self.bounds, self.cellSize, xPos,
+                                                   self.pools["centipede"].acquire))
+
+    def getPoolStats(self):
+        '''This accessor returns a dictionary of the statistics of each kind's
+        pool (see SpritePool.getStats()).'''
+        return dict((kind, spritePool.getStats()) for kind, spritePool in self.pools.items())
+
+    def step(self, inputs, timer=None):
+        '''This method takes the player's inputs for this tick as a tuple of a
+        direction (one of STILL, UP, DOWN, LEFT, RIGHT) and a boolean that is
+        True while the fire button is held; in a co-op game, it takes a list of
+        such tuples, one per player. It advances the game by exactly one tick.
+        If a timer is given, it is called with the name of each phase and the
+        time it took in seconds.'''
+        self.events = []
+        self.collisionChecks = 0
+        self.collisionHits = 0
+        self.collider.reset()
+        self.tick += 1
+        if self.gameOver:
+            return
+        if self.tick == 1:
+            self.startTimers()
+
+        # After a life is lost the board freezes until the "resume" event
+        # resets it
+        if self.frozen:
+            self.scheduler.run(self.tick)
+            return
+
+        if isinstance(inputs, list):
+            self.inputs = inputs
+        else:
+            self.inputs = [inputs]
+        self.direction, self.shooting = self.inputs[0]
+        if timer is None:
+            for name, phase in self.phases:
+                if phase():
+                    break
+        else:
+            for name, phase in self.phases:
+                start = time.perf_counter()
+                stop = phase()
+                timer(name, time.perf_counter()-start)
+                if stop:
+                    break
+        self.collisionChecks = self.collider.candidates
+        self.collisionHits = self.collider.hits
+
+    def startTimers(self):
+        '''This method is called by the first tick. It schedules the first
+        spider, flea and scorpion, and the players' first reload, counting
+        from tick 0, so that delays changed after the game was made apply.'''
+        for kind in ("spider", "flea", "scorpion"):
+            self.scheduler.schedule(getattr(self, kind + "Delay"), "spawn", SPAWNED.index(kind))
+        for index, player in enumerate(self.players):
+            player.canShoot = False
+            self.scheduler.schedule(self.firingRate, "reload", index)
+
+    def scheduleSpawn(self, kind, delay=None):
+        '''This method schedules the next centipede, spider, flea or scorpion
+        (kind, string) to spawn after the given number of ticks (int, the
+        kind's delay by default), replacing the one already scheduled.'''
+        if delay is None:
+            delay = getattr(self, kind + "Delay")
+        self.scheduler.schedule(self.tick + delay, "spawn", SPAWNED.index(kind))
+
+    def spawnDue(self, index):
+        '''This handler spawns the enemy a "spawn" event is for (an index into
+        SPAWNED), unless the board is frozen or one is already alive; the next
+        one is scheduled when it dies.'''
+        kind = SPAWNED[index]
+        if self.frozen:
+            return
+        if kind == "centipede":
+            if not self.centipedes:
+                self.spawnCentipede()
+        elif kind == "spider":
+            if not self.spiders:
+                self.add(self.spiders, self.pools["spider"].acquire(self.bounds, 4, self.rng, self.cellSize))
+        elif kind == "flea":
+            if not self.fleas:
+                self.add(self.fleas, self.pools["flea"].acquire(5, self.rng, self.bounds, self.cellSize))
+        elif not self.scorpions:
+            self.add(self.scorpions, self.pools["scorpion"].acquire(self.bounds, self.rng, self.cellSize))
+
+    def reload(self, index):
+        '''This handler lets the player with the given index (int) shoot
+        again.'''
+        self.players.sprites()[index].canShoot = True
+
+    def endInvulnerability(self, index):
+        '''This handler lets enemies catch the player with the given index
+        (int) again.'''
+        self.players.sprites()[index].invulnerable = False
+
+    def getPauseTicks(self):
+        '''This accessor returns the number of ticks (int) the board stays
+        frozen for after a lost life, or 0 if it is not frozen.'''
+        if not self.frozen:
+            return 0
+        return self.scheduler.getDue("resume") - self.tick
+
+    def handleInput(self):
+        '''This method moves each player in the direction given for this tick
+        and shoots a laser if their fire button is held and they have
+        reloaded. The reload is scheduled for when the firing rate allows the
+        next shot.'''
+        for index, (player, (direction, shooting)) in enumerate(zip(self.players, self.inputs)):
+            player.setDirection(direction)
+            if shooting and player.canShoot:
+                self.add(self.lasers, self.pools["laser"].acquire(player.rect.centerx, player.rect.top))
+                player.canShoot = False
+                self.scheduler.schedule(self.tick + self.firingRate, "reload", index)
+                self.events.append("shoot")
+
+    def spawnEnemies(self):
+        '''This method releases enemies that have left the screen, scheduling
+        the next ones, and lets fleas drop mushrooms. It then runs the events
+        due at this tick, which spawn new centipedes, spiders, fleas and
+        scorpions and let the players shoot again.'''
+        for spy in self.spiders:
+            if spy.rect.left < 0 or spy.rect.left > self.bounds.width:
+                # kill if they have gone off the screen
+                spy.release()
+                self.scheduleSpawn("spider")
+
+        for flea in self.fleas:
+            if flea.rect.centery in self.rows and self.rng.randrange(15) == 0:
+                # if flea is on a row, there is a 1 in 15 chance it will leave a mushroom behind
+                self.mushrooms.place(flea.rect.center)
+
+            if flea.rect.top > self.bounds.height:
+                # kill if they have gone off the screen
+                flea.release()
+                self.scheduleSpawn("flea")
+
+        for scor in self.scorpions:
+            if scor.rect.right < 0 or scor.rect.left > self.bounds.width:
+                # kill if they have gone off the screen
+                scor.release()
+                self.scheduleSpawn("scorpion")
+
+        self.scheduler.run(self.tick)
+
+    def sweepLaser(self, l):
+        '''This method returns the rect a laser covered since the last tick,
+        from where it is now down to where it was, so that it cannot pass
+        through a target moving towards it.'''
+        return pygame.Rect(l.rect.left, l.rect.top, l.rect.width, l.rect.height + l.travel)
+
+    def collideLasers(self):
+        '''This method resolves lasers hitting centipedes, mushrooms, spiders,
+        fleas and scorpions. Only the first target a laser reached is hit.'''
+        self.collider.resolve("lasers")
+
+    def laserHitCentipede(self, l, cent, kind):
+        '''This handler kills both, splits the centipede in two where it was
+        hit, spawns a mushroom and scores 50 pts. Clearing the last segment
+        starts the next wave.'''
+        self.events.append("splat")
+        self.score += self.points["centipede"]
+        l.release()
+        chain = cent.chain
+        rear = chain.split(cent)
+        if not chain.segments:
+            self.chains.remove(chain)
+        if rear is not None:
+            self.chains.append(rear)
+            self.heads.add(rear.getHead())
+        self.mushrooms.place(cent.rect.center)
+        if not self.centipedes:
+            self.scheduleSpawn("centipede")
+            self.wave += 1
+
+    def laserHitMushroom(self, l, cell, kind):
+        '''This handler kills the laser, damages the mushroom and scores 1 pt
+        if it is destroyed.'''
+        l.release()
+        if self.mushrooms.damage(cell):
+            self.score += self.points["mushroom"]
+
+    def laserHitEnemy(self, l, enemy, kind):
+        '''This handler kills the laser and a spider, flea or scorpion and
+        scores 600, 200 or 1000 pts.'''
+        self.events.append("hit")
+        l.release()
+        enemy.release()
+        self.scheduleSpawn(kind)
+        self.score += self.points[kind]
+
+    def collideMushrooms(self):
+        '''This method resolves centipedes, spiders and scorpions running into
+        mushrooms.'''
+        self.collider.resolve("mushrooms")
+
+    def centipedeHitMushroom(self, head, cell, kind):
+        '''This handler makes the head's centipede go down, poisoning it if
+        the mushroom is poisonous.'''
+        head.chain.goDown()
+        if self.mushrooms.isPoisonous(cell):
+            head.chain.setIsPoisoned(True)
+
+    def spiderHitMushroom(self, spy, cell, kind):
+        '''This handler gives a 1/3 chance of the spider killing the mushroom.'''
+        if self.rng.randrange(3) == 0:
+            self.mushrooms.remove(cell)
+
+    def scorpionHitMushroom(self, scor, cell, kind):
+        '''This handler turns the mushroom poisonous.'''
+        self.mushrooms.setPoisonous(cell, True)
+
+    def collidePlayer(self):
+        '''This method checks whether a centipede, spider or flea has caught a
+        player. If so, a life is lost and the board freezes before it is reset.
+        It returns True if a life was lost.'''
+        return self.collider.resolve("player")
+
+    def enemyCaughtPlayer(self, player, enemy, kind):
+        '''This handler takes a life and freezes the board until the "resume"
+        event. It returns True, so no other enemy is tested, unless the player
+        is invulnerable.'''
+        if player.invulnerable:
+            return False
+        self.lives -= 1
+        self.livesLost[kind] += 1
+        self.events.append("buzzer")
+        self.frozen = True
+        self.scheduler.schedule(self.tick + LIFE_LOST_PAUSE, "resume")
+        return True
+
+    def resume(self, argument):
+        '''This handler ends the pause after a lost life and resets the board.'''
+        self.frozen = False
+        self.resetBoard()
+
+    def resetBoard(self):
+        '''This method is called when the pause after a lost life ends. It heals
+        the mushrooms (5 pts for each damaged one), kills every enemy, spawns
+        a new centipede and schedules the other enemies and the end of the
+        players' invulnerability. If no lives are left, the game is over.'''
+        # Heal and award 5 points for any damaged mushrooms
+        # Also revert poisoned mushrooms to normal
+        self.score += self.points["heal"]*self.mushrooms.heal()
+
+        # Kill all enemy sprites
+        for cent in self.centipedes:
+            cent.release()
+        self.chains = []
+        self.scheduler.cancel("spawn", SPAWNED.index("centipede"))
+
+        for spy in self.spiders:
+            spy.release()
+        self.scheduleSpawn("spider")
+
+        for flea in self.fleas:
+            flea.release()
+        self.scheduleSpawn("flea")
+
+        for scor in self.scorpions:
+            scor.release()
+        self.scheduleSpawn("scorpion")
+
+        # Spawn new centipede
+        self.spawnCentipede()
+
+        if self.lives <= 0:
+            self.gameOver = True
+        elif self.invulnerableTicks > 0:
+            for index, player in enumerate(self.players):
+                player.invulnerable = True
+                self.scheduler.schedule(self.tick + self.invulnerableTicks, "vulnerable", index)
+
+    def updateSprites(self):
+        '''This method moves every sprite by one tick.'''
+        if self.engine is not None:
+            self.players.update()
+            self.engine.step()
+            self.engine.writeBack()
+        else:
+            for group in self.updateGroups:
+                group.update()
+        for chain in self.chains:
+            chain.update()
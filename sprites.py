@@ -2,23 +2,60 @@
    Date: May 28, 2019
    Desc: Sprites used in a remake of Atari Centipede.
 '''
-import pygame, random
+import pygame, random, assets, text
 
-class Counter(pygame.sprite.Sprite):
+# Drawing layers (the background is layer 0)
+MUSHROOM_LAYER, ENEMY_LAYER, PLAYER_LAYER, HUD_LAYER = 1, 2, 3, 4
+
+# The default board: 24 cols, 32 rows (each col/row 20 px wide)
+CELL_SIZE = 20
+BOARD_SIZE = (480, 640)
+
+def getBounds(bounds):
+    '''This function returns the given board rect, or the default board's
+    rect if it is None.'''
+    if bounds is None:
+        return pygame.Rect((0, 0), BOARD_SIZE)
+    return bounds
+
+class PooledSprite(pygame.sprite.DirtySprite):
+    '''This class is the base of the sprites a pool.SpritePool can hand out
+    again after they die. Its subclasses set their state in reset(), which
+    takes the same parameters as their initializer.'''
+    # The pool the sprite came from (None if it was constructed directly),
+    # whether it is waiting in the pool, and how many times it was handed out
+    pool = None
+    pooled = False
+    generation = 0
+    
+    def release(self):
+        '''This method kills the sprite and returns it to its pool, if it
+        came from one.'''
+        if self.pool is None:
+            self.kill()
+        else:
+            self.pool.release(self)
+
+class Counter(pygame.sprite.DirtySprite):
     '''This class defines a label sprite to display a count, i.e. the player's
     current score or number of lives left.'''
+    _layer = HUD_LAYER
     def __init__(self, label, initialCount, xPos):
         '''This initializer takes a label (string), initial count (int) and
-        x-coordinate (int) as parameters.  It loads the custom font "Eater" and
-        defines the object's instance variables.'''
+        x-coordinate (int) as parameters.  It uses the shared glyph atlas for
+        the custom font "Eater" and defines the object's instance variables.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
  
         # Font and instance variables
-        self.font = pygame.font.Font("Eater.ttf", 25)
+        self.atlas = text.getAtlas(25)
         self.label = label
         self.count = initialCount
         self.xPos = xPos
+        
+        # The count currently shown by the image
+        self.shownCount = None
+        self.update()
          
     def setCount(self, points):
         '''This mutator method takes an integer and adds it to the count.'''
@@ -30,49 +67,67 @@ class Counter(pygame.sprite.Sprite):
     
     def update(self):
         '''This method will be called automatically to display the current
-        count at the specified position on the game window.'''
-        message = self.label+": "+str(self.count)
-        self.image = self.font.render(message, True, (255, 255, 255))
+        count at the specified position on the game window. The image is only
+        composed again when the count has changed.'''
+        if self.count == self.shownCount:
+            return
+        self.shownCount = self.count
+        self.image = self.atlas.render(self.count, self.label+": ")
         self.rect = self.image.get_rect()
         self.rect.left, self.rect.centery = self.xPos, 20
+        self.dirty = 1
 
-class Text(pygame.sprite.Sprite):
+class Text(pygame.sprite.DirtySprite):
     '''This class defines a label sprite to display a static message, e.g. on
     the menu screen. It enables text to be shown on top of other sprites.'''
+    _layer = HUD_LAYER
     def __init__(self, msg, position, size, colour=(255,255,255)):
         '''This initializer takes a message (string), position (tuple), size
         (int) and colour (tuple) as parameters. If no colour is given, it
-        defaults to white. It loads the custom font "Eater" at the given size
+        defaults to white. It uses the custom font "Eater" at the given size
         and centers the message at the given position.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
- 
-        # Font and instance variables
-        self.font = pygame.font.Font("Eater.ttf", size)
+        pygame.sprite.DirtySprite.__init__(self)
         
-        # Set the image and rect attributes
-        self.image = self.font.render(msg, True, colour)
+        # Set the image and rect attributes (from the shared render cache)
+        self.image = text.render(msg, size, colour)
         self.rect = self.image.get_rect()
         self.rect.center = position
 
-class Player(pygame.sprite.Sprite):
+class Player(pygame.sprite.DirtySprite):
     '''This class defines the sprite for the player.'''
-    def __init__(self):
-        '''This initializer has no parameters. It
-        initializes the image and rect attributes of the player.'''
+    _layer = PLAYER_LAYER
+    def __init__(self, bounds=None, cellSize=CELL_SIZE, xPos=None):
+        '''This initializer takes the board's rect, the size of a cell in
+        pixels (int) and the x-coordinate to start at (int, the middle of the
+        board by default) as optional parameters. It initializes the image and
+        rect attributes of the player.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
+        # It can move every frame, so it is always redrawn
+        self.dirty = 2
+        bounds = getBounds(bounds)
          
         # Set the image and rect attributes
-        self.image = pygame.image.load("images/head.png")
-        self.image = pygame.transform.scale(self.image, (20, 20))
+        self.image = assets.getImage("images/head.png", (cellSize, cellSize))
         self.rect = self.image.get_rect()
         
         self.rect = self.image.get_rect()
-        self.rect.center = (240, 625)
+        if xPos is None:
+            xPos = bounds.width//2
+        self.rect.center = (xPos, bounds.height - cellSize*3//4)
         
-        # Instance variables
+        # The player area: the centers of the first to last col, and of the
+        # last 5 rows (from the middle of the 5th last row)
+        half = cellSize//2
+        self.left, self.right = half, bounds.width - half
+        self.top, self.bottom = bounds.height - cellSize*9//2, bounds.height - half
+        
+        # Instance variables; whether it can shoot and whether enemies can
+        # catch it are switched by the simulation's scheduled events
         self.dx, self.dy = 0, 0
+        self.canShoot = True
+        self.invulnerable = False
     
     def setDirection(self, direction):
         '''This mutator accepts a tuple representing a direction and uses it to
@@ -86,235 +141,361 @@ class Player(pygame.sprite.Sprite):
     
     def update(self):
         '''This method ensures that the player does not leave the screen.'''
-        if not( ((self.rect.centerx < 10) and (self.dx < 0)) or ((self.rect.centerx > 470) and (self.dx > 0)) ):
+        if not( ((self.rect.centerx < self.left) and (self.dx < 0)) or ((self.rect.centerx > self.right) and (self.dx > 0)) ):
             self.rect.centerx += self.dx
-        if not( ((self.rect.centery < 550) and (self.dy < 0)) or ((self.rect.centery > 630) and (self.dy > 0)) ):
+        if not( ((self.rect.centery < self.top) and (self.dy < 0)) or ((self.rect.centery > self.bottom) and (self.dy > 0)) ):
             self.rect.centery += self.dy
 
-class Laser(pygame.sprite.Sprite):
+class Laser(PooledSprite):
     '''This class represents a laser (similar to a bullet) shot by the player.
     It moves straight up the screen until it either hits something or leaves
     the screen.'''
+    _layer = PLAYER_LAYER
     def __init__(self, xPos, yPos):
         '''This initalizer takes an x-coordinate (int) and a y-coordinate (int) as parameters. It
         initializes the image and rect attributes of the laser.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
+        # It moves every frame, so it is always redrawn
+        self.dirty = 2
          
         # Set the image and rect attributes
-        self.image = pygame.Surface((2, 15))
-        self.image.convert()
-        self.image.fill((255, 0, 0))
-        
+        self.image = assets.getFilled((2, 15), (255, 0, 0))
         self.rect = self.image.get_rect()
+        self.reset(xPos, yPos)
+    
+    def reset(self, xPos, yPos):
+        '''This method takes an x-coordinate (int) and a y-coordinate (int) and
+        puts the laser there, as if it had just been shot.'''
         self.rect.center = (xPos, yPos)
+        
+        # How far it moved in the last update (it has not moved yet)
+        self.travel = 0
     
     def update(self):
         '''This method is called automatically to move the laser straight up the screen.'''
         self.rect.centery -= 20
+        self.travel = 20
         if self.rect.bottom <= 0:
-            self.kill()
+            self.release()
 
-class Mushroom(pygame.sprite.Sprite):
-    '''This class represents a static mushroom.'''
-    def __init__(self, position):
-        '''This initializer accepts a tuple representing a position. It
+class Mushroom(PooledSprite):
+    '''This class represents a static mushroom. It is a view over one cell of
+    a MushroomField, which stores the mushroom's health and poison state.'''
+    _layer = MUSHROOM_LAYER
+    def __init__(self, field, cell):
+        '''This initializer accepts a MushroomField and a (col, row) tuple. It
         initializes the image and rect attributes of the mushroom.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
-         
+        pygame.sprite.DirtySprite.__init__(self)
+        self.reset(field, cell)
+    
+    def reset(self, field, cell):
+        '''This method accepts a MushroomField and a (col, row) tuple and makes
+        the mushroom a view over that cell.'''
         # Set the image and rect attributes
-        self.cremini = pygame.image.load("images/cremini.png")
-        self.cremini = pygame.transform.scale(self.cremini, (20, 20))
-        self.agaric = pygame.image.load("images/fly-agaric.png")
-        self.agaric = pygame.transform.scale(self.agaric, (20, 20))
+        size = (field.cellSize, field.cellSize)
+        self.cremini = assets.getImage("images/cremini.png", size)
+        self.agaric = assets.getImage("images/fly-agaric.png", size)
         
         self.image = self.cremini
         self.rect = self.image.get_rect()
-        
-        self.rect = self.image.get_rect()
-        self.rect.center = position
+        self.rect.center = field.getCenter(cell)
         
         # Instance variables
-        self.health = 4
-        self.isPoisonous = False
+        self.field = field
+        self.cell = cell
+        self.refresh()
+    
+    def refresh(self):
+        '''This method changes the mushroom's image to match whether its cell
+        is poisonous.'''
+        if self.field.isPoisonous(self.cell):
+            self.image = self.agaric
+        else:
+            self.image = self.cremini
+        self.dirty = 1
     
     def setHealth(self, health):
         '''This mutator accepts an int and uses it to change the value of health.'''
-        self.health = health
+        self.field.setHealth(self.cell, health)
     
     def getHealth(self):
         '''This accessor returns the value of health.'''
-        return self.health
+        return self.field.getHealth(self.cell)
     
     def setIsPoisonous(self, poisonous):
         '''This mutator accepts a boolean and changes the value of isPoisonous.
         It also changes the mushroom's image to match the value of isPoisonous.'''
-        self.isPoisonous = poisonous
-        if poisonous:
-            self.image = self.agaric
-        else:
-            self.image = self.cremini
+        self.field.setPoisonous(self.cell, poisonous)
     
     def getIsPoisonous(self):
         '''This accessor returns the value of isPoisonous.'''
-        return self.isPoisonous
+        return self.field.isPoisonous(self.cell)
     
     def update(self):
         '''This method automatically kills the mushroom if it has run out of health.'''
         # If all health is lost, kill the mushroom
-        if self.health <= 0:
+        if self.field.getHealth(self.cell) <= 0:
             self.kill()
 
-class Centipede(pygame.sprite.Sprite):
+class Centipede(PooledSprite):
     '''This class represents one segment of the centipede, the player's main
-    enemy. It starts at the top of the screen and moves down gradually towards
-    the player, alternating between turning left and turning right.'''
-    def __init__(self, yPos, speed):
-        '''This initializer takes a y-coordinate (int) and a speed (int) as
-        parameters. It initializes the image and rect attributes of the
-        centipede and defines its many instance variables.'''
+    enemy. A segment does not move by itself: the CentipedeChain it belongs
+    to places it every tick.'''
+    _layer = ENEMY_LAYER
+    def __init__(self, cellSize=CELL_SIZE):
+        '''This initializer takes the size of a cell in pixels (int). It
+        initializes the image and rect attributes of the segment.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
-        
+        pygame.sprite.DirtySprite.__init__(self)
+        # It moves every frame, so it is always redrawn
+        self.dirty = 2
+        self.reset(cellSize)
+    
+    def reset(self, cellSize=CELL_SIZE):
+        '''This method takes the size of a cell in pixels (int) and makes the
+        segment a new one, belonging to no chain.'''
         # Set the image and rect attributes
-        self.down = pygame.image.load("images/UD-centipede.png")
-        self.down = pygame.transform.scale(self.down, (20, 20))        
-        self.LR = pygame.image.load("images/LR-centipede.png")
-        self.LR = pygame.transform.scale(self.LR, (20, 20))
+        self.down = assets.getImage("images/UD-centipede.png", (cellSize, cellSize))
+        self.LR = assets.getImage("images/LR-centipede.png", (cellSize, cellSize))
         
         self.image = self.down     
-        self.rect = self.image.get_rect()        
-        
         self.rect = self.image.get_rect()
-        self.rect.center = (200, yPos)        
-        
-        # Instance variables
-        self.dx = 0
-        self.dy = speed
-        self.speed = speed
-        self.lastDx = speed
         
-        self.isPoisoned = False
-        self.reachedBottom = False
+        # The chain the segment belongs to
+        self.chain = None
+    
+    def place(self, x, y, dy):
+        '''This method centers the segment on the given coordinates (ints),
+        facing down/up if it is moving vertically (dy, int) or left/right if
+        not.'''
+        self.rect.center = (x, y)
+        if dy == 0:
+            self.image = self.LR
+        else:
+            self.image = self.down
+
+class CentipedeChain(object):
+    '''This class moves one centipede: a head that decides where to go, and
+    the segments behind it, which follow the head's path. Each tick the head's
+    state is pushed onto a ring buffer, and segment i is placed where the head
+    was i*spacing ticks ago, spacing being the ticks it takes to cross a cell.
+    Only the head turns at rows, edges and mushrooms, so the segments always
+    stay a cell apart.'''
+    def __init__(self, segments, path, bounds=None, cellSize=CELL_SIZE):
+        '''This initializer takes the Centipede sprites (list, head first), the
+        head's path as a list of (x, y, dx, dy, speed, lastDx, isPoisoned,
+        reachedBottom) tuples, newest first, the board's rect and the size of a
+        cell in pixels (int). The head carries on from the newest entry, and
+        the path must have one entry per tick back to the last segment. It
+        raises ValueError if the speed is not a factor of the cell size.'''
+        bounds = getBounds(bounds)
+        (self.x, self.y, self.dx, self.dy, self.speed, self.lastDx,
+         self.isPoisoned, self.reachedBottom) = path[0]
+        speed = abs(self.speed)
+        if speed == 0 or cellSize % speed:
+            raise ValueError("the speed must be a factor of the cell size of %d" % cellSize)
         self.hitMushroom = False
+        self.cellSize = cellSize
+        self.spacing = cellSize//speed
+        
+        # The board: the centers of the rows, of the first and last col and of
+        # the 5th last row (the top of the player area)
+        half = cellSize//2
+        self.bounds = bounds
+        self.rows = range(half, bounds.height, cellSize)
+        self.left, self.right = half, bounds.width - half
+        self.bottom = bounds.height - half
+        self.playerTop = bounds.height - cellSize*9//2
+        
+        self.segments = list(segments)
+        for segment in self.segments:
+            segment.chain = self
+        
+        # The ring buffer of the head's path; newest is the index of the
+        # entry for the current tick
+        self.capacity = (len(self.segments)-1)*self.spacing + 1
+        if len(path) < self.capacity:
+            raise ValueError("the path is too short for %d segments" % len(self.segments))
+        self.path = list(reversed(path[:self.capacity]))
+        self.newest = self.capacity - 1
+        self.placeSegments()
+    
+    @classmethod
+    def spawn(cls, length, speed, bounds=None, cellSize=CELL_SIZE, xPos=None, make=Centipede):
+        '''This class method returns a new chain of the given number of
+        segments (int) moving down at the given speed (int) from the top of
+        the board, with its head at the given x-coordinate (int, 10 cells from
+        the left by default, or the center of the last column on a narrower
+        board) and the rest of its body above the board. The segments are made
+        by calling make with the cell size (e.g. the acquire() method of a
+        pool).'''
+        if xPos is None:
+            xPos = min(10*cellSize, getBounds(bounds).width - cellSize//2)
+        spacing = cellSize//max(speed, 1)
+        path = [(xPos, cellSize//2 - i*speed, 0, speed, speed, speed, False, False)
+                for i in range((length-1)*spacing + 1)]
+        return cls([make(cellSize) for i in range(length)], path, bounds, cellSize)
+    
+    def getHead(self):
+        '''This accessor returns the head segment, or None if none are left.'''
+        if self.segments:
+            return self.segments[0]
+        return None
+    
+    def getPath(self):
+        '''This accessor returns the part of the head's path the segments
+        still use, newest first, in the form the initializer takes.'''
+        count = (len(self.segments)-1)*self.spacing + 1
+        return [self.path[(self.newest - i) % self.capacity] for i in range(count)]
     
     def goDown(self):
         '''This method sets hitMushroom to True, which tells the update method
-        to make the Centipede go downwards (or upwards).'''
+        to make the head go downwards (or upwards).'''
         self.hitMushroom = True
     
     def setIsPoisoned(self, poisoned):
         '''This mutator accepts a boolean and changes the value of isPoisoned.'''
         self.isPoisoned = poisoned
     
+    def split(self, segment):
+        '''This method releases the given segment and cuts the chain there. The
+        chain keeps the segments in front of it, and the segments behind it
+        are returned as a new chain (or None if there are none) whose head
+        carries on from the state the old head had at that point of its path.'''
+        index = self.segments.index(segment)
+        segment.release()
+        rear = self.segments[index+1:]
+        path = self.getPath()
+        self.segments = self.segments[:index]
+        if not rear:
+            return None
+        return CentipedeChain(rear, path[(index+1)*self.spacing:], self.bounds, self.cellSize)
+    
+    def placeSegments(self):
+        '''This method places every segment on the head's path.'''
+        for i, segment in enumerate(self.segments):
+            x, y, dx, dy = self.path[(self.newest - i*self.spacing) % self.capacity][:4]
+            segment.place(x, y, dy)
+    
     def update(self):
-        '''This method automatically changes the direction of the centipede
-        according to its position and its instance variables. It then moves the
-        centipede in that direction.'''
-        rows = tuple(range(10, 640, 20))
-        
-        if self.rect.centery >= 630:
+        '''This method automatically changes the direction of the head
+        according to its position and its instance variables, moves it in that
+        direction and moves the other segments along its path.'''
+        if self.y >= self.bottom:
             # If the centipede has reached the bottom of the screen, set reachedBottom to True and turn the speed negative to make it go up.
             # Also remove poisoning if necessary.
             self.reachedBottom = True
             self.isPoisoned = False
             self.speed = -abs(self.speed)
         
-        if self.reachedBottom and self.rect.centery <= 550:
+        if self.reachedBottom and self.y <= self.playerTop:
             # If the centipede had already reached the bottom and is now about to leave the player area, make it go back down again.
             self.isPoisoned = False
             self.speed = abs(self.speed)
 
-        if (self.rect.centery in rows and self.dy != 0):
+        if (self.y in self.rows and self.dy != 0):
             # If the centipede is currently going down/up and has reached the next row, go left/right
             self.dy = 0
             self.dx = -self.lastDx
             self.lastDx = self.dx
-            self.image = self.LR
         
-        elif (self.rect.centerx <= 10 or self.rect.centerx >= 470) and self.dx != 0:
+        elif (self.x <= self.left or self.x >= self.right) and self.dx != 0:
             # If the centipede is currently going left/right and has hit the edge of the screen, go down/up
             self.dx = 0
             self.dy = self.speed
-            self.image = self.down
             
-        elif self.hitMushroom:
-            # If the centipede has hit a mushroom, go down/up
-            self.dx = 0
-            self.dy = self.speed
-            self.image = self.down            
-        
-        elif self.isPoisoned:
-            # If the centipede is poisoned, go down/up
+        elif self.hitMushroom or self.isPoisoned:
+            # If the centipede has hit a mushroom or is poisoned, go down/up
             # (the poisoned centipede will have a wriggling effect)
             self.dx = 0
-            self.dy = self.speed            
-            self.image = self.down
+            self.dy = self.speed
             
         self.hitMushroom = False
-        self.rect.centerx += self.dx
-        self.rect.centery += self.dy
+        self.x += self.dx
+        self.y += self.dy
         
-        # In case the centipede glitches for whatever reason and does leave the screen,
-        # kill it so that it will not interfere with the game
-        if self.rect.right < 0 or self.rect.left > 480 or self.rect.top > 640:
-            self.kill()            
+        # Push the head's new state, overwriting the entry no segment uses
+        self.newest = (self.newest + 1) % self.capacity
+        self.path[self.newest] = (self.x, self.y, self.dx, self.dy, self.speed, self.lastDx,
+                                  self.isPoisoned, self.reachedBottom)
+        self.placeSegments()
 
-class Spider(pygame.sprite.Sprite):
+class Spider(PooledSprite):
     '''This class represents a spider, the second enemy the player encounters.
         It zig-zags up and down across the player area.'''
-    def __init__(self, screen, speed):
-        '''This initializer takes a screen surface and a speed (int) as
-        parameters. It chooses a random side of the screen to place the spider.'''
+    _layer = ENEMY_LAYER
+    def __init__(self, bounds, speed, rng=random, cellSize=CELL_SIZE):
+        '''This initializer takes the screen's rect, a speed (int), an
+        optional random number generator and the size of a cell in pixels (int)
+        as parameters. It chooses a random side of the screen to place the
+        spider.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
-         
+        pygame.sprite.DirtySprite.__init__(self)
+        # It moves every frame, so it is always redrawn
+        self.dirty = 2
+        self.reset(bounds, speed, rng, cellSize)
+    
+    def reset(self, bounds, speed, rng=random, cellSize=CELL_SIZE):
+        '''This method takes the same parameters as the initializer and
+        places the spider again, as if it had just been spawned.'''
         # Set the image attributes
-        self.image = pygame.image.load("images/spider.png")
-        self.image = pygame.transform.scale(self.image, (20, 20))
+        self.image = assets.getImage("images/spider.png", (cellSize, cellSize))
         self.rect = self.image.get_rect()
         
         # Set the position and direction
         # Randomly choose either left side or right side of screen
-        if random.randrange(2) == 0:
+        if rng.randrange(2) == 0:
             self.rect.left = 0
             self.dx = 2
         else:
-            self.rect.right = screen.get_width()
+            self.rect.right = bounds.right
             self.dx = -2
-        self.rect.top = 480
+        # The top of the last 8 rows
+        self.top = bounds.height - 8*cellSize
+        self.rect.top = self.top
         self.dy = speed
         
         # Instance variable to keep track of the screen
-        self.window = screen 
+        self.bounds = bounds
     
     def update(self):
         '''This method is called automatically to move the spider in a zig-zag
         pattern across the player area.'''
         # if it reaches top of last 8 rows or bottom of screen, reverse dy
-        if self.rect.top < 480 or self.rect.bottom > self.window.get_height():
+        if self.rect.top < self.top or self.rect.bottom > self.bounds.bottom:
             self.dy = -self.dy
         
         self.rect.centerx += self.dx
         self.rect.centery += self.dy
 
-class Flea(pygame.sprite.Sprite):
+class Flea(PooledSprite):
     '''This class represents a flea, another enemy the player encounters. It
     simply moves vertically down the screen before disappearing.'''
-    def __init__(self, speed):
-        '''This initializer takes a speed (int) as a parameter. It initializes
-        the image and rect attributes of the flea.'''
+    _layer = ENEMY_LAYER
+    def __init__(self, speed, rng=random, bounds=None, cellSize=CELL_SIZE):
+        '''This initializer takes a speed (int), and optionally a random
+        number generator, the board's rect and the size of a cell in pixels
+        (int) as parameters. It initializes the image and rect attributes of the
+        flea.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
+        # It moves every frame, so it is always redrawn
+        self.dirty = 2
+        self.reset(speed, rng, bounds, cellSize)
+    
+    def reset(self, speed, rng=random, bounds=None, cellSize=CELL_SIZE):
+        '''This method takes the same parameters as the initializer and
+        places the flea again, as if it had just been spawned.'''
+        bounds = getBounds(bounds)
          
         # Set the image attributes
-        self.image = pygame.image.load("images/flea.png")
-        self.image = pygame.transform.scale(self.image, (20, 20)) 
+        self.image = assets.getImage("images/flea.png", (cellSize, cellSize))
         self.rect = self.image.get_rect()
         
         # Set the position and direction
-        self.rect.centerx = random.randrange(10, 480, 20) # random col
+        self.rect.centerx = rng.randrange(cellSize//2, bounds.width, cellSize) # random col
         self.rect.top = 0
         self.dy = speed
     
@@ -323,31 +504,47 @@ class Flea(pygame.sprite.Sprite):
         the screen.'''
         self.rect.centery += self.dy
 
-class Scorpion(pygame.sprite.Sprite):
+class Scorpion(PooledSprite):
     '''This class represents a scorpion, the third enemy the player encounters.
     It simply moves horizontally across the screen before disappearing.'''
-    def __init__(self, screen):
-        '''This initializer takes a screen surface as a parameter. It randomly
-        chooses a row and one side of the screen to place the scorpion.'''
+    _layer = ENEMY_LAYER
+    def __init__(self, bounds, rng=random, cellSize=CELL_SIZE):
+        '''This initializer takes the screen's rect, an optional random number
+        generator and the size of a cell in pixels (int) as parameters. It
+        randomly chooses a row and one side of the screen to place the
+        scorpion.'''
         # Call the parent __init__() method
-        pygame.sprite.Sprite.__init__(self)    
+        pygame.sprite.DirtySprite.__init__(self)    
+        # It moves every frame, so it is always redrawn
+        self.dirty = 2
+        self.reset(bounds, rng, cellSize)
+    
+    def reset(self, bounds, rng=random, cellSize=CELL_SIZE):
+        '''This method takes the same parameters as the initializer and
+        places the scorpion again, as if it had just been spawned.'''
+        self.size = (cellSize*5//4, cellSize)
 
         # Set the position and direction, and set the image and rect attributes accordingly
         # Randomly choose either left side or right side of screen
-        if random.randrange(2) == 0:
-            self.image = pygame.image.load("images/scorpion_right.png")
-            self.image = pygame.transform.scale(self.image, (25, 20))  
+        if rng.randrange(2) == 0:
+            self.dx = 3
+            self.refresh()
             self.rect = self.image.get_rect() 
             self.rect.left = 0
-            self.dx = 3
         else:
-            self.image = pygame.image.load("images/scorpion_left.png")
-            self.image = pygame.transform.scale(self.image, (25, 20))  
-            self.rect = self.image.get_rect()
-            self.rect.right = screen.get_width()
             self.dx = -3
+            self.refresh()
+            self.rect = self.image.get_rect()
+            self.rect.right = bounds.right
         # Choose a random row excl. player area
-        self.rect.centery = random.randrange(10, 540, 20)        
+        self.rect.centery = rng.randrange(cellSize//2, bounds.height - 5*cellSize, cellSize)
+    
+    def refresh(self):
+        '''This method changes the scorpion's image to face the way it moves.'''
+        if self.dx > 0:
+            self.image = assets.getImage("images/scorpion_right.png", self.size)
+        else:
+            self.image = assets.getImage("images/scorpion_left.png", self.size)
     
     def update(self):
         '''This method is called automatically to move the scorpion horizantally
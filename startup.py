@@ -0,0 +1,69 @@
+'''Desc: The startup pipeline of the remake of Atari Centipede. The menu only
+   needs the display, the font, the background and the menu's sprite images
+   to draw its first frame; everything else (the mixer, the sound effects, the
+   music and the images of the other sprites) is decoded by a Preloader on a
+   background thread while the menu is already running.
+
+   Times are measured from when this module is first imported, which main.py
+   does before importing pygame.
+'''
+import time, threading
+
+# When the program started
+START = time.perf_counter()
+
+# name -> seconds since START
+marks = {}
+
+def mark(name):
+    '''This function records the time (since START) of the first occurrence
+    of a named startup event, e.g. "first frame".'''
+    if name not in marks:
+        marks[name] = time.perf_counter() - START
+
+class Preloader(object):
+    '''This class runs a list of loading jobs, in order, on a daemon thread.'''
+    def __init__(self):
+        '''This initializer has no parameters. Nothing runs until start() is
+        called.'''
+        self.thread = None
+        self.finished = threading.Event()
+        self.error = None
+        # job name -> seconds it took
+        self.timings = {}
+
+    def start(self, jobs):
+        '''This method takes a list of (name, function) jobs and starts running
+        them on the background thread.'''
+        self.thread = threading.Thread(target=self.run, args=(list(jobs),),
+                                       name="preloader", daemon=True)
+        self.thread.start()
+
+    def run(self, jobs):
+        '''This method runs every job and records how long each one took. If a
+        job raises an exception, the rest are skipped and wait() raises it.'''
+        try:
+            for name, job in jobs:
+                start = time.perf_counter()
+                job()
+                self.timings[name] = time.perf_counter() - start
+        except Exception as error:
+            self.error = error
+        finally:
+            mark("fully loaded")
+            self.finished.set()
+
+    def isLoaded(self):
+        '''This method returns True once every job has run.'''
+        return self.finished.is_set()
+
+    def wait(self):
+        '''This method blocks until every job has run, and raises the exception
+        of a job that failed.'''
+        if self.thread is not None:
+            self.finished.wait()
+        if self.error is not None:
+            raise self.error
+
+# The preloader used by main.py
+preloader = Preloader()
@@ -0,0 +1,211 @@
+'''Desc: Tests for the spatial hash and the collision dispatch table.
+
+   Usage:
+       python -m unittest test_collision
+'''
+import os, random, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, field, collision
+
+CELL = 8
+
+class Box(pygame.sprite.Sprite):
+    '''This class is a sprite that is only a rect.'''
+    def __init__(self, rect, *groups):
+        '''This initializer takes a rect and the groups to join.'''
+        pygame.sprite.Sprite.__init__(self, *groups)
+        self.rect = pygame.Rect(rect)
+
+def randomRect(rng, width, height):
+    '''This function returns a rect of one to three cells a side, which may
+    stick out of a board of the given size in pixels (ints) or lie off it.'''
+    w = rng.randint(1, 3*CELL)
+    h = rng.randint(1, 3*CELL)
+    return pygame.Rect(rng.randint(-2*CELL, width + CELL), rng.randint(-2*CELL, height + CELL), w, h)
+
+def bruteForce(rect, group):
+    '''This function returns the sprites of a group that overlap the rect,
+    found by pygame itself.'''
+    return pygame.sprite.spritecollide(Box(rect), group, False)
+
+class SpatialHashTest(unittest.TestCase):
+    '''This class checks the sprites a SpatialHash returns against pygame's
+    own collision tests.'''
+    def testQueryMatchesBruteForce(self):
+        '''This method checks that, once their rects are tested, the sprites
+        a query returns are the ones pygame finds, each once and in the order
+        they were inserted, and only of the kinds asked for.'''
+        rng = random.Random(4)
+        groups = {"a": pygame.sprite.Group(), "b": pygame.sprite.Group()}
+        order = []
+        spatial = collision.SpatialHash(CELL)
+        for i in range(80):
+            kind = "a" if i % 3 else "b"
+            sprite = Box(randomRect(rng, 24*CELL, 32*CELL), groups[kind])
+            spatial.insert(kind, sprite)
+            order.append(sprite)
+
+        for i in range(300):
+            rect = randomRect(rng, 24*CELL, 32*CELL)
+            found = spatial.query(rect, ("a", "b"))
+            sprites = [sprite for kind, sprite in found]
+            self.assertEqual(sprites, sorted(set(sprites), key=order.index))
+            for kind, sprite in found:
+                self.assertIn(sprite, groups[kind])
+            hits = [sprite for sprite in sprites if rect.colliderect(sprite.rect)]
+            expected = bruteForce(rect, groups["a"]) + bruteForce(rect, groups["b"])
+            self.assertEqual(set(hits), set(expected))
+
+            found = spatial.query(rect, ("b",))
+            self.assertEqual(set(sprite for kind, sprite in found if rect.colliderect(sprite.rect)),
+                             set(bruteForce(rect, groups["b"])))
+
+    def testMultiCellSprite(self):
+        '''This method checks that a sprite is put in every cell its rect
+        overlaps, and is returned once by a query touching several of them.'''
+        spatial = collision.SpatialHash(CELL)
+        sprite = Box((CELL + 2, CELL, 2*CELL, 2*CELL - 1))
+        spatial.insert("a", sprite)
+        self.assertEqual(sorted(spatial.buckets),
+                         [row*collision.ROW_KEY + col for row in (1, 2) for col in (1, 2, 3)])
+        self.assertEqual(spatial.query(pygame.Rect(0, 0, 5*CELL, 5*CELL), ("a",)), [("a", sprite)])
+        self.assertEqual(spatial.query(pygame.Rect(3*CELL, 2*CELL, 1, 1), ("a",)), [("a", sprite)])
+        self.assertEqual(spatial.query(pygame.Rect(0, 3*CELL, CELL, CELL), ("a",)), [])
+
+    def testCellsOffTheBoard(self):
+        '''This method checks that a cell left of the board is not mistaken
+        for the last cell of the row above, as it would be if rows were keyed
+        by the number of columns.'''
+        spatial = collision.SpatialHash(CELL)
+        sprite = Box((-CELL, CELL, CELL, CELL))
+        spatial.insert("a", sprite)
+        self.assertEqual(list(spatial.buckets), [collision.ROW_KEY - 1])
+        self.assertEqual(spatial.query(pygame.Rect(23*CELL, 0, CELL, CELL), ("a",)), [])
+        self.assertEqual(spatial.query(pygame.Rect(-CELL, CELL, 1, 1), ("a",)), [("a", sprite)])
+
+        spatial.clear()
+        self.assertEqual((spatial.buckets, spatial.count), ({}, 0))
+
+class ColliderTest(unittest.TestCase):
+    '''This class checks that a Collider calls the handlers pygame's own
+    collision tests say it should, in the order of its rules.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs, and
+        lays out players, enemies and mushrooms at random on a board.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        rng = random.Random(9)
+        self.mushrooms = field.MushroomField(24, 32, CELL)
+        self.mushrooms.scatter(120, rng)
+        self.players = pygame.sprite.Group()
+        self.enemies = pygame.sprite.Group()
+        for i in range(30):
+            Box(randomRect(rng, 24*CELL, 32*CELL), self.players)
+            Box(randomRect(rng, 24*CELL, 32*CELL), self.enemies)
+        self.calls = []
+        self.collider = collision.Collider(self.mushrooms)
+        self.collider.addGroup("player", self.players)
+        self.collider.addGroup("enemy", self.enemies)
+
+    def record(self, sprite, target, other):
+        '''This handler keeps every hit it is called with.'''
+        self.calls.append((sprite, target, other))
+
+    def testResolveMatchesBruteForce(self):
+        '''This method checks that a stage calls its rules in the order they
+        were added, each for every sprite in turn, with the targets pygame
+        finds.'''
+        self.collider.addRule("touch", "player", "enemy", self.record)
+        self.collider.addRule("touch", "player", collision.MUSHROOM, self.record)
+        self.collider.addRule("other", "enemy", "player", self.record)
+        self.collider.reset()
+        self.assertFalse(self.collider.resolve("touch"))
+
+        expected = []
+        for player in self.players:
+            expected.extend((player, enemy, "enemy") for enemy in bruteForce(player.rect, self.enemies))
+        byEnemy = len(expected)
+        self.assertGreater(byEnemy, 0)
+        self.assertEqual(self.calls[:byEnemy], expected)
+
+        for player in self.players:
+            # The field yields the cells row by row
+            cells = sorted((mush.cell for mush in bruteForce(player.rect, self.mushrooms.group)),
+                           key=lambda cell: (cell[1], cell[0]))
+            expected.extend((player, cell, collision.MUSHROOM) for cell in cells)
+        self.assertGreater(len(expected), byEnemy)
+        self.assertEqual(self.calls, expected)
+        self.assertEqual(self.collider.hits, len(expected))
+        self.assertGreaterEqual(self.collider.candidates, len(expected))
+
+    def testHandlerStopsStage(self):
+        '''This method checks that a handler returning True stops the stage
+        after the first hit.'''
+        self.collider.addRule("touch", "player", "enemy", lambda *hit: self.calls.append(hit) or True)
+        self.collider.addRule("touch", "player", collision.MUSHROOM, self.record)
+        self.assertTrue(self.collider.resolve("touch"))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.calls[0][2], "enemy")
+
+    def testProjectilesHitTheFirstTarget(self):
+        '''This method checks that each projectile only hits the lowest target
+        its sweep overlaps, found by pygame, taking an enemy level with a
+        mushroom since its rule comes first.'''
+        shots = pygame.sprite.Group()
+        rng = random.Random(2)
+        for i in range(40):
+            Box((rng.randrange(0, 24*CELL), rng.randrange(0, 32*CELL), 2, rng.randint(1, 6*CELL)), shots)
+        # An enemy filling a cell level with a mushroom under the same shot
+        self.mushrooms.place((20*CELL + 1, 30*CELL + 1))
+        tied = Box((21*CELL, 30*CELL, CELL, CELL), self.enemies)
+        shot = Box((21*CELL - 1, 28*CELL, 2, 3*CELL), shots)
+        self.collider.addGroup("shot", shots, lambda sprite: sprite.rect)
+        self.collider.addRule("shots", "shot", "enemy", self.record)
+        self.collider.addRule("shots", "shot", collision.MUSHROOM, self.record)
+        self.collider.resolve("shots")
+
+        expected = []
+        for sprite in shots:
+            # (bottom, -rule), target, kind of the first target, keeping the
+            # first of equal ones
+            first = None
+            for mush in sorted(bruteForce(sprite.rect, self.mushrooms.group), key=lambda mush: mush.cell):
+                if first is None or (mush.rect.bottom, -1) > first[0]:
+                    first = ((mush.rect.bottom, -1), mush.cell, collision.MUSHROOM)
+            for enemy in bruteForce(sprite.rect, self.enemies):
+                if first is None or (enemy.rect.bottom, 0) > first[0]:
+                    first = ((enemy.rect.bottom, 0), enemy, "enemy")
+            if first is not None:
+                expected.append((sprite, first[1], first[2]))
+        self.assertGreater(len(expected), 5)
+        self.assertEqual(self.calls, expected)
+        self.assertIn((shot, tied, "enemy"), self.calls)
+
+    def testResetRebuildsHash(self):
+        '''This method checks that only the kinds some rule can hit are
+        hashed, and that sprites moved after a resolve are only found where
+        they are once reset() has been called.'''
+        self.collider.addRule("touch", "player", "enemy", self.record)
+        self.collider.resolve("touch")
+        self.assertEqual(self.collider.hash.count, len(self.enemies))
+
+        player = self.players.sprites()[0]
+        player.rect.topleft = (-10*CELL, -10*CELL)
+        enemy = Box(player.rect.move(2, 2), self.enemies)
+        del self.calls[:]
+        self.collider.resolve("touch")
+        self.assertNotIn((player, enemy, "enemy"), self.calls)
+
+        self.collider.reset()
+        self.assertEqual((self.collider.candidates, self.collider.hits), (0, 0))
+        del self.calls[:]
+        self.collider.resolve("touch")
+        self.assertIn((player, enemy, "enemy"), self.calls)
+        self.assertEqual(self.collider.hash.count, len(self.enemies))
+
+if __name__ == "__main__":
+    unittest.main()
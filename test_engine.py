@@ -0,0 +1,52 @@
+'''Desc: Tests for the vectorized entity engine.
+
+   Usage:
+       python -m unittest test_engine
+'''
+import os, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, simulation, engine
+
+def sweepAndFire(tick):
+    '''This input policy sweeps the player left and right and fires on every
+    other stretch, so that lasers fly and enemies are shot.'''
+    direction = simulation.LEFT if (tick//40) % 2 else simulation.RIGHT
+    return (direction, (tick//80) % 2 == 0)
+
+def positions(game):
+    '''This function returns the rects of the spiders, fleas, scorpions and
+    lasers of a game, each kind sorted.'''
+    return [sorted(tuple(sprite.rect) for sprite in group)
+            for group in (game.spiders, game.fleas, game.scorpions, game.lasers)]
+
+@unittest.skipUnless(engine.AVAILABLE, "the vectorized engine needs NumPy")
+class EngineParityTest(unittest.TestCase):
+    '''This class checks that the vectorized engine moves every sprite exactly
+    as the sprites' own update() methods do.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def testSameGameEitherWay(self):
+        '''This method plays the same game with and without the engine and
+        checks that every enemy and laser is in the same place each tick.'''
+        plain = simulation.GameSimulation(seed=11, lives=9)
+        vectorized = simulation.GameSimulation(seed=11, lives=9, vectorized=True)
+        seen = [False]*4
+        for tick in range(3000):
+            plain.step(sweepAndFire(plain.tick))
+            vectorized.step(sweepAndFire(vectorized.tick))
+            expected = positions(plain)
+            self.assertEqual(positions(vectorized), expected)
+            self.assertEqual(vectorized.events, plain.events)
+            seen = [was or bool(rects) for was, rects in zip(seen, expected)]
+        self.assertEqual(seen, [True]*4)
+        self.assertEqual((vectorized.score, vectorized.lives), (plain.score, plain.lives))
+
+if __name__ == "__main__":
+    unittest.main()
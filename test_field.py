@@ -0,0 +1,168 @@
+'''Desc: Tests for the mushroom field.
+
+   Usage:
+       python -m unittest test_field
+'''
+import os, random, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, field
+
+class MushroomFieldTest(unittest.TestCase):
+    '''This class checks the health, poison and change tracking of a
+    MushroomField.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs, and
+        creates an empty 12x16 field of 10 px cells.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        self.mushrooms = field.MushroomField(12, 16, 10)
+
+    def testPlaceInsideAndOutsideBoard(self):
+        '''This method checks that mushrooms are placed in the edge cells, not
+        off the board, and that placing one where there already is one
+        leaves it alone.'''
+        mushrooms = self.mushrooms
+        for position, cell in (((0, 0), (0, 0)), ((119, 159), (11, 15)), ((119, 0), (11, 0)),
+                               ((0, 159), (0, 15)), ((55.5, 72.9), (5, 7))):
+            mush = mushrooms.place(position)
+            self.assertEqual(mush.cell, cell)
+            self.assertEqual(mush.rect.center, mushrooms.getCenter(cell))
+            self.assertIn(mush, mushrooms.group)
+            self.assertEqual(mushrooms.getHealth(cell), 4)
+        for position in ((-1, 5), (5, -1), (120, 5), (5, 160), (500, 500)):
+            self.assertIsNone(mushrooms.getCell(position))
+            self.assertIsNone(mushrooms.place(position))
+        self.assertEqual(len(mushrooms), 5)
+
+        mushrooms.damage((5, 7))
+        self.assertIs(mushrooms.place((50, 70)), mushrooms.views[7*12 + 5])
+        self.assertEqual(mushrooms.getHealth((5, 7)), 3)
+        self.assertEqual(len(mushrooms), 5)
+
+    def testDamageAndRemove(self):
+        '''This method checks that a mushroom is destroyed by its fourth hit,
+        and that damaging or removing an empty cell does nothing.'''
+        mushrooms = self.mushrooms
+        mush = mushrooms.place((0, 0))
+        self.assertEqual([mushrooms.damage((0, 0)) for i in range(4)], [False, False, False, True])
+        self.assertFalse(mushrooms.hasMushroom((0, 0)))
+        self.assertFalse(mush.alive())
+        self.assertFalse(mushrooms.damage((0, 0)))
+        self.assertEqual(len(mushrooms), 0)
+
+        mushrooms.place((110, 150))
+        mushrooms.setPoisonous((11, 15), True)
+        mushrooms.remove((11, 15))
+        mushrooms.remove((11, 15))
+        self.assertEqual((mushrooms.getHealth((11, 15)), mushrooms.isPoisonous((11, 15))), (0, False))
+        mushrooms.setPoisonous((11, 15), True)
+        self.assertFalse(mushrooms.isPoisonous((11, 15)))
+        self.assertEqual(mushrooms.cells(), [])
+
+    def testHealRevertsPoison(self):
+        '''This method checks that heal() restores damaged mushrooms, turns
+        poisoned ones back to normal with their normal image, and only counts
+        the damaged ones.'''
+        mushrooms = self.mushrooms
+        damaged = mushrooms.place((15, 15))
+        poisoned = mushrooms.place((25, 15))
+        both = mushrooms.place((35, 15))
+        mushrooms.place((45, 15))
+        mushrooms.damage(damaged.cell)
+        mushrooms.setPoisonous(poisoned.cell, True)
+        self.assertIs(poisoned.image, poisoned.agaric)
+        mushrooms.damage(both.cell)
+        mushrooms.damage(both.cell)
+        mushrooms.setPoisonous(both.cell, True)
+
+        self.assertEqual(mushrooms.heal(), 2)
+        for mush in (damaged, poisoned, both):
+            self.assertEqual(mushrooms.getHealth(mush.cell), 4)
+            self.assertFalse(mushrooms.isPoisonous(mush.cell))
+            self.assertIs(mush.image, mush.cremini)
+        self.assertEqual(mushrooms.heal(), 0)
+
+    def testTakeChanged(self):
+        '''This method checks that every change to a cell is recorded once, in
+        order, that changes that change nothing are not, and that the changes
+        are forgotten once taken.'''
+        mushrooms = self.mushrooms
+        mushrooms.place((115, 155))
+        mushrooms.place((5, 5))
+        mushrooms.place((15, 5))
+        self.assertEqual(mushrooms.takeChanged(), [0, 1, 15*12 + 11])
+        self.assertEqual(mushrooms.takeChanged(), [])
+
+        mushrooms.place((5, 5))
+        mushrooms.setHealth((1, 0), 4)
+        mushrooms.setPoisonous((0, 0), False)
+        mushrooms.setPoisonous((3, 3), True)
+        mushrooms.damage((3, 3))
+        self.assertEqual(mushrooms.takeChanged(), [])
+
+        mushrooms.setPoisonous((1, 0), True)
+        mushrooms.damage((1, 0))
+        mushrooms.remove((0, 0))
+        self.assertEqual(mushrooms.takeChanged(), [0, 1])
+        mushrooms.heal()
+        self.assertEqual(mushrooms.takeChanged(), [1])
+
+    def testLoad(self):
+        '''This method checks that loading arrays creates, refreshes and
+        releases only the sprites of the cells that changed.'''
+        mushrooms = self.mushrooms
+        kept = mushrooms.place((5, 5))
+        gone = mushrooms.place((15, 5))
+        mushrooms.takeChanged()
+        health = bytearray(mushrooms.health)
+        poison = bytearray(mushrooms.poison)
+        health[1] = 0
+        poison[0] = 1
+        health[12*16 - 1] = 2
+        mushrooms.load(bytes(health), bytes(poison))
+        self.assertEqual(mushrooms.takeChanged(), [0, 1, 12*16 - 1])
+        self.assertIs(mushrooms.views[0], kept)
+        self.assertIs(kept.image, kept.agaric)
+        # The released sprite is handed out again for the new mushroom
+        self.assertIs(mushrooms.views[12*16 - 1], gone)
+        self.assertEqual(gone.cell, (11, 15))
+        self.assertEqual(len(mushrooms.group), 2)
+        self.assertEqual(mushrooms.getHealth((11, 15)), 2)
+        self.assertEqual(sorted(mushrooms.cells()), [(0, 0), (11, 15)])
+
+    def testCellsOverlapping(self):
+        '''This method checks the cells overlapping rects on, across the edges
+        of and off the board against pygame's own collision tests, and that
+        the lowest of them is the lowest, leftmost one.'''
+        mushrooms = self.mushrooms
+        rng = random.Random(6)
+        for i in range(80):
+            mushrooms.place((rng.randrange(120), rng.randrange(160)))
+        for col, row in ((0, 0), (11, 0), (0, 15), (11, 15)):
+            mushrooms.place(mushrooms.getCenter((col, row)))
+
+        rects = [pygame.Rect(-5, -5, 10, 10), pygame.Rect(115, 155, 20, 20),
+                 pygame.Rect(-50, 40, 30, 30), pygame.Rect(0, 0, 120, 160),
+                 pygame.Rect(10, 10, 10, 10), pygame.Rect(19, 19, 2, 2)]
+        rects += [pygame.Rect(rng.randint(-20, 130), rng.randint(-20, 170),
+                              rng.randint(1, 40), rng.randint(1, 40)) for i in range(300)]
+        for rect in rects:
+            cells = list(mushrooms.cellsOverlapping(rect))
+            probe = pygame.sprite.Sprite()
+            probe.rect = rect
+            expected = [mush.cell for mush in pygame.sprite.spritecollide(probe, mushrooms.group, False)]
+            self.assertEqual(sorted(cells), sorted(expected))
+            self.assertEqual(cells, sorted(cells, key=lambda cell: (cell[1], cell[0])))
+
+            lowest = mushrooms.lowestCellOverlapping(rect)
+            if expected:
+                self.assertEqual(lowest, min(expected, key=lambda cell: (-cell[1], cell[0])))
+            else:
+                self.assertIsNone(lowest)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+'''Desc: Tests for the leaderboard's record log and index.
+
+   Usage:
+       python -m unittest test_leaderboard
+'''
+import os, shutil, tempfile, unittest
+import leaderboard
+
+class LeaderboardTest(unittest.TestCase):
+    '''This class checks the leaderboard files in a temporary directory.'''
+    def setUp(self):
+        '''This method creates an empty directory for the leaderboard files.'''
+        self.directory = tempfile.mkdtemp()
+        self.basename = os.path.join(self.directory, "leaderboard")
+
+    def tearDown(self):
+        '''This method deletes the directory.'''
+        shutil.rmtree(self.directory)
+
+    def appendToLog(self, data):
+        '''This method appends bytes to the log, as a crashed writer would.'''
+        with open(self.basename + ".log", "ab") as log:
+            log.write(data)
+
+    def testScoresPersist(self):
+        '''This method checks that recorded scores are read back by another
+        Leaderboard, best first.'''
+        board = leaderboard.Leaderboard(self.basename, topK=3)
+        for score in (50, 300, 10, 200):
+            board.record(score)
+        self.assertEqual(board.getTop(), [300, 200, 50])
+        self.assertEqual(leaderboard.Leaderboard(self.basename, topK=3).getTop(), [300, 200, 50])
+
+    def testTornRecordIsIgnored(self):
+        '''This method checks that a record cut short by a crash is ignored,
+        and that the next record is written after the last whole one.'''
+        board = leaderboard.Leaderboard(self.basename)
+        board.record(100)
+        self.appendToLog(leaderboard.packRecord(999, 0.0)[:7])
+        board = leaderboard.Leaderboard(self.basename)
+        self.assertEqual(board.getTop(), [100])
+
+        board.record(40)
+        self.assertEqual(os.path.getsize(self.basename + ".log"), 2*leaderboard.RECORD.size)
+        with open(self.basename + ".log", "rb") as log:
+            scores = [score for score, timestamp in leaderboard.readRecords(log.read())]
+        self.assertEqual(scores, [100, 40])
+
+    def testCorruptRecordIsSkipped(self):
+        '''This method checks that a record whose checksum does not match is
+        skipped, but the records after it are still read.'''
+        board = leaderboard.Leaderboard(self.basename)
+        board.record(100)
+        record = bytearray(leaderboard.packRecord(500, 0.0))
+        record[0] ^= 0xFF
+        self.appendToLog(bytes(record) + leaderboard.packRecord(70, 0.0))
+        self.assertEqual(leaderboard.Leaderboard(self.basename).getTop(), [100, 70])
+
+    def testIndexIsRebuilt(self):
+        '''This method checks that a missing or corrupt index, or one left
+        ahead of the log, is rebuilt from the log.'''
+        board = leaderboard.Leaderboard(self.basename)
+        for score in (30, 20, 10):
+            board.record(score)
+        indexPath = self.basename + ".idx"
+
+        os.remove(indexPath)
+        self.assertEqual(leaderboard.Leaderboard(self.basename).getTop(), [30, 20, 10])
+
+        with open(indexPath, "r+b") as index:
+            index.seek(leaderboard.INDEX_HEADER.size)
+            index.write(b"\xff")
+        self.assertEqual(leaderboard.Leaderboard(self.basename).getTop(), [30, 20, 10])
+
+        with open(self.basename + ".log", "r+b") as log:
+            log.truncate(leaderboard.RECORD.size)
+        self.assertEqual(leaderboard.Leaderboard(self.basename).getTop(), [30])
+
+    def testLeftoverTempFileIsHarmless(self):
+        '''This method checks that a temporary file left by a crash during an
+        atomic write does not change what is read.'''
+        board = leaderboard.Leaderboard(self.basename)
+        board.record(60)
+        with open(self.basename + ".idx.tmp", "wb") as temp:
+            temp.write(b"partial")
+        board = leaderboard.Leaderboard(self.basename)
+        self.assertEqual(board.getTop(), [60])
+        board.record(80)
+        self.assertEqual(board.getTop(), [80, 60])
+
+    def testCompaction(self):
+        '''This method checks that the log only keeps the top scores once it
+        holds more than compactAfter records.'''
+        board = leaderboard.Leaderboard(self.basename, topK=3, compactAfter=5)
+        for score in range(1, 7):
+            board.record(score)
+        self.assertEqual(os.path.getsize(self.basename + ".log"), 3*leaderboard.RECORD.size)
+        self.assertEqual(board.getTop(), [6, 5, 4])
+
+        board.record(10)
+        self.assertEqual(leaderboard.Leaderboard(self.basename, topK=3).getTop(), [10, 6, 5])
+
+    def testLegacyImport(self):
+        '''This method checks that a plain-text leaderboard is imported once,
+        skipping malformed lines.'''
+        with open(self.basename + ".txt", "w") as legacy:
+            legacy.write("120\nnot a score\n\n45\n300\n")
+        board = leaderboard.Leaderboard(self.basename)
+        self.assertEqual(board.getTop(), [300, 120, 45])
+        self.assertEqual(board.getBest(), 300)
+
+        with open(self.basename + ".txt", "w") as legacy:
+            legacy.write("9999\n")
+        self.assertEqual(leaderboard.Leaderboard(self.basename).getBest(), 300)
+
+    def testEmptyLeaderboard(self):
+        '''This method checks a leaderboard with no scores and no legacy file.'''
+        board = leaderboard.Leaderboard(self.basename)
+        self.assertEqual(board.getTop(), [])
+        self.assertEqual(board.getBest(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+'''Desc: Tests for the co-op network protocol.
+
+   Usage:
+       python -m unittest test_netplay
+'''
+import os, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, simulation, netplay
+
+def playStates(ticks):
+    '''This function plays a two-player game for the given number of ticks
+    (int) and returns the NetState of every tick.'''
+    game = simulation.GameSimulation(seed=5, lives=9, numPlayers=2)
+    ids = netplay.EntityIds()
+    states = []
+    for tick in range(ticks):
+        direction = simulation.LEFT if (tick//30) % 2 else simulation.RIGHT
+        game.step([(direction, True), (simulation.UP, tick % 3 == 0)])
+        states.append(netplay.captureState(game, ids))
+    return states
+
+class DeltaTest(unittest.TestCase):
+    '''This class checks that the delta encoder and decoder agree.'''
+    @classmethod
+    def setUpClass(cls):
+        '''This class method opens a tiny display, which loading images needs,
+        and plays the game every test encodes.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        cls.states = playStates(300)
+
+    def assertRoundTrip(self, base, state):
+        '''This method encodes a state against a base, decodes it and checks
+        that the result is the same state with the same sounds.'''
+        decoded = netplay.decodeDelta(base, state.tick, netplay.encodeDelta(base, state))
+        self.assertEqual(decoded, state)
+        self.assertEqual(decoded.counters, state.counters)
+        self.assertEqual(decoded.tick, state.tick)
+        self.assertEqual(set(decoded.events), set(state.events))
+
+    def testFullStates(self):
+        '''This method checks states encoded against the empty state.'''
+        cells = len(self.states[0].health)
+        for state in self.states[::25]:
+            self.assertRoundTrip(netplay.emptyState(cells), state)
+
+    def testDeltas(self):
+        '''This method checks every state against the previous one and against
+        one several ticks older, as after lost datagrams.'''
+        for back in (1, 7, netplay.HISTORY - 1):
+            for i in range(back, len(self.states)):
+                self.assertRoundTrip(self.states[i-back], self.states[i])
+
+    def testUnchangedStateIsSmall(self):
+        '''This method checks that a state encoded against itself only holds
+        the counts.'''
+        state = self.states[-1]
+        quiet = netplay.NetState(state.tick, state.counters, state.health,
+                                 state.poison, state.entities)
+        self.assertEqual(len(netplay.encodeDelta(state, quiet)),
+                         netplay.COUNTERS.size + 4*netplay.COUNT.size)
+
+    def testEntityChanges(self):
+        '''This method checks removed entities, new ones, small moves and
+        moves too large for a MOVE record.'''
+        cells = bytearray(8)
+        base = netplay.NetState(1, (0, 3, 0, False), cells, cells,
+                                {16: (netplay.SPIDER, 0, 10, 10), 17: (netplay.FLEA, 0, 50, 0),
+                                 18: (netplay.LASER, 0, 40, 300)})
+        state = netplay.NetState(2, (100, 3, 0, False), cells, cells,
+                                 {16: (netplay.SPIDER, 0, 300, 10), 17: (netplay.FLEA, 0, 50, 12),
+                                  19: (netplay.SCORPION, 1, 0, 60)}, ("hit",))
+        self.assertRoundTrip(base, state)
+
+    def testWrongBaseIsRejected(self):
+        '''This method checks that a delta applied to a base missing one of
+        its entities, or cut short, raises ValueError.'''
+        cells = bytearray(8)
+        base = netplay.NetState(1, (0, 3, 0, False), cells, cells, {16: (netplay.FLEA, 0, 50, 0)})
+        state = netplay.NetState(2, (0, 3, 0, False), cells, cells, {16: (netplay.FLEA, 0, 50, 4)})
+        body = netplay.encodeDelta(base, state)
+        with self.assertRaises(ValueError):
+            netplay.decodeDelta(netplay.emptyState(8), 2, body)
+        with self.assertRaises(ValueError):
+            netplay.decodeDelta(base, 2, body[:-1])
+
+class EntityIdsTest(unittest.TestCase):
+    '''This class checks how ids are given to sprites.'''
+    def testIdsAreStableAndFreed(self):
+        '''This method checks that a sprite keeps its id while it is alive,
+        that a pooled sprite handed out again gets a new one, and that the ids
+        of dead sprites are freed.'''
+        group = pygame.sprite.Group()
+        first, second = pygame.sprite.Sprite(group), pygame.sprite.Sprite(group)
+        ids = netplay.EntityIds()
+        firstId, secondId = ids.get(first), ids.get(second)
+        self.assertEqual(firstId, netplay.FIRST_ID)
+        self.assertNotEqual(firstId, secondId)
+        self.assertEqual(ids.get(first), firstId)
+
+        first.generation = 1
+        self.assertNotEqual(ids.get(first), firstId)
+        second.kill()
+        ids.prune()
+        self.assertEqual(list(ids.ids.values()), [ids.get(first)])
+
+class RecordingTransport(object):
+    '''This class stands in for a datagram transport and keeps what is sent.'''
+    def __init__(self):
+        '''This initializer has no parameters.'''
+        self.sent = []
+
+    def is_closing(self):
+        '''This method returns False; the transport is never closed.'''
+        return False
+
+    def sendto(self, data, address):
+        '''This method keeps a datagram and the address it was sent to.'''
+        self.sent.append((data, address))
+
+class ServerTest(unittest.TestCase):
+    '''This class checks how the server handles datagrams from the LAN.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs, and
+        creates a server waiting for two players.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        self.server = netplay.GameServer(seed=1)
+        self.server.connection_made(RecordingTransport())
+        self.address = ("127.0.0.1", 9)
+
+    def testMalformedHelloIsDropped(self):
+        '''This method checks that short and garbage datagrams neither raise
+        nor let a client join.'''
+        hello = netplay.HEADER.pack(netplay.MAGIC, netplay.HELLO)
+        for data in (b"", b"\x00", b"garbage", hello, hello + b"\x01"):
+            self.server.datagram_received(data, self.address)
+        self.assertEqual(self.server.clients, {})
+        self.assertEqual(self.server.transport.sent, [])
+
+    def testMalformedInputIsDropped(self):
+        '''This method checks that a short input datagram from a client that
+        joined is ignored.'''
+        self.server.datagram_received(netplay.HEADER.pack(netplay.MAGIC, netplay.HELLO) +
+                                      netplay.HELLO_MSG.pack(netplay.VERSION), self.address)
+        slot = self.server.clients[self.address]
+        self.server.datagram_received(netplay.HEADER.pack(netplay.MAGIC, netplay.INPUT) +
+                                      b"\x01\x02", self.address)
+        self.assertEqual(len(slot.inputs), 0)
+        self.assertEqual(slot.bytesReceived, 0)
+
+    def testByeDropsTheClient(self):
+        '''This method checks that a client that says BYE is sent nothing more
+        and its player stands still.'''
+        hello = netplay.HEADER.pack(netplay.MAGIC, netplay.HELLO) + netplay.HELLO_MSG.pack(netplay.VERSION)
+        other = ("127.0.0.1", 10)
+        self.server.datagram_received(hello, self.address)
+        self.server.datagram_received(hello, other)
+        self.server.datagram_received(netplay.HEADER.pack(netplay.MAGIC, netplay.BYE), self.address)
+        self.assertEqual(list(self.server.clients), [other])
+        self.assertTrue(self.server.slots[0].left)
+
+        sent = self.server.transport.sent
+        del sent[:]
+        self.server.step()
+        self.assertEqual([address for data, address in sent], [other])
+        self.assertEqual(self.server.slots[0].lastInput, (simulation.STILL, False))
+
+if __name__ == "__main__":
+    unittest.main()
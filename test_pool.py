@@ -0,0 +1,143 @@
+'''Desc: Tests for the sprite pools and the garbage collector switch.
+
+   Usage:
+       python -m unittest test_pool
+'''
+import gc, os, random, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, sprites, pool
+
+def state(sprite):
+    '''This function returns the rect and speeds of a sprite.'''
+    return (tuple(sprite.rect), getattr(sprite, "dx", None), getattr(sprite, "dy", None))
+
+class SpritePoolTest(unittest.TestCase):
+    '''This class checks that released sprites are handed out again as if
+    they were new.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        self.bounds = pygame.Rect(0, 0, 480, 640)
+
+    def testReleasedSpriteIsReused(self):
+        '''This method checks that a released laser leaves its groups and is
+        the one handed out next, placed where it is asked to be and no longer
+        counting the distance it flew.'''
+        lasers = pool.SpritePool(sprites.Laser, 4)
+        group = pygame.sprite.Group()
+        l = lasers.acquire(50, 300)
+        group.add(l)
+        generation = l.generation
+        l.update()
+        self.assertEqual(l.travel, 20)
+
+        l.release()
+        self.assertFalse(l.alive())
+        self.assertTrue(l.pooled)
+        self.assertEqual(len(lasers), 1)
+        again = lasers.acquire(90, 100)
+        self.assertIs(again, l)
+        self.assertFalse(l.pooled)
+        self.assertEqual(l.rect.center, (90, 100))
+        self.assertEqual(l.travel, 0)
+        self.assertEqual(l.generation, generation + 1)
+        self.assertEqual(lasers.getStats(), {"created": 1, "reused": 1, "discarded": 0, "free": 0})
+
+    def testResetMatchesNewSprite(self):
+        '''This method checks that reused spiders, fleas and scorpions start
+        in the state a newly constructed one would, given the same random
+        numbers.'''
+        kinds = ((sprites.Spider, lambda rng: (self.bounds, 4, rng, 20)),
+                 (sprites.Flea, lambda rng: (5, rng, self.bounds, 20)),
+                 (sprites.Scorpion, lambda rng: (self.bounds, rng, 20)))
+        for spriteClass, makeArgs in kinds:
+            spritePool = pool.SpritePool(spriteClass, 4)
+            used = spritePool.acquire(*makeArgs(random.Random(1)))
+            for i in range(30):
+                used.update()
+            used.release()
+            for seed in range(5):
+                reused = spritePool.acquire(*makeArgs(random.Random(seed)))
+                self.assertIs(reused, used)
+                self.assertEqual(state(reused), state(spriteClass(*makeArgs(random.Random(seed)))))
+                reused.release()
+
+    def testCap(self):
+        '''This method checks that sprites released into a full pool are left
+        to the garbage collector, that releasing a sprite twice does nothing
+        and that lowering the cap drops the extra sprites.'''
+        lasers = pool.SpritePool(sprites.Laser, 2)
+        made = [lasers.acquire(10, 10) for i in range(3)]
+        for l in made:
+            l.release()
+        made[0].release()
+        self.assertEqual(len(lasers), 2)
+        self.assertEqual(lasers.getStats()["discarded"], 1)
+        lasers.setCap(1)
+        self.assertEqual(len(lasers), 1)
+        self.assertEqual(lasers.getStats()["discarded"], 2)
+
+    def testSpriteWithoutPool(self):
+        '''This method checks that releasing a sprite that was constructed
+        directly only kills it.'''
+        l = sprites.Laser(10, 10)
+        group = pygame.sprite.Group(l)
+        l.release()
+        self.assertFalse(l.alive())
+        self.assertFalse(l.pooled)
+
+class GarbageCollectorTest(unittest.TestCase):
+    '''This class checks that the automatic garbage collector is switched off
+    during a game and back on after it.'''
+    def setUp(self):
+        '''This method remembers whether the collector is on.'''
+        self.wasEnabled = gc.isenabled()
+        gc.enable()
+
+    def tearDown(self):
+        '''This method puts the collector back as it was.'''
+        if self.wasEnabled:
+            gc.enable()
+        else:
+            gc.disable()
+
+    def testStartAndStop(self):
+        '''This method checks that the collector is off between start() and
+        stop(), that collect() still runs it, and that it is on again after.'''
+        collector = pool.GarbageCollector()
+        collector.start()
+        self.assertFalse(gc.isenabled())
+        collector.collect()
+        self.assertEqual(collector.collections, 1)
+        self.assertFalse(gc.isenabled())
+        collector.stop()
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(collector.collections, 2)
+
+    def testStopLeavesDisabledCollectorOff(self):
+        '''This method checks that stop() does not switch on a collector that
+        was already off before start().'''
+        gc.disable()
+        collector = pool.GarbageCollector()
+        collector.start()
+        collector.stop()
+        self.assertFalse(gc.isenabled())
+
+    def testDisabled(self):
+        '''This method checks that a GarbageCollector that is not enabled, as
+        without --gc-between-lives, leaves the collector alone.'''
+        collector = pool.GarbageCollector(False)
+        collector.start()
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(collector.collect(), 0)
+        collector.stop()
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(collector.collections, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+'''Desc: Tests for recording, saving and playing back replays.
+
+   Usage:
+       python -m unittest test_replay
+'''
+import os, random, unittest, zlib
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, field, simulation, snapshot, replay
+
+def record(seed, ticks):
+    '''This function plays a game with random inputs for the given number of
+    ticks (int) and returns the Replay and the snapshot taken at the start of
+    every tick.'''
+    mushrooms = field.MushroomField()
+    mushrooms.scatter(30, random.Random(seed))
+    recording = replay.Replay(seed, mushrooms, lives=5)
+    game = simulation.GameSimulation(mushrooms, seed, 5)
+    rng = random.Random(seed)
+    states = []
+    for tick in range(ticks):
+        states.append(snapshot.capture(game))
+        # Hold each input for a while, as a player would
+        if tick % 15 == 0:
+            inputs = (rng.choice(replay.DIRECTIONS), rng.random() < 0.6)
+        recording.record(inputs)
+        game.step(inputs)
+    states.append(snapshot.capture(game))
+    recording.score = game.score
+    return recording, states
+
+class ReplayTest(unittest.TestCase):
+    '''This class checks that a replay plays back the game it recorded.'''
+    @classmethod
+    def setUpClass(cls):
+        '''This class method opens a tiny display, which loading images needs,
+        and records the game every test plays back.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+        cls.recording, cls.states = record(3, 900)
+
+    def testInputCodes(self):
+        '''This method checks that every input survives encoding.'''
+        for direction in replay.DIRECTIONS:
+            for fire in (False, True):
+                code = replay.encodeInput((direction, fire))
+                self.assertEqual(replay.decodeInput(code), (direction, fire))
+
+    def testVarints(self):
+        '''This method checks that ints of every length survive encoding.'''
+        data = bytearray()
+        values = (0, 1, 127, 128, 300, 16383, 16384, 2**31)
+        for value in values:
+            replay.writeVarint(data, value)
+        offset = 0
+        for value in values:
+            decoded, offset = replay.readVarint(data, offset)
+            self.assertEqual(decoded, value)
+        self.assertEqual(offset, len(data))
+
+    def testPlaybackIsDeterministic(self):
+        '''This method checks that a saved and loaded replay plays back tick
+        for tick like the recorded game.'''
+        loaded = replay.Replay.fromBytes(self.recording.toBytes())
+        self.assertEqual(list(loaded.inputs()), list(self.recording.inputs()))
+        self.assertGreater(self.recording.score, 0)
+        player = replay.ReplayPlayer(loaded)
+        for state in self.states[:-1]:
+            self.assertEqual(snapshot.capture(player.game), state)
+            self.assertTrue(player.step())
+        self.assertFalse(player.step())
+        self.assertTrue(player.isFinished())
+        self.assertEqual(snapshot.capture(player.game), self.states[-1])
+        self.assertEqual(player.game.score, loaded.score)
+
+    def testSeeking(self):
+        '''This method checks that seeking forward, back and past either end
+        lands on the same state as playing straight through.'''
+        player = replay.ReplayPlayer(self.recording, keyframeEvery=100)
+        for tick in (250, 120, 0, 899, 450, 451, 10, 2000, -5):
+            player.seek(tick)
+            expected = max(0, min(tick, self.recording.ticks))
+            self.assertEqual(player.getTick(), expected)
+            self.assertEqual(snapshot.capture(player.game), self.states[expected])
+
+    def testCorruptReplaysAreRejected(self):
+        '''This method checks that data that is not a whole replay of this
+        version raises ValueError.'''
+        data = self.recording.toBytes()
+        body = zlib.decompress(data[replay.HEADER.size:])
+        for bad in (b"", b"CRPL", b"X" + data[1:], data[:replay.HEADER.size] + b"junk",
+                    data[:replay.HEADER.size] + zlib.compress(body[:-2])):
+            with self.assertRaises(ValueError):
+                replay.Replay.fromBytes(bad)
+
+if __name__ == "__main__":
+    unittest.main()
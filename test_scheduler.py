@@ -0,0 +1,133 @@
+'''Desc: Tests for the tick-based event scheduler.
+
+   Usage:
+       python -m unittest test_scheduler
+'''
+import os, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, scheduler, simulation, snapshot
+
+class SchedulerTest(unittest.TestCase):
+    '''This class checks when a Scheduler runs its events.'''
+    def setUp(self):
+        '''This method creates a scheduler whose handlers keep the events they
+        are called for.'''
+        self.calls = []
+        self.events = scheduler.Scheduler()
+        for name in ("spawn", "reload", "resume"):
+            self.events.setHandler(name, lambda argument, name=name: self.calls.append((name, argument)))
+
+    def testRunsInOrder(self):
+        '''This method checks that due events run by tick, then in the order
+        they were scheduled, and that events a handler schedules for the
+        current tick run too.'''
+        self.events.schedule(5, "spawn", 2)
+        self.events.schedule(3, "reload", 1)
+        self.events.schedule(5, "spawn", 0)
+        self.events.setHandler("resume", lambda argument: self.events.schedule(4, "reload", 0))
+        self.events.schedule(4, "resume")
+        self.assertEqual(self.events.run(2), 0)
+        self.assertEqual(self.events.run(4), 3)
+        self.assertEqual(self.calls, [("reload", 1), ("reload", 0)])
+        self.assertEqual(self.events.run(9), 2)
+        self.assertEqual(self.calls[2:], [("spawn", 2), ("spawn", 0)])
+        self.assertEqual(len(self.events), 0)
+
+    def testRescheduleMovesEvent(self):
+        '''This method checks that scheduling a pending event again moves it,
+        leaving the old entry in the heap to be skipped.'''
+        self.events.schedule(5, "spawn", 1)
+        self.events.schedule(10, "spawn", 1)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(len(self.events.heap), 2)
+        self.assertEqual(self.events.getDue("spawn", 1), 10)
+        self.assertEqual(self.events.run(9), 0)
+        self.assertEqual(self.events.run(10), 1)
+        self.assertEqual(self.calls, [("spawn", 1)])
+        self.assertIsNone(self.events.getDue("spawn", 1))
+
+    def testCompaction(self):
+        '''This method checks that moved entries are dropped from the heap
+        once they outnumber the pending events.'''
+        for tick in range(1000):
+            self.events.schedule(tick + 30, "reload", tick % 3)
+            self.assertLessEqual(len(self.events.heap), 2*len(self.events) + 17)
+        self.assertEqual(len(self.events), 3)
+        self.assertEqual(self.events.run(2000), 3)
+        self.assertEqual(self.calls, [("reload", 1), ("reload", 2), ("reload", 0)])
+
+    def testCancelledReloadNeverFires(self):
+        '''This method cancels a reload when a life is lost, as the pause's
+        handler would, and checks that it never fires later, neither from the
+        stale heap entry nor from a scheduler loaded from getEvents().'''
+        self.events.schedule(20, "reload", 0)
+        self.events.schedule(20, "reload", 1)
+        self.events.setHandler("resume", lambda argument: self.events.cancel("reload", 0))
+        self.events.schedule(10, "resume")
+        self.events.run(10)
+        self.events.cancel("spawn", 3) # not pending; ignored
+        self.assertIsNone(self.events.getDue("reload", 0))
+
+        copy = scheduler.Scheduler()
+        copy.setHandler("reload", lambda argument: self.calls.append(("copy", argument)))
+        copy.load(self.events.getEvents(), self.events.sequence)
+        self.events.run(100)
+        copy.run(100)
+        self.assertEqual(self.calls, [("reload", 1), ("copy", 1)])
+
+    def testGetEventsAndLoad(self):
+        '''This method checks that a scheduler loaded from getEvents() holds
+        the same events, runs them in the same order and goes on numbering
+        them where the original left off.'''
+        for argument in range(6):
+            self.events.schedule(10 + argument % 2, "spawn", argument)
+        self.events.schedule(15, "spawn", 2)
+        self.events.cancel("spawn", 3)
+        pending = self.events.getEvents()
+        self.assertEqual([(tick, name, argument) for tick, sequence, name, argument in pending],
+                         [(10, "spawn", 0), (10, "spawn", 4), (11, "spawn", 1),
+                          (11, "spawn", 5), (15, "spawn", 2)])
+
+        copy = scheduler.Scheduler()
+        copy.setHandler("spawn", self.events.handlers["spawn"])
+        copy.load(pending, self.events.sequence)
+        self.assertEqual(copy.getEvents(), pending)
+        for events in (self.events, copy):
+            events.schedule(11, "spawn", 9)
+        self.assertEqual(copy.getEvents(), self.events.getEvents())
+        self.events.run(20)
+        ran = self.calls[:]
+        del self.calls[:]
+        copy.run(20)
+        self.assertEqual(self.calls, ran)
+
+        copy.clear()
+        self.assertEqual((len(copy), copy.getEvents()), (0, []))
+
+class GameSchedulerTest(unittest.TestCase):
+    '''This class checks the events a game schedules.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def testEventsSurviveSnapshots(self):
+        '''This method checks that a restored game has the same pending events
+        as the game it was captured from, during the pause after a lost
+        life.'''
+        game = simulation.GameSimulation(seed=2, lives=5)
+        while not game.frozen and game.tick < 20000:
+            game.step((simulation.LEFT, True))
+        self.assertTrue(game.frozen)
+        copy = simulation.GameSimulation(seed=99, lives=5)
+        snapshot.restore(copy, snapshot.capture(game))
+        self.assertEqual(copy.scheduler.getEvents(), game.scheduler.getEvents())
+        self.assertEqual(copy.scheduler.sequence, game.scheduler.sequence)
+        self.assertEqual(copy.getPauseTicks(), game.getPauseTicks())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+'''Desc: Tests for the headless game simulation.
+
+   Usage:
+       python -m unittest test_simulation
+'''
+import os, random, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, field, simulation
+
+class NarrowBoardTest(unittest.TestCase):
+    '''This class checks that the centipede plays on the smallest board the
+    game allows.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def testCentipedeEntersBoard(self):
+        '''This method checks that the head spawns inside an 8x12 board and
+        never leaves it.'''
+        game = simulation.GameSimulation(field.MushroomField(8, 12, 8), seed=1)
+        entered = False
+        for tick in range(400):
+            game.step((simulation.STILL, False))
+            for chain in game.chains:
+                head = chain.getHead()
+                if head is None:
+                    continue
+                self.assertTrue(0 <= head.rect.centerx <= game.bounds.width)
+                if game.bounds.contains(head.rect):
+                    entered = True
+        self.assertTrue(entered)
+
+class SweptLaserTest(unittest.TestCase):
+    '''This class checks that a laser cannot pass through a target moving
+    towards it between two ticks.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def testLaserHitsFleaItCrossed(self):
+        '''This method fires a laser just below a falling flea, so that after
+        one tick the laser is above the flea without their rects ever
+        overlapping, and checks that the swept rect still scores the hit.'''
+        game = simulation.GameSimulation(field.MushroomField(24, 32, 8), seed=1)
+        game.step((simulation.STILL, False))
+        flea = game.pools["flea"].acquire(5, game.rng, game.bounds, game.cellSize)
+        flea.rect.top = 82 # off the rows, so it drops no mushroom
+        game.add(game.fleas, flea)
+        l = game.pools["laser"].acquire(flea.rect.centerx, 0)
+        l.rect.top = flea.rect.bottom + 1
+        game.add(game.lasers, l)
+        score = game.score
+
+        game.step((simulation.STILL, False))
+        self.assertLess(l.rect.bottom, flea.rect.top)
+        self.assertTrue(l.alive())
+        self.assertTrue(flea.alive())
+
+        game.step((simulation.STILL, False))
+        self.assertFalse(l.alive())
+        self.assertFalse(flea.alive())
+        self.assertIn("hit", game.events)
+        self.assertEqual(game.score - score, game.points["flea"])
+
+def stillSteps(game, ticks):
+    '''This generator steps a game with no input the given number of ticks
+    (int), yielding after each one.'''
+    for i in range(ticks):
+        game.step((simulation.STILL, False))
+        yield game.tick
+
+class CentipedeChainTest(unittest.TestCase):
+    '''This class checks that the segments of a centipede follow its head.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def assertFollowsHead(self, chain, heads):
+        '''This method checks that every segment of a chain is where its head
+        was, given the head's center after each tick (list, oldest first),
+        spacing ticks for each segment in front of it.'''
+        for i, segment in enumerate(chain.segments):
+            back = i*chain.spacing
+            if back < len(heads):
+                self.assertEqual(segment.rect.center, heads[-1 - back])
+
+    def testFollowersStayOnPathAfterWrapping(self):
+        '''This method checks that the segments keep to the head's path while
+        it turns at mushrooms and edges, long after the ring buffer has
+        wrapped.'''
+        mushrooms = field.MushroomField(24, 32, 8)
+        mushrooms.scatter(40, random.Random(3))
+        game = simulation.GameSimulation(mushrooms, seed=3, lives=9)
+        game.step((simulation.STILL, False))
+        chain = game.chains[0]
+        heads = []
+        for tick in stillSteps(game, 2000):
+            if game.frozen or chain not in game.chains:
+                break
+            heads.append(chain.getHead().rect.center)
+            self.assertFollowsHead(chain, heads)
+        self.assertGreater(len(heads), 3*chain.capacity)
+        self.assertGreater(len(set(y for x, y in heads)), 3)
+
+    def testShootingMiddleSegmentSplitsChain(self):
+        '''This method shoots the middle of a centipede lying along a row and
+        checks that it splits into two chains, that a mushroom grows where the
+        segment was, and that the rear chain goes on with a head of its own.'''
+        game = simulation.GameSimulation(field.MushroomField(24, 32, 8), seed=3)
+        game.step((simulation.STILL, False))
+        chain = game.chains[0]
+        for tick in stillSteps(game, 200):
+            if (len(set(segment.rect.centery for segment in chain.segments)) == 1 and
+                all(game.bounds.contains(segment.rect) for segment in chain.segments)):
+                break
+        segments = list(chain.segments)
+        hit = segments[5]
+        cell = game.mushrooms.getCell(hit.rect.center)
+        game.add(game.lasers, game.pools["laser"].acquire(*hit.rect.center))
+        score = game.score
+
+        game.step((simulation.STILL, False))
+        self.assertEqual(game.events, ["splat"])
+        self.assertEqual(game.score - score, game.points["centipede"])
+        self.assertFalse(hit.alive())
+        self.assertTrue(game.mushrooms.hasMushroom(cell))
+        self.assertEqual(len(game.chains), 2)
+        rear = game.chains[1]
+        self.assertEqual(chain.segments, segments[:5])
+        self.assertEqual(rear.segments, segments[6:])
+        self.assertIn(chain.getHead(), game.heads)
+        self.assertIn(rear.getHead(), game.heads)
+
+        heads = {chain: [], rear: []}
+        for tick in stillSteps(game, 3*rear.capacity):
+            for piece in heads:
+                heads[piece].append(piece.getHead().rect.center)
+                self.assertFollowsHead(piece, heads[piece])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+'''Desc: Tests for capturing and restoring save states.
+
+   Usage:
+       python -m unittest test_snapshot
+'''
+import os, unittest
+
+# Run without a window or sound card
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame, simulation, snapshot
+
+def sweepAndFire(tick):
+    '''This input policy sweeps the player left and right and fires on every
+    other stretch, so lasers, hits and mushrooms all change.'''
+    direction = simulation.LEFT if (tick//40) % 2 else simulation.RIGHT
+    return (direction, (tick//80) % 2 == 0)
+
+def play(game, ticks):
+    '''This function steps a game the given number of ticks (int) with the
+    sweepAndFire policy.'''
+    for i in range(ticks):
+        game.step(sweepAndFire(game.tick))
+
+class SnapshotTest(unittest.TestCase):
+    '''This class checks that a restored game carries on exactly like the game
+    it was captured from.'''
+    def setUp(self):
+        '''This method opens a tiny display, which loading images needs.'''
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+
+    def assertSameFuture(self, game, data, ticks=600):
+        '''This method restores a snapshot into a new game with another seed,
+        plays both games on, and checks that they stay the same.'''
+        copy = simulation.GameSimulation(seed=12345, lives=game.lives)
+        snapshot.restore(copy, data)
+        self.assertEqual(snapshot.capture(copy), data)
+        for i in range(ticks):
+            game.step(sweepAndFire(game.tick))
+            copy.step(sweepAndFire(copy.tick))
+            self.assertEqual(copy.events, game.events)
+        self.assertEqual((copy.tick, copy.score, copy.lives), (game.tick, game.score, game.lives))
+        self.assertEqual(snapshot.capture(copy), snapshot.capture(game))
+
+    def testRoundTrip(self):
+        '''This method checks a snapshot taken in the middle of a game.'''
+        game = simulation.GameSimulation(seed=7, lives=5)
+        play(game, 900)
+        self.assertGreater(game.score, 0)
+        self.assertSameFuture(game, snapshot.capture(game))
+
+    def testRoundTripWhileFrozen(self):
+        '''This method checks a snapshot taken while the board is frozen after
+        a life is lost, when the scheduled events matter most.'''
+        game = simulation.GameSimulation(seed=2, lives=5)
+        while not game.frozen and game.tick < 20000:
+            game.step((simulation.STILL, False))
+        self.assertTrue(game.frozen)
+        play(game, 10)
+        self.assertSameFuture(game, snapshot.capture(game))
+
+    def testRejectsOtherData(self):
+        '''This method checks that bytes that are not a snapshot, or are of
+        another board, raise ValueError.'''
+        game = simulation.GameSimulation(seed=1)
+        data = snapshot.capture(game)
+        for bad in (b"", b"CSNP", b"X" + data[1:]):
+            with self.assertRaises(ValueError):
+                snapshot.restore(game, bad)
+        with self.assertRaises(ValueError):
+            snapshot.restore(simulation.GameSimulation(seed=1, cols=12), data)
+
+class SnapshotRingTest(unittest.TestCase):
+    '''This class checks the ring of recent snapshots.'''
+    def testPushGetRewind(self):
+        '''This method checks that the oldest snapshots are overwritten and
+        that rewinding drops the newer ones.'''
+        ring = snapshot.SnapshotRing(seconds=1, tickRate=4)
+        for i in range(6):
+            ring.push(bytes([i]))
+        self.assertEqual(len(ring), 4)
+        self.assertEqual(ring.get(0), b"\x05")
+        self.assertEqual(ring.get(3), b"\x02")
+        with self.assertRaises(IndexError):
+            ring.get(4)
+        self.assertEqual(ring.rewind(2), b"\x03")
+        self.assertEqual(len(ring), 2)
+        ring.push(b"\x09")
+        self.assertEqual([ring.get(i) for i in range(3)], [b"\x09", b"\x03", b"\x02"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+'''Desc: The text subsystem of the remake of Atari Centipede. Fonts are opened
+   once per (path, size), rendered strings are cached per (string, colour), and
+   counters are composed from a digit glyph atlas so that a changing score
+   never needs a full TrueType render.
+'''
+import pygame
+
+# The custom font used for all text
+FONT = "Eater.ttf"
+
+# Rendered strings kept before the cache is emptied
+MAX_RENDERS = 256
+
+fonts = {}
+renders = {}
+stats = {"fontHits": 0, "fontMisses": 0, "renderHits": 0, "renderMisses": 0}
+
+def getFont(size, path=FONT):
+    '''This function takes a size (int) and an optional font path (string) and
+    returns the shared pygame.font.Font for them, opening it the first time.'''
+    key = (path, size)
+    font = fonts.get(key)
+    if font is None:
+        stats["fontMisses"] += 1
+        font = pygame.font.Font(path, size)
+        fonts[key] = font
+    else:
+        stats["fontHits"] += 1
+    return font
+
+def render(msg, size, colour=(255,255,255), path=FONT):
+    '''This function takes a message (string), size (int), colour (tuple) and
+    optional font path (string) and returns the antialiased rendering of the
+    message. Each (string, colour) is only rendered once per font. The returned
+    surface is shared, so it must not be drawn on.'''
+    key = (path, size, msg, tuple(colour))
+    surface = renders.get(key)
+    if surface is None:
+        stats["renderMisses"] += 1
+        if len(renders) >= MAX_RENDERS:
+            renders.clear()
+        surface = getFont(size, path).render(msg, True, colour)
+        renders[key] = surface
+    else:
+        stats["renderHits"] += 1
+    return surface
+
+class GlyphAtlas(object):
+    '''This class holds one pre-rendered surface per digit (and minus sign) for
+    a font size and colour, and composes numbers from them.'''
+    def __init__(self, size, colour=(255,255,255), path=FONT, chars="0123456789-"):
+        '''This initializer takes a size (int), colour (tuple), optional font
+        path (string) and the characters to pre-render (string).'''
+        self.size = size
+        self.colour = colour
+        self.path = path
+        self.glyphs = {}
+        for char in chars:
+            self.glyphs[char] = render(char, size, colour, path)
+        self.height = max(glyph.get_height() for glyph in self.glyphs.values())
+
+    def render(self, number, prefix=""):
+        '''This method takes a number (int) and an optional prefix (string, e.g.
+        "Score: ") and returns a new surface showing the prefix followed by the
+        number. The prefix comes from the render cache and the digits from the
+        atlas.'''
+        pieces = []
+        if prefix:
+            pieces.append(render(prefix, self.size, self.colour, self.path))
+        for char in str(number):
+            pieces.append(self.glyphs[char])
+
+        width = sum(piece.get_width() for piece in pieces)
+        surface = pygame.Surface((width, self.height), pygame.SRCALPHA)
+        xPos = 0
+        for piece in pieces:
+            # The glyphs do not overlap, so taking the max copies them exactly
+            surface.blit(piece, (xPos, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            xPos += piece.get_width()
+        return surface
+
+atlases = {}
+
+def getAtlas(size, colour=(255,255,255), path=FONT):
+    '''This function returns the shared GlyphAtlas for a size, colour and font
+    path, building it the first time.'''
+    key = (path, size, tuple(colour))
+    if key not in atlases:
+        atlases[key] = GlyphAtlas(size, colour, path)
+    return atlases[key]
@@ -0,0 +1,105 @@
+'''Desc: A fixed-timestep game loop for the remake of Atari Centipede. Every
+   speed in the game is per tick, so the simulation must always advance in
+   whole ticks of 1/TICK_RATE s. A FixedTimestep turns the real time between
+   rendered frames into a number of ticks to run, keeping the remainder in an
+   accumulator, so frames can be drawn as often as the display allows without
+   changing the speed of the game. When a frame took too long, at most
+   maxTicks ticks are run before the next one is drawn (frame skipping); any
+   time still owed after that is dropped, so the game slows down instead of
+   falling further and further behind.
+
+   An Interpolator draws each moving sprite between where it was before the
+   last tick and where it is now, according to how far the accumulator is
+   into the next tick, so that motion looks smooth at any refresh rate.
+'''
+
+class FixedTimestep(object):
+    '''This class keeps the accumulator of real time not yet simulated.'''
+    def __init__(self, tickRate=30, maxTicks=5):
+        '''This initializer takes the number of ticks per second (int) and the
+        most ticks (int) to run before a frame is drawn.'''
+        self.tickRate = tickRate
+        self.tickTime = 1.0/tickRate
+        self.maxTicks = maxTicks
+        self.accumulator = 0.0
+
+        # Statistics
+        self.ticks = 0
+        self.frames = 0
+        self.skippedFrames = 0
+        self.droppedTime = 0.0
+
+    def advance(self, seconds):
+        '''This method takes the real time (seconds) since the last frame and
+        returns the number of ticks (int) to run before drawing this one.'''
+        self.accumulator += seconds
+        ticks = int(self.accumulator/self.tickTime)
+        if ticks > self.maxTicks:
+            # Drop whatever cannot be caught up in this frame
+            self.droppedTime += (ticks - self.maxTicks)*self.tickTime
+            ticks = self.maxTicks
+            self.accumulator = self.accumulator % self.tickTime + ticks*self.tickTime
+        self.accumulator -= ticks*self.tickTime
+        self.frames += 1
+        self.ticks += ticks
+        if ticks > 1:
+            self.skippedFrames += ticks-1
+        return ticks
+
+    def getAlpha(self):
+        '''This accessor returns how far (0 to 1) the accumulator is into the
+        next tick.'''
+        return min(self.accumulator/self.tickTime, 1.0)
+
+    def getStats(self):
+        '''This accessor returns a dictionary with the number of frames drawn,
+        ticks run, frames skipped (ticks that were not followed by a frame) and
+        the real time dropped (seconds).'''
+        return {"frames": self.frames, "ticks": self.ticks,
+                "skippedFrames": self.skippedFrames, "droppedTime": self.droppedTime}
+
+class Interpolator(object):
+    '''This class moves the sprites of some groups to in-between positions
+    for drawing and puts them back afterwards.'''
+    def __init__(self, groups, maxDistance=40):
+        '''This initializer takes the sprite groups (list) to interpolate and
+        the largest distance (pixels) a sprite can move in a tick; a sprite
+        that moved further (e.g. respawned) is drawn where it is.'''
+        self.groups = groups
+        self.maxDistance = maxDistance
+
+        # sprite -> (left, top) before the last tick, and after it
+        self.previous = {}
+        self.current = {}
+
+    def capture(self):
+        '''This method is called just before the last tick of a frame to
+        remember where every sprite was.'''
+        self.previous = {}
+        for group in self.groups:
+            for sprite in group:
+                self.previous[sprite] = sprite.rect.topleft
+
+    def apply(self, alpha):
+        '''This method takes how far (0 to 1) to go from the previous position
+        of each sprite towards its current one, and moves the sprites there.'''
+        self.current = {}
+        for group in self.groups:
+            for sprite in group:
+                if sprite not in self.previous:
+                    continue
+                left, top = sprite.rect.topleft
+                oldLeft, oldTop = self.previous[sprite]
+                if abs(left-oldLeft) > self.maxDistance or abs(top-oldTop) > self.maxDistance:
+                    continue
+                self.current[sprite] = (left, top)
+                # From 1 tick behind when alpha is 0 to the current position at 1
+                sprite.rect.topleft = (round(oldLeft + (left-oldLeft)*alpha),
+                                       round(oldTop + (top-oldTop)*alpha))
+
+    def restore(self):
+        '''This method puts the sprites moved by apply() back where the
+        simulation left them.'''
+        for sprite, topleft in self.current.items():
+            sprite.rect.topleft = topleft
+        self.current = {}